@@ -0,0 +1 @@
+# commands package
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from auditoria.retencion import archivar
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve las entradas de auditoría más antiguas que la retención a archivos JSONL '
+        'comprimidos (uno por mes) y las borra de la base.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=settings.AUDIT_LOG_RETENTION_DAYS,
+            help='Días de auditoría que se conservan en la base (por defecto AUDIT_LOG_RETENTION_DAYS).'
+        )
+        parser.add_argument(
+            '--directorio', default=settings.AUDIT_LOG_ARCHIVE_DIR,
+            help='Carpeta de los archivos (por defecto AUDIT_LOG_ARCHIVE_DIR).'
+        )
+        parser.add_argument('--bloque', type=int, default=5000, help='Filas por lote (por defecto 5000).')
+
+    def handle(self, *args, **options):
+        antes = timezone.now() - timedelta(days=options['dias'])
+        archivadas = archivar(antes, options['directorio'], options['bloque'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Entradas archivadas en {options['directorio']}: {archivadas}"
+        ))
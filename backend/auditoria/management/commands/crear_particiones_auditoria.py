@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from auditoria.retencion import TABLA, crear_particiones, particionada
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea por adelantado las particiones mensuales del log de auditoría (solo PostgreSQL). '
+        'Las filas fuera de toda partición caen en la partición por defecto.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses', type=int, default=3,
+            help='Cantidad de meses a crear a partir del mes actual (por defecto 3).'
+        )
+
+    def handle(self, *args, **options):
+        if not particionada():
+            self.stdout.write(self.style.WARNING(f'{TABLA} no está particionada (solo PostgreSQL).'))
+            return
+
+        creadas, omitidas = crear_particiones(options['meses'])
+        if omitidas:
+            self.stdout.write(self.style.WARNING(
+                f'Meses omitidos porque la partición por defecto ya tiene filas: {omitidas}'
+            ))
+        self.stdout.write(self.style.SUCCESS(f'Particiones creadas: {creadas}'))
@@ -1,25 +1,65 @@
-import threading
+"""
+Contexto de la petición para el log de auditoría.
+
+El contexto (petición, IP, user agent) vive en una ``ContextVar``: bajo
+ASGI cada petición corre en su propio contexto aunque las vistas síncronas
+compartan hilos del pool, y ``sync_to_async`` lo propaga a esos hilos. El
+usuario se lee de la petición al registrar, así se ve el que autenticó DRF
+en la vista y no solo el de la sesión.
+"""
+import contextvars
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+_contexto = contextvars.ContextVar('auditoria_contexto', default=None)
 
-_thread_locals = threading.local()
 
 def get_current_user():
-    return getattr(_thread_locals, 'user', None)
+    return get_current_request_data()['user']
+
 
 class AuditMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        _thread_locals.user = request.user if hasattr(request, 'user') else None
-        _thread_locals.remote_addr = self._get_client_ip(request)
-        _thread_locals.user_agent = request.META.get('HTTP_USER_AGENT', '')
-        
-        response = self.get_response(request)
-        
-        # Cleanup
-        if hasattr(_thread_locals, 'user'):
-            del _thread_locals.user
-        return response
+        if self.async_mode:
+            return self.__acall__(request)
+
+        from .utils import vaciar_buffer
+        token, token_buffer = self._iniciar(request)
+        try:
+            return self.get_response(request)
+        finally:
+            # Con AUDIT_LOG_ASYNC, las entradas de la petición se encolan en una sola tarea
+            vaciar_buffer(token_buffer)
+            _contexto.reset(token)
+
+    async def __acall__(self, request):
+        from .utils import cerrar_buffer, guardar_entradas
+        token, token_buffer = self._iniciar(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            pendientes = cerrar_buffer(token_buffer)
+            _contexto.reset(token)
+            if pendientes:
+                await sync_to_async(guardar_entradas)(pendientes)
+
+    def _iniciar(self, request):
+        from .utils import iniciar_buffer
+        token = _contexto.set({
+            'request': request,
+            'ip': self._get_client_ip(request),
+            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+        })
+        return token, iniciar_buffer()
 
     def _get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -30,8 +70,11 @@ class AuditMiddleware:
         return ip
 
 def get_current_request_data():
+    contexto = _contexto.get()
+    if contexto is None:
+        return {'user': None, 'ip': None, 'user_agent': None}
     return {
-        'user': getattr(_thread_locals, 'user', None),
-        'ip': getattr(_thread_locals, 'remote_addr', None),
-        'user_agent': getattr(_thread_locals, 'user_agent', None),
+        'user': getattr(contexto['request'], 'user', None),
+        'ip': contexto['ip'],
+        'user_agent': contexto['user_agent'],
     }
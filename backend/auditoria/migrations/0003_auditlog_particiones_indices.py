@@ -0,0 +1,83 @@
+import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+from auditoria.particiones import crear_particiones
+
+
+TABLA = 'auditoria_auditlog'
+COLUMNAS = 'id, user_id, action, content_type_id, object_id, object_repr, changes, ip_address, user_agent, timestamp'
+
+
+def particionar_auditoria(apps, schema_editor):
+    """
+    En PostgreSQL recrea la tabla particionada por rango de ``timestamp``:
+    una partición por mes desde la fila más antigua hasta el mes siguiente
+    al actual, más una por defecto. La tabla original se aparta con otro
+    nombre, sus filas se copian a la nueva y después se borra.
+    La PK pasa a ser (id, timestamp) porque debe incluir la clave de partición.
+    El id sale de una secuencia propia (``nextval`` como default, igual que
+    ``bigserial``) en lugar de la columna identity de la tabla original.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    usuarios = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT min(timestamp) FROM {TABLA}")
+        primera = cursor.fetchone()[0]
+    hoy = timezone.now().date()
+    primera = primera.astimezone(datetime.timezone.utc).date() if primera else hoy
+
+    schema_editor.execute(f"ALTER TABLE {TABLA} RENAME TO {TABLA}_vieja")
+    schema_editor.execute(
+        f"CREATE TABLE {TABLA} (LIKE {TABLA}_vieja INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)"
+    )
+    schema_editor.execute(f"CREATE TABLE {TABLA}_default PARTITION OF {TABLA} DEFAULT")
+    meses = (hoy.year - primera.year) * 12 + hoy.month - primera.month + 2
+    crear_particiones(TABLA, 'timestamp', meses=meses, desde=primera, conexion=schema_editor.connection)
+
+    schema_editor.execute(f"INSERT INTO {TABLA} ({COLUMNAS}) SELECT {COLUMNAS} FROM {TABLA}_vieja")
+    # Con ella se va su secuencia identity ({TABLA}_id_seq), cuyo nombre usa la nueva
+    schema_editor.execute(f"DROP TABLE {TABLA}_vieja")
+    schema_editor.execute(f"CREATE SEQUENCE {TABLA}_id_seq AS bigint OWNED BY {TABLA}.id")
+    schema_editor.execute(f"ALTER TABLE {TABLA} ALTER COLUMN id SET DEFAULT nextval('{TABLA}_id_seq')")
+    schema_editor.execute(
+        f"SELECT setval('{TABLA}_id_seq', (SELECT coalesce(max(id), 0) + 1 FROM {TABLA}), false)"
+    )
+    schema_editor.execute(f"ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_pkey PRIMARY KEY (id, timestamp)")
+    # Los índices de user_id y content_type_id los cubren los compuestos de abajo
+    for columna, destino in (
+        ('user_id', usuarios),
+        ('content_type_id', 'django_content_type'),
+    ):
+        schema_editor.execute(
+            f"ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_{columna}_fk "
+            f"FOREIGN KEY ({columna}) REFERENCES {destino} (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0002_alter_auditlog_timestamp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar_auditoria, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp'], name='auditoria_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['content_type', 'object_id', 'timestamp'], name='auditoria_objeto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', 'timestamp'], name='auditoria_usuario_idx'),
+        ),
+    ]
@@ -1,6 +1,16 @@
+import csv
+import datetime
+import io
+import json
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.response import Response
-from .utils import log_action
+from rest_framework.settings import api_settings
+from .utils import diferencias, instantanea, log_action
 
 class AuditMixin:
     """
@@ -10,10 +20,20 @@ class AuditMixin:
         instance = serializer.save()
         log_action(instance, 'CREATE')
 
+    def campos_auditados(self, serializer):
+        """Campos del modelo que el serializer puede escribir."""
+        concretos = {f.name for f in serializer.instance._meta.concrete_fields}
+        return [
+            campo.source for campo in serializer.fields.values()
+            if not campo.read_only and campo.source in concretos
+        ]
+
     def perform_update(self, serializer):
+        # Foto previa sobre la instancia que ya cargó get_object (sin otro SELECT)
+        campos = self.campos_auditados(serializer)
+        antes = instantanea(serializer.instance, campos)
         instance = serializer.save()
-        # Aquí se podría implementar una lógica para detectar cambios específicos
-        log_action(instance, 'UPDATE')
+        log_action(instance, 'UPDATE', changes=diferencias(antes, instantanea(instance, campos)))
 
     def perform_destroy(self, instance):
         # Si el modelo tiene deleted_at, es un SOFT_DELETE
@@ -47,3 +67,153 @@ class TrashBinMixin:
         instance.restore()
         log_action(instance, 'RESTORE')
         return Response({"status": "Objeto restaurado"})
+
+
+def valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'Sí' if valor else 'No'
+    if isinstance(valor, datetime.datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.isoformat(sep=' ', timespec='seconds')
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    return valor
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def filas_csv(encabezados, filas, filas_por_bloque=500):
+    """Genera el CSV en bloques de ``filas_por_bloque`` líneas (con BOM para Excel)."""
+    writer = csv.writer(_Eco())
+    bloque = ['\ufeff' + writer.writerow(encabezados)]
+    for fila in filas:
+        bloque.append(writer.writerow([valor_csv(v) for v in fila]))
+        if len(bloque) >= filas_por_bloque:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def respuesta_csv(nombre, encabezados, filas):
+    response = StreamingHttpResponse(
+        filas_csv(encabezados, filas), content_type='text/csv; charset=utf-8'
+    )
+    fecha = timezone.localdate().isoformat()
+    response['Content-Disposition'] = f'attachment; filename="{nombre}_{fecha}.csv"'
+    return response
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Habilita ``?format=csv`` (o ``Accept: text/csv``) en la negociación. Los
+    listados con ExportCSVMixin no pasan por aquí; sólo se renderizan las
+    respuestas normales (errores, listas de diccionarios).
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        filas = data if isinstance(data, list) else [data]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if filas:
+            writer.writerow(filas[0].keys())
+            for fila in filas:
+                writer.writerow([valor_csv(v) for v in fila.values()])
+        return buffer.getvalue().encode(self.charset)
+
+
+class ExportCSVMixin:
+    """
+    ``GET ?format=csv`` en el listado exporta todas las filas (sin paginar) con
+    los mismos filtros, búsqueda, orden y restricción por sucursal que el JSON.
+
+    Se lee con ``values_list(...).iterator()``: la memoria no depende del
+    número de filas. Cada ViewSet declara ``campos_exportacion`` como pares
+    (encabezado, lookup) y puede anotar columnas en ``get_queryset_exportacion``.
+    """
+    campos_exportacion = []
+    nombre_exportacion = None
+    tamano_bloque_exportacion = 2000
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer]
+
+    def get_queryset_exportacion(self, queryset):
+        return queryset
+
+    def exportar_csv(self):
+        queryset = self.get_queryset_exportacion(self.filter_queryset(self.get_queryset()))
+        encabezados = [encabezado for encabezado, _ in self.campos_exportacion]
+        lookups = [lookup for _, lookup in self.campos_exportacion]
+        filas = (
+            queryset.prefetch_related(None)
+            .values_list(*lookups)
+            .iterator(chunk_size=self.tamano_bloque_exportacion)
+        )
+        nombre = self.nombre_exportacion or self.basename
+        return respuesta_csv(nombre, encabezados, filas)
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == 'csv':
+            return self.exportar_csv()
+        return super().list(request, *args, **kwargs)
+
+
+def filas_json(serializar, filas, filas_por_bloque=500):
+    """Genera un arreglo JSON serializando ``filas`` de a ``filas_por_bloque``."""
+    encoder = JSONEncoder(ensure_ascii=False)
+    separador = '['
+    bloque = []
+
+    def volcar():
+        return separador + ','.join(encoder.encode(fila) for fila in serializar(bloque))
+
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= filas_por_bloque:
+            yield volcar()
+            separador, bloque = ',', []
+    if bloque:
+        yield volcar()
+        separador = ','
+    yield '[]' if separador == '[' else ']'
+
+
+class ListadoMixin:
+    """
+    Respuesta de las acciones de listado (``@action(detail=False)``) con los
+    mismos filtros, búsqueda y paginación que ``list``. ``?stream=1`` devuelve
+    en cambio todas las filas como un arreglo JSON en streaming: se leen con
+    ``iterator()`` y se serializan por bloques, sin cargar el listado completo.
+    """
+    tamano_bloque_stream = 500
+
+    def listado(self, queryset):
+        if self.request.query_params.get('stream', '').lower() in ('1', 'true'):
+            return StreamingHttpResponse(
+                filas_json(
+                    lambda bloque: self.get_serializer(bloque, many=True).data,
+                    queryset.iterator(chunk_size=self.tamano_bloque_stream),
+                    self.tamano_bloque_stream,
+                ),
+                content_type='application/json',
+            )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
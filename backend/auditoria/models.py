@@ -80,12 +80,20 @@ class AuditLog(models.Model):
     
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Hora de la acción (no de la escritura, que puede ser diferida)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         verbose_name = 'Log de Auditoría'
         verbose_name_plural = 'Logs de Auditoría'
         ordering = ['-timestamp']
+        # En PostgreSQL la tabla está particionada por mes de ``timestamp``
+        # (migración 0003, ``crear_particiones_auditoria``).
+        indexes = [
+            models.Index(fields=['timestamp'], name='auditoria_fecha_idx'),
+            models.Index(fields=['content_type', 'object_id', 'timestamp'], name='auditoria_objeto_idx'),
+            models.Index(fields=['user', 'timestamp'], name='auditoria_usuario_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.action} - {self.object_repr} ({self.timestamp})"
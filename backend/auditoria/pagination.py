@@ -0,0 +1,27 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CursorPorFecha(CursorPagination):
+    """
+    Paginación por cursor (keyset) para listados ordenados por fecha
+    descendente: cada página es un rango de índice, sin ``OFFSET`` ni
+    ``COUNT(*)``, y cuesta lo mismo en la primera página que en la milésima.
+
+    Las subclases fijan ``ordering`` con el campo de fecha y ``-id`` de
+    desempate; debe haber un índice que lo acompañe. Si la vista usa
+    ``OrderingFilter`` manda el orden de la vista.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class AuditLogPagination(CursorPorFecha):
+    ordering = ('-timestamp', '-id')
+
+
+class MovimientoPagination(CursorPorFecha):
+    ordering = ('-fecha_movimiento', '-id')
+
+
+class NotificacionPagination(CursorPorFecha):
+    ordering = ('-creada_en', '-id')
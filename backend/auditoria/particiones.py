@@ -0,0 +1,60 @@
+"""
+Particiones mensuales en PostgreSQL: ``{tabla}_pAAAA_MM`` por rango de una
+columna de fecha, más ``{tabla}_default`` para lo que no cae en ninguna.
+
+Lo usan el log de auditoría (``timestamp``) y el kardex de stock (``fecha``):
+sus comandos ``crear_particiones_*`` y las migraciones que los particionan.
+"""
+import datetime
+
+from django.db import connection as conexion_por_defecto
+
+
+def siguiente_mes(anio, mes):
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+def particionada(tabla, conexion=None):
+    conexion = conexion or conexion_por_defecto
+    if conexion.vendor != 'postgresql':
+        return False
+    with conexion.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [tabla])
+        return cursor.fetchone() is not None
+
+
+def crear_particiones(tabla, columna, meses=3, desde=None, conexion=None):
+    """
+    Crea las particiones de ``tabla`` de ``meses`` meses a partir de
+    ``desde`` (hoy); las que ya existen se saltan.
+
+    Returns:
+        tuple: (creadas, omitidas); se omite un mes si la partición por
+        defecto ya tiene filas de ese rango (crearla fallaría).
+    """
+    conexion = conexion or conexion_por_defecto
+    desde = desde or datetime.date.today()
+    anio, mes = desde.year, desde.month
+    creadas = omitidas = 0
+    with conexion.cursor() as cursor:
+        for _ in range(meses):
+            sig_anio, sig_mes = siguiente_mes(anio, mes)
+            nombre = f'{tabla}_p{anio}_{mes:02d}'
+            inicio, fin = f'{anio}-{mes:02d}-01', f'{sig_anio}-{sig_mes:02d}-01'
+            anio, mes = sig_anio, sig_mes
+
+            cursor.execute("SELECT to_regclass(%s)", [nombre])
+            if cursor.fetchone()[0] is not None:
+                continue
+            cursor.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {tabla}_default WHERE {columna} >= %s AND {columna} < %s)",
+                [inicio, fin]
+            )
+            if cursor.fetchone()[0]:
+                omitidas += 1
+                continue
+            cursor.execute(
+                f"CREATE TABLE {nombre} PARTITION OF {tabla} FOR VALUES FROM ('{inicio}') TO ('{fin}')"
+            )
+            creadas += 1
+    return creadas, omitidas
@@ -0,0 +1,109 @@
+"""
+Particiones y retención del log de auditoría.
+
+En PostgreSQL ``auditoria_auditlog`` está particionada por mes de
+``timestamp`` (``auditoria_auditlog_pAAAA_MM`` más una por defecto).
+``archivar`` mueve las filas anteriores a una fecha a archivos JSONL
+comprimidos, uno por mes (``auditoria_AAAA_MM.jsonl.gz``): primero escribe
+y después borra, así una interrupción a lo sumo repite líneas en el archivo.
+Los meses vencidos completos se descartan con ``DROP`` de su partición en
+vez de borrar fila por fila.
+"""
+import datetime
+import gzip
+import json
+import os
+import re
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from . import particiones
+from .models import AuditLog
+
+TABLA = AuditLog._meta.db_table
+CAMPOS = [
+    'id', 'user_id', 'action', 'content_type_id', 'object_id', 'object_repr',
+    'changes', 'ip_address', 'user_agent', 'timestamp',
+]
+_PARTICION = re.compile(rf'^{TABLA}_p(\d{{4}})_(\d{{2}})$')
+
+
+def particionada():
+    return particiones.particionada(TABLA)
+
+
+def crear_particiones(meses=3, desde=None):
+    """Crea las particiones mensuales del log (ver ``particiones.crear_particiones``)."""
+    return particiones.crear_particiones(TABLA, 'timestamp', meses, desde)
+
+
+def particiones_vencidas(antes):
+    """``[(nombre, inicio, fin)]`` de las particiones mensuales que terminan antes de ``antes``."""
+    if not particionada():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.relname", [TABLA]
+        )
+        nombres = [fila[0] for fila in cursor.fetchall()]
+    vencidas = []
+    for nombre in nombres:
+        coincidencia = _PARTICION.match(nombre)
+        if not coincidencia:
+            continue
+        anio, mes = int(coincidencia[1]), int(coincidencia[2])
+        inicio = datetime.datetime(anio, mes, 1, tzinfo=datetime.timezone.utc)
+        fin = datetime.datetime(*particiones.siguiente_mes(anio, mes), 1, tzinfo=datetime.timezone.utc)
+        if fin <= antes:
+            vencidas.append((nombre, inicio, fin))
+    return vencidas
+
+
+def _escribir(filas, directorio):
+    """Agrega ``filas`` al archivo de su mes; los archivos quedan cerrados al volver."""
+    por_mes = {}
+    for fila in filas:
+        mes = fila['timestamp'].astimezone(datetime.timezone.utc).strftime('%Y_%m')
+        por_mes.setdefault(mes, []).append(fila)
+    for mes, grupo in por_mes.items():
+        with gzip.open(os.path.join(directorio, f'auditoria_{mes}.jsonl.gz'), 'at', encoding='utf-8') as archivo:
+            for fila in grupo:
+                archivo.write(json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+
+
+def archivar(antes, directorio, bloque=5000):
+    """
+    Mueve a ``directorio`` las entradas con ``timestamp`` anterior a ``antes``.
+
+    Returns:
+        int: entradas archivadas.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    archivadas = 0
+
+    for nombre, inicio, fin in particiones_vencidas(antes):
+        filas = AuditLog.objects.filter(timestamp__gte=inicio, timestamp__lt=fin).order_by('timestamp', 'id')
+        grupo = []
+        for fila in filas.values(*CAMPOS).iterator(chunk_size=bloque):
+            grupo.append(fila)
+            if len(grupo) == bloque:
+                _escribir(grupo, directorio)
+                archivadas, grupo = archivadas + len(grupo), []
+        _escribir(grupo, directorio)
+        archivadas += len(grupo)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {nombre}")
+
+    # Lo que queda (partición por defecto, mes en curso, otras bases): por bloques
+    pendientes = AuditLog.objects.filter(timestamp__lt=antes).order_by('timestamp', 'id')
+    while True:
+        filas = list(pendientes.values(*CAMPOS)[:bloque])
+        if not filas:
+            break
+        _escribir(filas, directorio)
+        with transaction.atomic():
+            AuditLog.objects.filter(id__in=[f['id'] for f in filas], timestamp__lt=antes).delete()
+        archivadas += len(filas)
+    return archivadas
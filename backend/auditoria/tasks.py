@@ -0,0 +1,19 @@
+from celery import shared_task
+from django.db import DatabaseError
+from django.utils.dateparse import parse_datetime
+
+
+@shared_task(acks_late=True, autoretry_for=(DatabaseError,), retry_backoff=True, max_retries=10)
+def guardar_auditoria(entradas):
+    """
+    Escribe en bloque entradas de auditoría enviadas por ``guardar_entradas``
+    (modo ``AUDIT_LOG_ASYNC``). ``acks_late``: si el worker muere a mitad, la
+    tarea se vuelve a entregar.
+    """
+    from auditoria.models import AuditLog
+
+    AuditLog.objects.bulk_create([
+        AuditLog(**{**entrada, 'timestamp': parse_datetime(entrada['timestamp'])})
+        for entrada in entradas
+    ])
+    return len(entradas)
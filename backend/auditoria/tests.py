@@ -1,9 +1,31 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from catalogo.models import CategoriaProducto
+from auditoria.middleware import AuditMiddleware, get_current_request_data
 from auditoria.models import AuditLog
+from auditoria.tasks import guardar_auditoria
+from auditoria.utils import iniciar_buffer, log_action, log_actions, vaciar_buffer
 
 User = get_user_model()
 
@@ -63,3 +85,227 @@ class AuditoriaTests(APITestCase):
         
         cat.refresh_from_db()
         self.assertIsNone(cat.deleted_at)
+
+    def test_update_registra_solo_los_campos_cambiados(self):
+        cat = CategoriaProducto.objects.create(nombre='Químicos', codigo='QUI', descripcion='Antes')
+        url = f'/api/catalog/categorias/{cat.id}/'
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.patch(url, {'descripcion': 'Después', 'codigo': 'QUI'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        log = AuditLog.objects.get(action='UPDATE', object_id=cat.id)
+        self.assertEqual(log.changes, {'descripcion': ['Antes', 'Después']})
+        # La foto previa sale de la instancia de get_object: un solo SELECT por id
+        # (las validaciones de unicidad lo excluyen con NOT)
+        por_id = [
+            q['sql'] for q in consultas.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "catalogo_categoriaproducto"' in q['sql']
+            and f'"catalogo_categoriaproducto"."id" = {cat.id}' in q['sql'] and 'NOT' not in q['sql']
+        ]
+        self.assertEqual(len(por_id), 1)
+
+class EscrituraAuditoriaTests(TransactionTestCase):
+    """Buffer por petición, transacciones y modo asíncrono (sin la transacción de TestCase)."""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(username='auditor', password='x', email='a@test.com')
+        self.categorias = [CategoriaProducto.objects.create(nombre=f'Cat {i}', codigo=f'C{i}') for i in range(3)]
+
+    def tearDown(self):
+        vaciar_buffer()
+
+    def test_fuera_de_transaccion_escribe_en_el_momento(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin_user)
+        with CaptureQueriesContext(connection) as consultas:
+            response = client.post('/api/catalog/categorias/', {'nombre': 'Nueva', 'codigo': 'NUE'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        inserts = [q for q in consultas.captured_queries if q['sql'].startswith('INSERT INTO "auditoria_auditlog"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertTrue(AuditLog.objects.filter(action='CREATE', object_repr='Nueva').exists())
+
+        # Con el buffer de la petición activo, sin AUDIT_LOG_ASYNC no se difiere nada
+        iniciar_buffer()
+        log_action(self.categorias[0], 'UPDATE')
+        self.assertTrue(AuditLog.objects.filter(action='UPDATE').exists())
+
+    @override_settings(AUDIT_LOG_ASYNC=True)
+    def test_buffer_asincrono_agrupa_y_rollback_descarta(self):
+        with mock.patch('auditoria.tasks.guardar_auditoria.delay') as delay:
+            iniciar_buffer()
+            for categoria in self.categorias:
+                log_action(categoria, 'UPDATE')
+            delay.assert_not_called()
+
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    log_action(self.categorias[0], 'DELETE')
+                    raise ValueError
+
+            vaciar_buffer()
+        delay.assert_called_once()
+        self.assertEqual([e['action'] for e in delay.call_args.args[0]], ['UPDATE'] * 3)
+
+    @override_settings(AUDIT_LOG_ASYNC=True)
+    def test_modo_asincrono(self):
+        with mock.patch('auditoria.tasks.guardar_auditoria.delay') as delay:
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    log_actions(self.categorias, 'UPDATE')
+                    raise ValueError
+            delay.assert_not_called()
+
+            with transaction.atomic():
+                log_actions(self.categorias, 'UPDATE', changes={'importacion': True})
+            entradas = delay.call_args.args[0]
+        self.assertFalse(AuditLog.objects.exists())
+        self.assertEqual(len(entradas), 3)
+
+        guardar_auditoria(entradas)
+        log = AuditLog.objects.get(object_id=self.categorias[0].pk)
+        self.assertEqual(log.changes, {'importacion': True})
+        self.assertEqual(log.timestamp.isoformat(), entradas[0]['timestamp'])
+
+    @override_settings(AUDIT_LOG_ASYNC=True)
+    def test_sin_broker_escribe_en_linea(self):
+        with mock.patch('auditoria.tasks.guardar_auditoria.delay', side_effect=ConnectionError):
+            log_action(self.categorias[0], 'UPDATE')
+        self.assertEqual(AuditLog.objects.count(), 1)
+
+
+class ConsultaYRetencionTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(username='admin_ret', password='x', email='r@test.com')
+        ahora = timezone.now()
+        cls.logs = AuditLog.objects.bulk_create([
+            AuditLog(user=cls.admin_user, action='UPDATE', object_repr=f'Objeto {i}', timestamp=ahora - timedelta(days=dias))
+            for i, dias in enumerate([500, 400, 40, 1, 0])
+        ])
+
+    def test_paginacion_por_cursor(self):
+        self.client.force_authenticate(user=self.admin_user)
+        url, vistos = '/api/auditoria/logs/?page_size=2', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            vistos += [log['object_repr'] for log in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(vistos, [f'Objeto {i}' for i in range(4, -1, -1)])
+
+    def test_archivar_mueve_lo_vencido_a_jsonl(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            call_command('archivar_auditoria', dias=30, directorio=directorio, bloque=2, stdout=mock.Mock())
+            lineas = []
+            for log in self.logs[:3]:
+                ruta = f"{directorio}/auditoria_{log.timestamp:%Y_%m}.jsonl.gz"
+                with gzip.open(ruta, 'rt', encoding='utf-8') as archivo:
+                    lineas += [json.loads(linea) for linea in archivo]
+
+        self.assertEqual(sorted({l['id'] for l in lineas}), sorted(log.id for log in self.logs[:3]))
+        self.assertEqual(lineas[0]['object_repr'], 'Objeto 0')
+        self.assertEqual(
+            list(AuditLog.objects.order_by('timestamp').values_list('object_repr', flat=True)),
+            ['Objeto 3', 'Objeto 4']
+        )
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'El particionado del log solo aplica en PostgreSQL')
+class ParticionadoAuditoriaTests(TestCase):
+    """Migración 0003 sobre PostgreSQL; el DDL se revierte con la transacción de la prueba."""
+
+    def test_particiona_conserva_ids_y_archiva_por_particion(self):
+        from auditoria import retencion
+
+        ahora = timezone.now()
+        viejos = AuditLog.objects.bulk_create([
+            AuditLog(action='UPDATE', object_repr=f'Objeto {i}', timestamp=ahora - timedelta(days=dias))
+            for i, dias in enumerate([70, 1])
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        migracion = import_module('auditoria.migrations.0003_auditlog_particiones_indices')
+        with connection.schema_editor() as editor:
+            migracion.particionar_auditoria(apps, editor)
+        self.assertTrue(retencion.particionada())
+
+        self.assertEqual(
+            sorted(AuditLog.objects.values_list('id', flat=True)), sorted(log.id for log in viejos)
+        )
+        nuevo = AuditLog.objects.create(action='CREATE', object_repr='Nuevo')
+        self.assertGreater(nuevo.id, max(log.id for log in viejos))
+
+        with tempfile.TemporaryDirectory() as directorio:
+            vencidas = retencion.particiones_vencidas(ahora - timedelta(days=30))
+            self.assertTrue(vencidas)
+            self.assertEqual(retencion.archivar(ahora - timedelta(days=30), directorio), 1)
+        self.assertEqual(retencion.particiones_vencidas(ahora - timedelta(days=30)), [])
+        self.assertEqual(AuditLog.objects.count(), 2)
+
+
+@override_settings(AUDIT_LOG_ASYNC=True)
+class ContextoPeticionTests(SimpleTestCase):
+    """Peticiones concurrentes no comparten contexto ni buffer de auditoría."""
+
+    def setUp(self):
+        guardar = mock.patch('auditoria.utils.guardar_entradas')
+        self.guardadas = guardar.start()
+        self.addCleanup(guardar.stop)
+        get_for_model = mock.patch.object(ContentType.objects, 'get_for_model', return_value=ContentType(id=1))
+        get_for_model.start()
+        self.addCleanup(get_for_model.stop)
+
+    def _peticion(self, i):
+        request = RequestFactory().get('/', REMOTE_ADDR=f'10.0.0.{i}', HTTP_USER_AGENT=f'agente-{i}')
+        request.user = User(id=i, username=f'usuario{i}')
+        return request
+
+    def _registrar(self, request):
+        datos = get_current_request_data()
+        log_action(CategoriaProducto(id=request.user.id, nombre=f'Cat {request.user.id}'), 'UPDATE')
+        return HttpResponse(f"{datos['user'].id}|{datos['ip']}|{datos['user_agent']}")
+
+    def _entradas(self):
+        entradas = [e for llamada in self.guardadas.call_args_list for e in llamada.args[0]]
+        return sorted((e.user_id, e.object_id, e.ip_address, e.user_agent) for e in entradas)
+
+    def _esperado(self, n):
+        return sorted((i, i, f'10.0.0.{i}', f'agente-{i}') for i in range(1, n + 1))
+
+    def test_asgi_concurrente(self):
+        async def vista(request):
+            await asyncio.sleep(0.01 * (request.user.id % 3))
+            # Mismo hilo para todas las partes síncronas (thread_sensitive)
+            return await sync_to_async(self._registrar)(request)
+
+        middleware = AuditMiddleware(vista)
+
+        async def escenario():
+            return await asyncio.gather(*(middleware(self._peticion(i)) for i in range(1, 21)))
+
+        respuestas = asyncio.run(escenario())
+        self.assertEqual(
+            [r.content.decode() for r in respuestas],
+            [f'{i}|10.0.0.{i}|agente-{i}' for i in range(1, 21)]
+        )
+        self.assertEqual(self.guardadas.call_count, 20)  # un INSERT por petición
+        self.assertEqual(self._entradas(), self._esperado(20))
+
+    def test_pool_de_hilos_sin_fugas(self):
+        def vista(request):
+            time.sleep(0.005 * (request.user.id % 3))
+            return self._registrar(request)
+
+        middleware = AuditMiddleware(vista)
+
+        def atender(i):
+            contenido = middleware(self._peticion(i)).content.decode()
+            return contenido, get_current_request_data()  # el hilo queda limpio
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            resultados = list(pool.map(atender, range(1, 13)))
+        self.assertEqual([c for c, _ in resultados], [f'{i}|10.0.0.{i}|agente-{i}' for i in range(1, 13)])
+        self.assertTrue(all(d == {'user': None, 'ip': None, 'user_agent': None} for _, d in resultados))
+        self.assertEqual(self._entradas(), self._esperado(12))
@@ -1,6 +1,124 @@
+"""
+Registro de auditoría.
+
+``log_action``/``log_actions`` arman las entradas y ``_registrar`` decide
+cuándo se escriben:
+
+- Dentro de una transacción se escriben en ella (un ``bulk_create``): se
+  confirman o revierten junto con los datos que describen.
+- Fuera de transacción se escriben en el momento, justo después del cambio
+  que ya se confirmó (autocommit).
+- Con ``AUDIT_LOG_ASYNC`` la escritura se delega a la tarea
+  ``auditoria.tasks.guardar_auditoria`` después del commit; durante una
+  petición las entradas se juntan en el buffer de ``AuditMiddleware`` (una
+  ``ContextVar`` propia de la petición) y se encolan en una sola tarea al
+  terminarla. Si no se puede encolar se escriben en el momento.
+
+Durabilidad: en el modo por defecto una entrada se pierde solo si el proceso
+muere entre el cambio en autocommit y su INSERT. Con ``AUDIT_LOG_ASYNC`` las
+entradas viven en memoria desde el commit hasta que se encolan (fin de la
+petición): una caída en ese intervalo las pierde. Ya en el broker,
+``acks_late`` y los reintentos de la tarea aseguran que se escriban.
+
+Las actualizaciones guardan en ``changes`` solo lo que cambió,
+``{campo: [antes, después]}`` (``diferencias`` / ``log_update_masivo``).
+"""
+import contextvars
+import datetime
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+
 from .models import AuditLog
 from .middleware import get_current_request_data
-from django.contrib.contenttypes.models import ContentType
+
+_pendientes = contextvars.ContextVar('auditoria_pendientes', default=None)
+
+
+def _asincrono():
+    return getattr(settings, 'AUDIT_LOG_ASYNC', False)
+
+
+def iniciar_buffer():
+    """
+    Empieza a acumular las entradas a encolar con ``AUDIT_LOG_ASYNC`` (inicio
+    de petición). Devuelve el token para ``cerrar_buffer``/``vaciar_buffer``.
+    """
+    return _pendientes.set([])
+
+
+def cerrar_buffer(token=None):
+    """Desactiva el buffer y devuelve lo acumulado, sin escribirlo."""
+    pendientes = _pendientes.get()
+    if token is not None:
+        _pendientes.reset(token)
+    else:
+        _pendientes.set(None)
+    return pendientes
+
+
+def vaciar_buffer(token=None):
+    """Escribe lo acumulado desde ``iniciar_buffer`` y desactiva el buffer."""
+    pendientes = cerrar_buffer(token)
+    if pendientes:
+        guardar_entradas(pendientes)
+
+
+def entrada_a_dict(entrada):
+    return {
+        'user_id': entrada.user_id,
+        'action': entrada.action,
+        'content_type_id': entrada.content_type_id,
+        'object_id': entrada.object_id,
+        'object_repr': entrada.object_repr,
+        'changes': entrada.changes,
+        'ip_address': entrada.ip_address,
+        'user_agent': entrada.user_agent,
+        'timestamp': entrada.timestamp.isoformat(),
+    }
+
+
+def guardar_entradas(entradas):
+    """Escribe ``entradas`` (en la tarea Celery con ``AUDIT_LOG_ASYNC``)."""
+    if _asincrono():
+        from .tasks import guardar_auditoria
+        try:
+            guardar_auditoria.delay([entrada_a_dict(e) for e in entradas])
+            return
+        except Exception:
+            pass  # sin broker: no se pierden, se escriben aquí
+    AuditLog.objects.bulk_create(entradas)
+
+
+def _registrar(entradas):
+    if transaction.get_connection().in_atomic_block:
+        if _asincrono():
+            transaction.on_commit(lambda: _registrar(entradas))
+        else:
+            AuditLog.objects.bulk_create(entradas)
+        return
+    pendientes = _pendientes.get()
+    if pendientes is not None and _asincrono():
+        pendientes.extend(entradas)
+    else:
+        guardar_entradas(entradas)
+
+
+def _entrada(instance, action, changes, user, request_data):
+    return AuditLog(
+        user=user,
+        action=action,
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+        object_repr=str(instance)[:255],
+        changes=changes,
+        ip_address=request_data.get('ip'),
+        user_agent=request_data.get('user_agent')
+    )
+
 
 def log_action(instance, action, changes=None):
     """
@@ -8,8 +126,8 @@ def log_action(instance, action, changes=None):
     """
     request_data = get_current_request_data()
     user = request_data.get('user')
-    
-    # Fallback si no hay usuario en local thread (ej: tests or system actions)
+
+    # Fallback si no hay petición en curso (ej: tests or system actions)
     if not user and hasattr(instance, 'creado_por'):
         user = instance.creado_por
 
@@ -17,15 +135,68 @@ def log_action(instance, action, changes=None):
     if user and not user.is_authenticated:
         user = None
 
-    ct = ContentType.objects.get_for_model(instance)
-    
-    AuditLog.objects.create(
-        user=user,
-        action=action,
-        content_type=ct,
-        object_id=instance.pk,
-        object_repr=str(instance)[:255],
-        changes=changes,
-        ip_address=request_data.get('ip'),
-        user_agent=request_data.get('user_agent')
-    )
+    _registrar([_entrada(instance, action, changes, user, request_data)])
+
+
+def log_actions(instances, action, changes=None):
+    """
+    Registra la misma acción para varios objetos con un único ``bulk_create``.
+    """
+    if not instances:
+        return
+    request_data = get_current_request_data()
+    user = request_data.get('user')
+    if user and not user.is_authenticated:
+        user = None
+
+    _registrar([
+        _entrada(instance, action, changes, user or getattr(instance, 'creado_por', None), request_data)
+        for instance in instances
+    ])
+
+
+def valor_auditable(valor):
+    """Valor serializable a JSON para ``AuditLog.changes``."""
+    if isinstance(valor, models.Model):
+        return valor.pk
+    if isinstance(valor, (Decimal, uuid.UUID)):
+        return str(valor)
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, models.fields.files.FieldFile):
+        return valor.name or None
+    return valor
+
+
+def instantanea(instance, campos):
+    """Valores de ``campos`` en memoria (las FK como id, sin consultas)."""
+    meta = instance._meta
+    return {campo: getattr(instance, meta.get_field(campo).attname) for campo in campos}
+
+
+def diferencias(antes, despues):
+    """``{campo: [antes, después]}`` de los campos que cambiaron."""
+    return {
+        campo: [valor_auditable(valor), valor_auditable(despues.get(campo))]
+        for campo, valor in antes.items() if valor != despues.get(campo)
+    }
+
+
+def log_update_masivo(instances, valores):
+    """
+    Audita un ``queryset.update(**valores)`` sobre ``instances`` (ya cargadas,
+    con los valores anteriores). Los objetos con el mismo cambio comparten
+    un ``bulk_create``; lo normal es uno solo para todo el lote.
+    """
+    despues = {
+        campo: valor.pk if isinstance(valor, models.Model) else valor
+        for campo, valor in valores.items()
+    }
+    grupos = {}
+    for instance in instances:
+        cambios = diferencias(instantanea(instance, valores), despues)
+        if cambios:
+            clave = tuple(sorted((campo, repr(par)) for campo, par in cambios.items()))
+            grupos.setdefault(clave, (cambios, []))[1].append(instance)
+    for cambios, grupo in grupos.values():
+        log_actions(grupo, 'UPDATE', changes=cambios)
@@ -1,5 +1,7 @@
 from rest_framework import viewsets, permissions, filters
+from .mixins import ExportCSVMixin
 from .models import AuditLog
+from .pagination import AuditLogPagination
 from rest_framework import serializers
 
 class AuditLogSerializer(serializers.ModelSerializer):
@@ -16,13 +18,25 @@ class AuditLogSerializer(serializers.ModelSerializer):
     def get_user_name(self, obj):
         return obj.user.username if obj.user else None
 
-class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+class AuditLogViewSet(ExportCSVMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para visualizar los logs de auditoría. Solo lectura.
     """
-    queryset = AuditLog.objects.all()
+    queryset = AuditLog.objects.select_related('user')
     serializer_class = AuditLogSerializer
+    pagination_class = AuditLogPagination
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['object_repr', 'user__username', 'action']
     ordering_fields = ['timestamp']
+    nombre_exportacion = 'auditoria'
+    campos_exportacion = [
+        ('Fecha', 'timestamp'),
+        ('Usuario', 'user__username'),
+        ('Acción', 'action'),
+        ('Modelo', 'content_type__model'),
+        ('ID objeto', 'object_id'),
+        ('Objeto', 'object_repr'),
+        ('Cambios', 'changes'),
+        ('IP', 'ip_address'),
+    ]
@@ -0,0 +1,17 @@
+import compras.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0002_itemorden_deleted_at_ordencompra_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='correlativo',
+            name='anio',
+            field=models.PositiveIntegerField(default=compras.models.anio_actual),
+        ),
+    ]
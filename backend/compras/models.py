@@ -1,21 +1,65 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from auditoria.models import SoftDeleteModel
 
+def anio_actual():
+    return timezone.localdate().year
+
+
 class Correlativo(models.Model):
-    """Manejo de numeración secuencial para órdenes."""
+    """
+    Numeración secuencial por tipo de documento, reiniciada cada año.
+
+    ``reservar_codigos`` asigna con un único UPDATE atómico sobre la fila del
+    tipo; el lock de fila dura hasta el commit de la transacción que guarda los
+    documentos, así que un rollback devuelve los números (sin huecos ni
+    duplicados).
+    """
+    PREFIJOS = {'ORDEN_COMPRA': 'OC'}
+
     tipo = models.CharField(max_length=50, unique=True, help_text="Ej: ORDEN_COMPRA")
     prefijo = models.CharField(max_length=10)
     ultimo_numero = models.PositiveIntegerField(default=0)
-    anio = models.PositiveIntegerField(default=timezone.now().year)
+    anio = models.PositiveIntegerField(default=anio_actual)
 
     def siguiente(self):
-        self.ultimo_numero += 1
-        self.save()
-        return f"{self.prefijo}-{self.anio}-{self.ultimo_numero:05d}"
+        return self.reservar(1)[0]
+
+    def reservar(self, cantidad):
+        """Reserva un bloque de números consecutivos y devuelve sus códigos."""
+        codigos = Correlativo.reservar_codigos(self.tipo, cantidad, prefijo=self.prefijo)
+        self.refresh_from_db(fields=['ultimo_numero', 'anio'])
+        return codigos
+
+    @classmethod
+    def reservar_codigos(cls, tipo, cantidad=1, prefijo=None):
+        """
+        Devuelve ``cantidad`` códigos ``{prefijo}-{anio}-{n:05d}`` consecutivos
+        para ``tipo``. Si el año cambió, la numeración vuelve a empezar en 1.
+        El prefijo solo se usa al crear el correlativo del tipo.
+        """
+        anio = anio_actual()
+        incremento = {
+            'ultimo_numero': models.Case(
+                models.When(anio=anio, then=models.F('ultimo_numero') + cantidad),
+                default=models.Value(cantidad),
+                output_field=models.PositiveIntegerField(),
+            ),
+            'anio': anio,
+        }
+        with transaction.atomic():
+            filas = cls.objects.filter(tipo=tipo)
+            if not filas.update(**incremento):
+                # ignore_conflicts: si otro proceso lo creó primero, se usa el suyo
+                cls.objects.bulk_create([
+                    cls(tipo=tipo, prefijo=prefijo or cls.PREFIJOS.get(tipo, tipo[:10]), anio=anio)
+                ], ignore_conflicts=True)
+                filas.update(**incremento)
+            prefijo, ultimo = filas.values_list('prefijo', 'ultimo_numero').get()
+        return [f"{prefijo}-{anio}-{n:05d}" for n in range(ultimo - cantidad + 1, ultimo + 1)]
 
     class Meta:
         verbose_name = 'Correlativo'
@@ -67,13 +111,20 @@ class OrdenCompra(SoftDeleteModel):
         return self.codigo
 
     def save(self, *args, **kwargs):
-        if not self.codigo:
-            correlativo, _ = Correlativo.objects.get_or_create(
-                tipo='ORDEN_COMPRA',
-                defaults={'prefijo': 'OC', 'anio': timezone.now().year}
-            )
-            self.codigo = correlativo.siguiente()
-        super().save(*args, **kwargs)
+        # Código e INSERT en la misma transacción: si el INSERT falla, el número se libera
+        with transaction.atomic():
+            if not self.codigo:
+                self.codigo = OrdenCompra.generar_codigos(1)[0]
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def generar_codigos(cls, cantidad):
+        """
+        Reserva ``cantidad`` códigos consecutivos para órdenes nuevas.
+        Permite crear órdenes con ``bulk_create`` (que no llama a ``save``);
+        llamarlo dentro de la transacción que las inserta.
+        """
+        return Correlativo.reservar_codigos('ORDEN_COMPRA', cantidad)
 
 class ItemOrden(SoftDeleteModel):
     """Detalle de productos en una orden de compra."""
@@ -1,3 +1,90 @@
-from django.test import TestCase
+import multiprocessing
+import unittest
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction, IntegrityError
+from django.test import TestCase, TransactionTestCase
+
+from .models import Correlativo, OrdenCompra, anio_actual
+
+User = get_user_model()
+
+
+class CorrelativoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='comprador', password='x')
+
+    def test_codigos_consecutivos_y_reserva_en_bloque(self):
+        anio = anio_actual()
+        primera = OrdenCompra.objects.create(solicitante=self.user)
+        self.assertEqual(primera.codigo, f'OC-{anio}-00001')
+        self.assertEqual(
+            OrdenCompra.generar_codigos(3),
+            [f'OC-{anio}-00002', f'OC-{anio}-00003', f'OC-{anio}-00004']
+        )
+        self.assertEqual(OrdenCompra.objects.create(solicitante=self.user).codigo, f'OC-{anio}-00005')
+
+    def test_reinicia_con_el_anio(self):
+        Correlativo.objects.create(tipo='ORDEN_COMPRA', prefijo='OC', ultimo_numero=87, anio=2020)
+        anio = anio_actual()
+        self.assertEqual(OrdenCompra.generar_codigos(2), [f'OC-{anio}-00001', f'OC-{anio}-00002'])
+        correlativo = Correlativo.objects.get(tipo='ORDEN_COMPRA')
+        self.assertEqual((correlativo.anio, correlativo.ultimo_numero), (anio, 2))
+
+    def test_otros_tipos_de_documento(self):
+        anio = anio_actual()
+        self.assertEqual(Correlativo.reservar_codigos('NOTA_ENTREGA', 2, prefijo='NE'), [f'NE-{anio}-00001', f'NE-{anio}-00002'])
+        correlativo = Correlativo.objects.get(tipo='NOTA_ENTREGA')
+        self.assertEqual(correlativo.siguiente(), f'NE-{anio}-00003')
+        self.assertEqual(correlativo.ultimo_numero, 3)
+
+    def test_rollback_no_deja_huecos(self):
+        anio = anio_actual()
+        OrdenCompra.objects.create(solicitante=self.user, codigo='MANUAL-1')
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                OrdenCompra.generar_codigos(1)
+                OrdenCompra.objects.create(solicitante=self.user, codigo='MANUAL-1')
+        self.assertEqual(OrdenCompra.objects.create(solicitante=self.user).codigo, f'OC-{anio}-00001')
+
+
+def _reservar_en_proceso(args):
+    """Trabajo de cada proceso hijo: conexión propia, reservas sueltas y en bloque."""
+    for alias in connections:
+        connections[alias].close()
+    vueltas, bloque = args
+    codigos = []
+    try:
+        for _ in range(vueltas):
+            codigos += Correlativo.reservar_codigos('ESTRES', 1, prefijo='ES')
+            codigos += Correlativo.reservar_codigos('ESTRES', bloque, prefijo='ES')
+    finally:
+        connection.close()
+    return codigos
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql',
+    'Las pruebas de concurrencia requieren PostgreSQL (SQLite serializa las escrituras)'
+)
+class CorrelativoEstresTests(TransactionTestCase):
+    """Varios procesos reservando a la vez sobre el mismo tipo (incluida su creación)."""
+
+    PROCESOS = 8
+    VUELTAS = 25
+    BLOQUE = 3
+
+    def test_procesos_concurrentes_sin_duplicados_ni_huecos(self):
+        connection.close()
+        contexto = multiprocessing.get_context('fork')
+        with contexto.Pool(self.PROCESOS) as pool:
+            resultados = pool.map(_reservar_en_proceso, [(self.VUELTAS, self.BLOQUE)] * self.PROCESOS)
+
+        codigos = [c for lote in resultados for c in lote]
+        total = self.PROCESOS * self.VUELTAS * (1 + self.BLOQUE)
+        anio = anio_actual()
+        self.assertEqual(len(codigos), total)
+        self.assertEqual(sorted(codigos), [f'ES-{anio}-{n:05d}' for n in range(1, total + 1)])
+        self.assertEqual(Correlativo.objects.get(tipo='ESTRES').ultimo_numero, total)
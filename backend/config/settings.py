@@ -151,6 +151,23 @@ DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@gsih.com')
 
 # Stock Alert Configuration
 STOCK_ALERT_EMAILS = os.environ.get('STOCK_ALERT_EMAILS', '').split(',') if os.environ.get('STOCK_ALERT_EMAILS') else []
+# Telegram: el token y los destinatarios se configuran en el admin
+# (ConfiguracionTelegram / DestinatarioTelegram); estas variables son el respaldo.
+TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', '')
+TELEGRAM_CHAT_ID = os.environ.get('TELEGRAM_CHAT_ID', '')
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_TIMEOUT = 10
+# Segundos que cada proceso reutiliza el token y los destinatarios leídos del admin
+TELEGRAM_CONFIG_CACHE_TTL = int(os.environ.get('TELEGRAM_CONFIG_CACHE_TTL', 60))
+# Mensajes por segundo (límites de la API de Telegram)
+TELEGRAM_RATE_GLOBAL = 30
+TELEGRAM_RATE_CHAT = 1
+
+# Horas durante las que una alerta de stock no se vuelve a notificar
+STOCK_ALERT_WINDOW_HOURS = int(os.environ.get('STOCK_ALERT_WINDOW_HOURS', 24))
+# Segundos que cada proceso reutiliza su índice de alertas antes de recargarlo
+# (sin caché compartido es lo que tarda en verse una alerta creada en otro proceso)
+STOCK_ALERT_INDEX_TTL = int(os.environ.get('STOCK_ALERT_INDEX_TTL', 60))
 
 # CORS Configuration
 # https://github.com/adamchainz/django-cors-headers
@@ -270,6 +287,57 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Con AUDIT_LOG_ASYNC=1 el log de auditoría se escribe desde un worker de
+# Celery después del commit (importaciones masivas); si no hay broker se
+# escribe en línea. Las entradas de una petición se encolan al terminarla y
+# hasta entonces solo están en memoria: una caída del proceso las pierde (ver
+# auditoria/utils.py). Por defecto se escriben junto con el cambio.
+AUDIT_LOG_ASYNC = env.bool('AUDIT_LOG_ASYNC', default=False)
+
+# Retención del log de auditoría: `manage.py archivar_auditoria` pasa las
+# entradas más viejas a archivos JSONL comprimidos en AUDIT_LOG_ARCHIVE_DIR.
+AUDIT_LOG_RETENTION_DAYS = env.int('AUDIT_LOG_RETENTION_DAYS', default=365)
+AUDIT_LOG_ARCHIVE_DIR = env('AUDIT_LOG_ARCHIVE_DIR', default=str(BASE_DIR / 'archivo_auditoria'))
+
+# Tareas periódicas (requiere un proceso `celery -A config beat`)
+from celery.schedules import crontab
+
+CELERY_BEAT_SCHEDULE = {
+    'saldos-diarios-stock': {
+        'task': 'inventario.tasks.generar_saldos_diarios',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    'alertas-stock-bajo': {
+        'task': 'notificaciones.tasks.evaluar_alertas_stock',
+        'schedule': crontab(minute='*/15'),
+    },
+}
+
+# ============================================================================
+# CACHE
+# ============================================================================
+# Con CACHE_REDIS_URL el caché se comparte entre workers (la invalidación del
+# dashboard llega a todos); sin ella se usa memoria local y manda el TTL.
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 300))
+# Historial de productos: páginas anteriores a estos días se guardan en caché.
+# Sin Redis la invalidación no cruza procesos: el TTL acota una página desactualizada.
+PRODUCT_HISTORY_IMMUTABLE_DAYS = int(os.environ.get('PRODUCT_HISTORY_IMMUTABLE_DAYS', 7))
+PRODUCT_HISTORY_CACHE_TTL = int(os.environ.get('PRODUCT_HISTORY_CACHE_TTL', 300))
+
 # ============================================================================
 # CHANNELS SETTINGS
 # ============================================================================
@@ -283,4 +351,6 @@ CHANNEL_LAYERS = {
         },
     },
 }
+# Segundos durante los que el WebSocket junta notificaciones en un solo frame
+NOTIFICATIONS_WS_BATCH_WINDOW = float(os.environ.get('NOTIFICATIONS_WS_BATCH_WINDOW', 0.2))
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
\ No newline at end of file
@@ -19,6 +19,11 @@ class SupplierAdmin(admin.ModelAdmin):
     list_filter = ['activo']
     search_fields = ['nombre', 'rif', 'codigo', 'email']
 
+@admin.register(models.SecuenciaSku)
+class SecuenciaSkuAdmin(admin.ModelAdmin):
+    list_display = ['prefijo', 'ultimo']
+    search_fields = ['prefijo']
+
 
 # ===========================================================================
 # PRODUCTOS
@@ -29,28 +34,28 @@ class ChemicalProductAdmin(admin.ModelAdmin):
     list_display = ['sku', 'nombre', 'es_peligroso', 'stock_actual', 'activo']
     list_filter = ['categoria', 'es_peligroso', 'nivel_peligrosidad', 'presentacion', 'activo']
     search_fields = ['sku', 'nombre', 'numero_un']
-    readonly_fields = ['sku', 'creado_en', 'actualizado_en']
+    readonly_fields = ['sku', 'stock_actual', 'creado_en', 'actualizado_en']
 
 @admin.register(models.Pipe)
 class PipeAdmin(admin.ModelAdmin):
     list_display = ['sku', 'nombre', 'material', 'diametro_nominal', 'stock_actual']
     list_filter = ['categoria', 'material', 'tipo_uso', 'activo']
     search_fields = ['sku', 'nombre']
-    readonly_fields = ['sku', 'presion_psi', 'creado_en', 'actualizado_en']
+    readonly_fields = ['sku', 'stock_actual', 'presion_psi', 'creado_en', 'actualizado_en']
 
 @admin.register(models.PumpAndMotor)
 class PumpAndMotorAdmin(admin.ModelAdmin):
     list_display = ['sku', 'nombre', 'tipo_equipo', 'marca', 'potencia_hp']
     list_filter = ['categoria', 'tipo_equipo', 'marca', 'activo']
     search_fields = ['sku', 'nombre', 'numero_serie']
-    readonly_fields = ['sku', 'potencia_kw', 'creado_en', 'actualizado_en']
+    readonly_fields = ['sku', 'stock_actual', 'potencia_kw', 'creado_en', 'actualizado_en']
 
 @admin.register(models.Accessory)
 class AccessoryAdmin(admin.ModelAdmin):
     list_display = ['sku', 'nombre', 'tipo_accesorio', 'tipo_conexion']
     list_filter = ['categoria', 'tipo_accesorio', 'tipo_conexion', 'activo']
     search_fields = ['sku', 'nombre']
-    readonly_fields = ['sku', 'creado_en', 'actualizado_en']
+    readonly_fields = ['sku', 'stock_actual', 'creado_en', 'actualizado_en']
 
 
 # ===========================================================================
@@ -82,6 +87,22 @@ class StockAccessoryAdmin(admin.ModelAdmin):
     list_filter = ['ubicacion']
     search_fields = ['producto__nombre']
 
+@admin.register(models.KardexStock)
+class KardexStockAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'content_type', 'object_id', 'ubicacion', 'lote', 'cantidad', 'saldo', 'movimiento']
+    list_filter = ['content_type', 'ubicacion']
+    date_hierarchy = 'fecha'
+
+    # Solo inserción: el kardex no se edita ni se borra desde el admin
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 # ===========================================================================
 # MOVIMIENTOS Y AUDITORÍA
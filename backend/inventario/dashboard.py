@@ -0,0 +1,93 @@
+"""
+Estadísticas del dashboard con caché.
+
+El resultado se guarda en el caché de Django por alcance (``global`` para
+administradores, ``sucursal-<id>`` para el resto). Las claves llevan un número
+de versión: invalidar es incrementar la versión, lo que descarta de una vez
+todos los alcances. La versión sube al confirmar cualquier transacción que
+aplique stock o dé de alta/baja un producto; el TTL cubre el resto (p. ej.
+sucursales nuevas).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+CLAVE_VERSION = 'dashboard_stats:version'
+
+
+def ttl():
+    return getattr(settings, 'DASHBOARD_CACHE_TTL', 300)
+
+
+def _version():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, 1, timeout=None)
+        version = cache.get(CLAVE_VERSION, 1)
+    return version
+
+
+def invalidar_dashboard():
+    """Descarta las estadísticas en caché de todos los alcances."""
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 1, timeout=None)
+
+
+def invalidar_dashboard_al_confirmar():
+    """Invalida cuando la transacción en curso se confirme (o ya, si no hay)."""
+    transaction.on_commit(invalidar_dashboard)
+
+
+def alcance_usuario(user):
+    if user.role == user.ROLE_ADMIN:
+        return 'global'
+    return f'sucursal-{user.sucursal_id or 0}'
+
+
+def calcular_dashboard(user):
+    """
+    Una consulta por tipo de producto (conteo y stock juntos) más el conteo
+    de sucursales. El stock de usuarios no administradores se limita a su
+    sucursal.
+    """
+    from inventario.models import Pipe, PumpAndMotor, Sucursal, ChemicalProduct, Accessory
+
+    filtro_stock = None
+    if user.role != user.ROLE_ADMIN:
+        filtro_stock = Q(stocks__ubicacion__acueducto__sucursal_id=user.sucursal_id or 0)
+
+    def totales(modelo):
+        datos = modelo.objects.aggregate(
+            total=Count('id', distinct=True),
+            stock=Sum('stocks__cantidad', filter=filtro_stock),
+        )
+        return datos['total'], datos['stock'] or 0
+
+    total_tuberias, stock_tuberias = totales(Pipe)
+    total_equipos, stock_equipos = totales(PumpAndMotor)
+    total_quimicos, stock_quimicos = totales(ChemicalProduct)
+    total_accesorios, stock_accesorios = totales(Accessory)
+
+    return {
+        'total_tuberias': total_tuberias,
+        'total_equipos': total_equipos,
+        'total_sucursales': Sucursal.objects.count(),
+        'total_stock_tuberias': stock_tuberias,
+        'total_stock_equipos': stock_equipos,
+        'total_productos_quimicos': total_quimicos,
+        'total_accesorios': total_accesorios,
+        'total_stock_quimicos': stock_quimicos,
+        'total_stock_accesorios': stock_accesorios,
+    }
+
+
+def obtener_dashboard(user):
+    clave = f'dashboard_stats:v{_version()}:{alcance_usuario(user)}'
+    stats = cache.get(clave)
+    if stats is None:
+        stats = calcular_dashboard(user)
+        cache.set(clave, stats, timeout=ttl())
+    return stats
@@ -16,4 +16,4 @@ class MovimientoInventarioFilter(filters.FilterSet):
 
     class Meta:
         model = MovimientoInventario
-        fields = ['tipo_movimiento', 'acueducto_origen', 'acueducto_destino']
+        fields = ['tipo_movimiento', 'status', 'acueducto_origen', 'acueducto_destino']
@@ -0,0 +1,180 @@
+"""
+Historial de movimientos de un producto (acciones ``history``).
+
+Las páginas van por cursor (más recientes primero) y cada movimiento sale
+con las filas de kardex que dejó (``saldos``: delta y saldo de cada
+ubicación afectada) y ``saldo_total``, el stock del producto justo después
+de aplicarse (nulo si no se aplicó). El total se arma con la foto diaria
+anterior, los deltas del kardex de ese día hasta la página y el tramo de
+kardex que la cubre; no recorre el historial completo.
+
+Una página con cursor hacia atrás no cambia al llegar movimientos nuevos.
+Si además no tiene pendientes y su movimiento más reciente tiene más de
+``PRODUCT_HISTORY_IMMUTABLE_DAYS`` días, se guarda en caché con su ETag
+durante ``PRODUCT_HISTORY_CACHE_TTL`` segundos. La versión del producto sube
+al editar o borrar uno de sus movimientos; con el caché en memoria local esa
+versión no llega a los demás procesos y solo el TTL acota lo que sirven una
+página vieja, igual que en el dashboard.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+
+def ttl():
+    return getattr(settings, 'PRODUCT_HISTORY_CACHE_TTL', 300)
+
+
+def _clave_version(content_type_id, producto_id):
+    return f'historial:version:{content_type_id}:{producto_id}'
+
+
+def _version(content_type_id, producto_id):
+    clave = _clave_version(content_type_id, producto_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, 1, timeout=None)
+        version = cache.get(clave, 1)
+    return version
+
+
+def invalidar_historial(content_type_id, producto_id):
+    """Descarta las páginas en caché del historial del producto."""
+    clave = _clave_version(content_type_id, producto_id)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, timeout=None)
+
+
+def invalidar_historial_al_confirmar(content_type_id, producto_id):
+    transaction.on_commit(lambda: invalidar_historial(content_type_id, producto_id))
+
+
+def movimientos(producto_model, producto_id, desde=None, hasta=None):
+    """Movimientos del producto con ``desde <= fecha_movimiento < hasta``."""
+    from django.contrib.contenttypes.models import ContentType
+    from inventario.models import MovimientoInventario
+
+    queryset = MovimientoInventario.para_listado().filter(
+        content_type=ContentType.objects.get_for_model(producto_model), object_id=producto_id
+    )
+    if desde:
+        queryset = queryset.filter(fecha_movimiento__gte=desde)
+    if hasta:
+        queryset = queryset.filter(fecha_movimiento__lt=hasta)
+    return queryset.order_by('-fecha_movimiento', '-id')
+
+
+def _hasta_fila(fecha, kardex_id):
+    """Filas de kardex hasta (fecha, id) inclusive."""
+    return Q(fecha__lt=fecha) | Q(fecha=fecha, id__lte=kardex_id)
+
+
+def _total_tras(filtro, fecha, kardex_id):
+    """Stock total del producto después de la fila de kardex (fecha, id)."""
+    from inventario.models import KardexStock
+    from inventario.stock import fin_del_dia, stock_a_fecha
+
+    dia_anterior = timezone.localtime(fecha).date() - timedelta(days=1)
+    total = sum(stock_a_fecha(dia_anterior, filtro).values(), Decimal('0'))
+    del_dia = KardexStock.objects.filter(filtro, _hasta_fila(fecha, kardex_id), fecha__gte=fin_del_dia(dia_anterior))
+    return total + (del_dia.aggregate(total=Sum('cantidad'))['total'] or Decimal('0'))
+
+
+def saldos(content_type_id, producto_id, ids):
+    """
+    ``{movimiento_id: {'saldos': [...], 'saldo_total': Decimal}}`` de los
+    movimientos ``ids`` que aplicaron stock.
+    """
+    from inventario.models import KardexStock
+
+    filas = list(KardexStock.objects.filter(movimiento_id__in=ids).order_by('fecha', 'id').values(
+        'id', 'movimiento_id', 'ubicacion_id', 'ubicacion__nombre', 'lote', 'cantidad', 'saldo', 'fecha'
+    ))
+    if not filas:
+        return {}
+
+    filtro = Q(content_type_id=content_type_id, object_id=producto_id)
+    primera, ultima = filas[0], filas[-1]
+    total = _total_tras(filtro, ultima['fecha'], ultima['id'])
+    tramo = KardexStock.objects.filter(
+        filtro, _hasta_fila(ultima['fecha'], ultima['id'])
+    ).exclude(
+        Q(fecha__lt=primera['fecha']) | Q(fecha=primera['fecha'], id__lt=primera['id'])
+    ).order_by('-fecha', '-id').values_list('id', 'cantidad')
+    total_tras_fila = {}
+    for kardex_id, cantidad in tramo:
+        # Las sumas en SQLite pierden la escala del campo
+        total_tras_fila[kardex_id] = total.quantize(Decimal('0.001'))
+        total -= cantidad
+
+    resultado = {}
+    for fila in filas:
+        datos = resultado.setdefault(fila['movimiento_id'], {'saldos': []})
+        datos['saldos'].append({
+            'ubicacion': fila['ubicacion_id'],
+            'ubicacion_nombre': fila['ubicacion__nombre'],
+            'lote': fila['lote'],
+            'cantidad': fila['cantidad'],
+            'saldo': fila['saldo'],
+        })
+        datos['saldo_total'] = total_tras_fila[fila['id']]  # la última fila del movimiento
+    return resultado
+
+
+def _inmutable(paginador, pagina):
+    from inventario.models import MovimientoInventario
+
+    if paginador.cursor is None or paginador.cursor.reverse or not pagina:
+        return False
+    limite = timezone.now() - timedelta(days=getattr(settings, 'PRODUCT_HISTORY_IMMUTABLE_DAYS', 7))
+    return (
+        pagina[0].fecha_movimiento < limite
+        and all(m.status != MovimientoInventario.STATUS_PENDIENTE for m in pagina)
+    )
+
+
+def pagina_historial(producto_model, producto_id, request, desde=None, hasta=None):
+    """
+    Página del historial pedida en ``request`` (``?cursor``, ``?page_size``).
+
+    Returns:
+        tuple: (datos, etag, inmutable).
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from auditoria.pagination import MovimientoPagination
+    from inventario.serializers import MovimientoInventarioSerializer
+
+    content_type_id = ContentType.objects.get_for_model(producto_model).id
+    consulta = hashlib.md5(request.GET.urlencode().encode()).hexdigest()
+    clave = f'historial:v{_version(content_type_id, producto_id)}:{content_type_id}:{producto_id}:{consulta}'
+    en_cache = cache.get(clave)
+    if en_cache is not None:
+        return (*en_cache, True)
+
+    # Sin vista: el orden es siempre el del cursor, no el del listado de productos
+    paginador = MovimientoPagination()
+    pagina = paginador.paginate_queryset(movimientos(producto_model, producto_id, desde, hasta), request)
+    por_movimiento = saldos(content_type_id, producto_id, [m.id for m in pagina])
+    filas = MovimientoInventarioSerializer(pagina, many=True).data
+    for fila in filas:
+        extra = por_movimiento.get(fila['id'], {})
+        fila['saldos'] = extra.get('saldos', [])
+        fila['saldo_total'] = extra.get('saldo_total')
+    # JSON normalizado: mismo ETag que la respuesta servida desde el caché
+    datos = json.loads(json.dumps(paginador.get_paginated_response(filas).data, cls=DjangoJSONEncoder))
+    etag = '"%s"' % hashlib.md5(json.dumps(datos, sort_keys=True).encode()).hexdigest()
+
+    inmutable = _inmutable(paginador, pagina)
+    if inmutable:
+        cache.set(clave, (datos, etag), timeout=ttl())
+    return datos, etag, inmutable
@@ -0,0 +1,310 @@
+"""
+Importación masiva desde las plantillas CSV de ``docs/plantillas_importacion``.
+
+El archivo se lee fila a fila y se escribe en bloques con ``bulk_create``:
+
+- Las columnas de relación (categoría, unidad, proveedor, marca, sucursal...)
+  se resuelven por nombre con una consulta por valor distinto (caché).
+- Cada valor se convierte y valida una sola vez (``Field.clean``) y la fila
+  con ``clean()`` del modelo; las claves únicas se verifican con una consulta
+  por campo y bloque.
+- Los SKU vacíos se reservan con un ``reservar_skus`` por categoría y bloque
+  y los explícitos adelantan la secuencia de su prefijo; con
+  ``dry_run`` no se toca la secuencia.
+- Los errores se devuelven por número de línea y la fila se omite. Cada bloque
+  se escribe en su propio savepoint: si la base lo rechaza (p. ej. un SKU que
+  otro proceso insertó entretanto) sus filas se reportan como error y la
+  importación sigue con el siguiente.
+
+``stock_actual`` no se importa: es la suma de las tablas de stock por
+ubicación y se carga con movimientos de ENTRADA.
+"""
+import csv
+import io
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+MAX_ERRORES = 500
+TAMANO_BLOQUE = 1000
+
+
+class ErrorImportacion(Exception):
+    """Problema del archivo completo (columnas faltantes, tipo desconocido)."""
+
+
+def _importadores():
+    from catalogo.models import CategoriaProducto, Marca
+    from inventario.models import (
+        ChemicalProduct, Pipe, PumpAndMotor, Accessory, UnitOfMeasure, Supplier,
+    )
+    from institucion.models import OrganizacionCentral, Sucursal, Acueducto
+
+    relaciones_producto = {
+        'categoria': CategoriaProducto,
+        'unidad_medida': UnitOfMeasure,
+        'proveedor': Supplier,
+    }
+    return {
+        'quimicos': (ChemicalProduct, relaciones_producto),
+        'tuberias': (Pipe, relaciones_producto),
+        'bombas': (PumpAndMotor, {**relaciones_producto, 'marca': Marca}),
+        'accesorios': (Accessory, relaciones_producto),
+        'sucursales': (Sucursal, {'organizacion_central': OrganizacionCentral}),
+        'acueductos': (Acueducto, {'sucursal': Sucursal}),
+    }
+
+
+TIPOS_IMPORTACION = ('quimicos', 'tuberias', 'bombas', 'accesorios', 'sucursales', 'acueductos')
+
+# Columnas de las plantillas que no se escriben en el modelo
+COLUMNAS_IGNORADAS = {'stock_actual'}
+
+
+class _Resolutor:
+    """Caché de ``nombre -> objeto`` por modelo relacionado (sin distinguir mayúsculas)."""
+
+    def __init__(self):
+        self._cache = {}
+
+    def obtener(self, modelo, nombre):
+        clave = (modelo, nombre.casefold())
+        if clave not in self._cache:
+            self._cache[clave] = modelo._default_manager.filter(nombre__iexact=nombre).first()
+        return self._cache[clave]
+
+
+def _mensajes(error):
+    if hasattr(error, 'error_dict'):
+        return {campo: [m for e in errores for m in e.messages] for campo, errores in error.error_dict.items()}
+    return {'non_field_errors': error.messages}
+
+
+class _Importador:
+
+    def __init__(self, modelo, relaciones, dry_run=False):
+        from inventario.models import ProductBase
+
+        self.modelo = modelo
+        self.relaciones = relaciones
+        self.dry_run = dry_run
+        self.es_producto = issubclass(modelo, ProductBase)
+        self.resolutor = _Resolutor()
+        self.campos = {
+            f.name: f for f in modelo._meta.concrete_fields
+            if not f.primary_key and not f.is_relation and not getattr(f, 'auto_now', False)
+            and not getattr(f, 'auto_now_add', False)
+        }
+        self.unicos = [
+            f.name for f in modelo._meta.concrete_fields if f.unique and not f.primary_key
+        ]
+        self.unicos_juntos = [tuple(u) for u in modelo._meta.unique_together]
+        self.vistos = {clave: set() for clave in self.unicos + self.unicos_juntos}
+        self.categoria_fija = None
+        if modelo.__name__ == 'PumpAndMotor':
+            # PumpAndMotor.save() fuerza la categoría BOM
+            from catalogo.models import CategoriaProducto
+            self.categoria_fija = CategoriaProducto.objects.filter(codigo='BOM').first()
+
+        self.creados = 0
+        self.errores = []
+        self.total_errores = 0
+
+    def validar_columnas(self, columnas):
+        requeridas = {
+            f.name for f in self.modelo._meta.concrete_fields
+            if not f.primary_key and not f.blank and not f.has_default() and not f.null
+            and f.name in self.campos
+        } | set(self.relaciones)
+        requeridas.discard('sku')
+        if self.categoria_fija is not None:
+            requeridas.discard('categoria')
+        faltantes = sorted(requeridas - set(columnas or []))
+        if faltantes:
+            raise ErrorImportacion(f"Faltan columnas: {', '.join(faltantes)}")
+
+    def error(self, linea, errores):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append({'fila': linea, 'errores': errores})
+
+    def construir(self, fila):
+        """Instancia sin guardar a partir de una fila; ``ValidationError`` si no es válida."""
+        obj = self.modelo()
+        errores = {}
+        for columna, valor in fila.items():
+            if columna is None or columna in COLUMNAS_IGNORADAS:
+                continue
+            valor = (valor or '').strip()
+            if columna in self.relaciones:
+                if columna == 'categoria' and self.categoria_fija is not None:
+                    continue
+                relacionado = self.resolutor.obtener(self.relaciones[columna], valor) if valor else None
+                if relacionado is None:
+                    errores[columna] = [f"No existe '{valor}'" if valor else 'Este campo es obligatorio.']
+                else:
+                    setattr(obj, columna, relacionado)
+                continue
+            campo = self.campos.get(columna)
+            if campo is None:
+                continue
+            if valor == '':
+                # El SKU vacío se asigna al guardar el bloque
+                if self.es_producto and columna == 'sku':
+                    continue
+                valor = None if campo.null else getattr(obj, campo.attname)
+            try:
+                setattr(obj, campo.attname, campo.clean(valor, obj))
+            except ValidationError as e:
+                errores[columna] = e.messages
+
+        if self.categoria_fija is not None:
+            obj.categoria = self.categoria_fija
+        if self.es_producto:
+            obj.calcular_campos_derivados()
+
+        if not errores:
+            try:
+                obj.clean()
+            except ValidationError as e:
+                errores.update(_mensajes(e))
+        if errores:
+            raise ValidationError(errores)
+        return obj
+
+    def _valor_unico(self, obj, clave):
+        if isinstance(clave, tuple):
+            valores = tuple(getattr(obj, self.modelo._meta.get_field(c).attname) for c in clave)
+            return None if None in valores else valores
+        valor = getattr(obj, self.modelo._meta.get_field(clave).attname)
+        return valor if valor not in (None, '') else None
+
+    def _existentes(self, clave, valores):
+        """Valores de ``clave`` que ya existen en la base (una consulta)."""
+        manager = self.modelo._base_manager
+        if isinstance(clave, tuple):
+            attnames = [self.modelo._meta.get_field(c).attname for c in clave]
+            filtro = Q()
+            for valor in valores:
+                filtro |= Q(**dict(zip(attnames, valor)))
+            return set(manager.filter(filtro).values_list(*attnames))
+        return set(manager.filter(**{f'{clave}__in': valores}).values_list(clave, flat=True))
+
+    def _reservar_skus(self, objs):
+        """
+        Asigna SKUs a ``objs`` sin SKU con un ``reservar_skus`` por categoría
+        (una sola reserva por bloque si el archivo es de una categoría);
+        devuelve los explícitos.
+        """
+        sin_sku = {}
+        for obj in objs:
+            if not obj.sku:
+                sin_sku.setdefault(obj.categoria, []).append(obj)
+        explicitos = [obj.sku for obj in objs if obj.sku]
+        for categoria, grupo in sin_sku.items():
+            for obj, sku in zip(grupo, self.modelo.reservar_skus(categoria, len(grupo))):
+                obj.sku = sku
+        return explicitos
+
+    def guardar_bloque(self, bloque):
+        # Claves únicas: contra la base (una consulta por campo) y contra el propio archivo
+        rechazadas = {}
+        for clave in self.unicos + self.unicos_juntos:
+            valores = {self._valor_unico(obj, clave) for _, obj in bloque} - {None}
+            existentes = self._existentes(clave, valores) if valores else set()
+            for linea, obj in bloque:
+                valor = self._valor_unico(obj, clave)
+                if valor is None:
+                    continue
+                nombre = '__'.join(clave) if isinstance(clave, tuple) else clave
+                if valor in existentes or valor in self.vistos[clave]:
+                    rechazadas.setdefault(linea, {})[nombre] = ['Ya existe un registro con este valor.']
+                else:
+                    self.vistos[clave].add(valor)
+
+        validos = []
+        for linea, obj in bloque:
+            if linea in rechazadas:
+                self.error(linea, rechazadas[linea])
+            else:
+                validos.append((linea, obj))
+
+        if validos and not self.dry_run:
+            try:
+                self._escribir([obj for _, obj in validos])
+            except IntegrityError:
+                # Savepoint revertido: el bloque no se guarda
+                for linea, _ in validos:
+                    self.error(linea, {'non_field_errors': [
+                        'No se pudo guardar: otro registro con los mismos datos únicos se creó durante la importación.'
+                    ]})
+                return
+        self.creados += len(validos)
+
+    def _escribir(self, objs):
+        """Guarda un bloque válido en su propio savepoint."""
+        from auditoria.utils import log_actions
+
+        # Se reserva antes del savepoint para no retener el lock de la secuencia
+        # durante todo el bloque; si el bloque falla esos números quedan sin usar.
+        # En dry_run no se llega aquí: las filas sin SKU ya se validaron sin él
+        explicitos = self._reservar_skus(objs) if self.es_producto else []
+        with transaction.atomic():
+            creados = self.modelo.objects.bulk_create(objs)
+            log_actions(creados, 'CREATE', changes={'importacion': True})
+            if self.es_producto:
+                from inventario.dashboard import invalidar_dashboard_al_confirmar
+                from inventario.models import SecuenciaSku
+                SecuenciaSku.registrar_existentes(explicitos)
+                invalidar_dashboard_al_confirmar()
+
+
+def importar_csv(tipo, archivo, dry_run=False, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Importa una plantilla CSV (archivo binario o de texto) de ``tipo``.
+
+    Devuelve ``{'tipo', 'filas', 'creados', 'errores', 'total_errores'}``;
+    con ``dry_run`` valida todo sin escribir. ``ErrorImportacion`` si el
+    archivo no se puede procesar.
+    """
+    importadores = _importadores()
+    if tipo not in importadores:
+        raise ErrorImportacion(f"Tipo desconocido: {tipo}. Opciones: {', '.join(TIPOS_IMPORTACION)}")
+    modelo, relaciones = importadores[tipo]
+    importador = _Importador(modelo, relaciones, dry_run=dry_run)
+
+    if not isinstance(archivo, io.TextIOBase):
+        archivo = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    lector = csv.DictReader(archivo)
+    try:
+        importador.validar_columnas(lector.fieldnames)
+    except UnicodeDecodeError:
+        raise ErrorImportacion('El archivo debe estar codificado en UTF-8')
+
+    filas = 0
+    bloque = []
+    try:
+        for fila in lector:
+            filas += 1
+            linea = lector.line_num
+            try:
+                bloque.append((linea, importador.construir(fila)))
+            except ValidationError as e:
+                importador.error(linea, _mensajes(e))
+            if len(bloque) >= tamano_bloque:
+                importador.guardar_bloque(bloque)
+                bloque = []
+    except UnicodeDecodeError:
+        raise ErrorImportacion('El archivo debe estar codificado en UTF-8')
+    if bloque:
+        importador.guardar_bloque(bloque)
+
+    return {
+        'tipo': tipo,
+        'filas': filas,
+        'creados': importador.creados,
+        'errores': importador.errores,
+        'total_errores': importador.total_errores,
+        'dry_run': dry_run,
+    }
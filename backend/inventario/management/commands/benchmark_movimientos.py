@@ -0,0 +1,139 @@
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, IntegerField, Sum, Value
+from django.db.models.functions import Cast, Mod
+from django.utils import timezone
+
+from geography.models import Ubicacion
+from institucion.models import Acueducto, OrganizacionCentral, Sucursal
+from inventario.models import Accessory, ChemicalProduct, MovimientoInventario, Pipe, PumpAndMotor
+
+TABLA = MovimientoInventario._meta.db_table
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara planes y tiempos de las consultas frecuentes de movimientos sin y con los índices '
+        'de MovimientoInventario, sobre datos sembrados. Todo corre en una transacción que se revierte '
+        'al final: la base queda como estaba.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=1_000_000, help='Movimientos a sembrar (por defecto 1.000.000).')
+        parser.add_argument('--productos', type=int, default=2000, help='Productos distintos por tipo (por defecto 2000).')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones por consulta; se informa la mediana.')
+        parser.add_argument('--sin-planes', action='store_true', help='Solo tiempos, sin los planes de ejecución.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            consultas = self._sembrar(options['filas'], options['productos'])
+            indices = MovimientoInventario._meta.indexes
+            editor = connection.schema_editor()
+
+            self._ejecutar([i.remove_sql(MovimientoInventario, editor) for i in indices])
+            antes = self._medir(consultas, options)
+            self._ejecutar([i.create_sql(MovimientoInventario, editor) for i in indices])
+            despues = self._medir(consultas, options)
+
+            self._informe(consultas, antes, despues, options)
+            transaction.set_rollback(True)
+
+    def _sembrar(self, filas, productos):
+        """Siembra ``filas`` movimientos repartidos en dos años y devuelve las consultas a medir."""
+        org = OrganizacionCentral.objects.create(nombre='Benchmark movimientos')
+        sucursal = Sucursal.objects.create(nombre='Benchmark movimientos', organizacion_central=org)
+        acueductos = [Acueducto.objects.create(nombre=f'Benchmark {i}', sucursal=sucursal) for i in range(10)]
+        ubicaciones = Ubicacion.objects.bulk_create([
+            Ubicacion(nombre=f'Almacén benchmark {i}', tipo='ALMACEN', acueducto=acueductos[i % 10])
+            for i in range(40)
+        ])
+        tipos = list(ContentType.objects.get_for_models(ChemicalProduct, Pipe, PumpAndMotor, Accessory).values())
+        ahora = timezone.now()
+        minutos = 2 * 365 * 24 * 60
+
+        def movimiento(n):
+            return MovimientoInventario(
+                content_type=tipos[n % 4], object_id=1 + (n * 7919) % productos,
+                ubicacion_origen=ubicaciones[n % 40], ubicacion_destino=ubicaciones[(n * 13 + 1) % 40],
+                tipo_movimiento='TRANSFER',
+                status='PENDIENTE' if n % 50 == 0 else 'RECHAZADO' if n % 7 == 0 else 'APROBADO',
+                cantidad=Decimal('1'), deleted_at=ahora if n % 100 == 1 else None,
+            )
+
+        self.stdout.write(f'Sembrando {filas} movimientos...')
+        for inicio in range(0, filas, 10_000):
+            lote = [movimiento(n) for n in range(inicio, min(inicio + 10_000, filas))]
+            MovimientoInventario.objects.bulk_create(lote)
+        # auto_now_add deja todas en el momento de la siembra: se reparten en los dos años
+        # (Cast porque MOD en SQLite devuelve un real)
+        MovimientoInventario.all_objects.filter(ubicacion_origen__in=ubicaciones).update(
+            fecha_movimiento=Value(ahora) - ExpressionWrapper(
+                Value(timedelta(minutes=1)) * Cast(Mod(F('id') * 7919, minutos), IntegerField()),
+                output_field=DurationField(),
+            )
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {TABLA}")
+            if connection.vendor == 'postgresql':
+                # Las FK diferidas pendientes impiden el DDL de índices en la transacción
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        hace_30_dias = ahora - timedelta(days=30)
+        vivos = MovimientoInventario.objects
+        return [
+            ('Feed (primera página)', vivos.order_by('-fecha_movimiento', '-id')[:21]),
+            ('Historial de un producto', vivos.filter(content_type=tipos[0], object_id=1).order_by('-fecha_movimiento')),
+            ('Movimientos recientes (30 días)', vivos.filter(fecha_movimiento__gte=hace_30_dias).order_by('-fecha_movimiento')),
+            ('Resumen por tipo (30 días)', vivos.filter(fecha_movimiento__gte=hace_30_dias)
+                .values('tipo_movimiento').annotate(total=Count('id'), cantidad_total=Sum('cantidad'))),
+            ('Cola de pendientes', vivos.filter(status='PENDIENTE').order_by('-fecha_movimiento')[:50]),
+            ('Por acueducto de origen', vivos.filter(ubicacion_origen__acueducto=acueductos[0])
+                .order_by('-fecha_movimiento', '-id')[:21]),
+        ]
+
+    def _ejecutar(self, sentencias):
+        with connection.cursor() as cursor:
+            for sentencia in sentencias:
+                cursor.execute(str(sentencia))
+            if connection.vendor == 'postgresql':
+                cursor.execute(f"ANALYZE {TABLA}")
+
+    def _medir(self, consultas, options):
+        resultados = []
+        for _, queryset in consultas:
+            # Se mide la consulta y la lectura de filas, no la creación de instancias
+            sql, params = queryset.query.sql_with_params()
+            tiempos = []
+            with connection.cursor() as cursor:
+                for _ in range(options['repeticiones']):
+                    inicio = time.perf_counter()
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+            plan = None
+            if not options['sin_planes']:
+                plan = queryset.explain(analyze=True) if connection.vendor == 'postgresql' else queryset.explain()
+            resultados.append((statistics.median(tiempos), plan))
+        return resultados
+
+    def _informe(self, consultas, antes, despues, options):
+        self.stdout.write('')
+        self.stdout.write(f"{'Consulta':<34}{'Sin índices':>14}{'Con índices':>14}")
+        for (nombre, _), (t_antes, _), (t_despues, _) in zip(consultas, antes, despues):
+            self.stdout.write(f'{nombre:<34}{t_antes:>11.2f} ms{t_despues:>11.2f} ms')
+
+        if options['sin_planes']:
+            return
+        for (nombre, _), (_, plan_antes), (_, plan_despues) in zip(consultas, antes, despues):
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(nombre))
+            self.stdout.write('-- sin índices')
+            self.stdout.write(plan_antes)
+            self.stdout.write('-- con índices')
+            self.stdout.write(plan_despues)
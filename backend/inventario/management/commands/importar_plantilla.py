@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.importacion import ErrorImportacion, TAMANO_BLOQUE, TIPOS_IMPORTACION, importar_csv
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa una plantilla CSV de docs/plantillas_importacion (quimicos, tuberias, bombas, '
+        'accesorios, sucursales o acueductos) con bulk_create por bloques.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=TIPOS_IMPORTACION)
+        parser.add_argument('archivo', help='Ruta del CSV (UTF-8)')
+        parser.add_argument('--dry-run', action='store_true', help='Solo valida, sin escribir.')
+        parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE, help='Filas por bulk_create.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+                resultado = importar_csv(
+                    options['tipo'], archivo, dry_run=options['dry_run'], tamano_bloque=options['bloque']
+                )
+        except (OSError, ErrorImportacion) as e:
+            raise CommandError(str(e))
+
+        for error in resultado['errores']:
+            self.stdout.write(self.style.WARNING(f"Línea {error['fila']}: {error['errores']}"))
+        accion = 'válidas' if options['dry_run'] else 'creadas'
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['filas']} filas leídas, {resultado['creados']} {accion}, "
+            f"{resultado['total_errores']} con errores"
+        ))
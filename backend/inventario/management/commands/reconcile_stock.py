@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from inventario.models import ChemicalProduct, Pipe, PumpAndMotor, Accessory
+from inventario.stock import recalcular_stock_actual, total_stock_expr
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula ProductBase.stock_actual a partir de las tablas de stock por ubicación '
+        '(una consulta agregada por tipo de producto).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Solo reporta los productos desfasados, sin modificarlos.'
+        )
+
+    def handle(self, *args, **options):
+        total_desfasados = 0
+
+        for modelo in (ChemicalProduct, Pipe, PumpAndMotor, Accessory):
+            with transaction.atomic():
+                desfasados = modelo.all_objects.annotate(
+                    stock_real=total_stock_expr(modelo)
+                ).exclude(stock_actual=F('stock_real'))
+                cantidad = desfasados.count()
+                if cantidad and not options['dry_run']:
+                    recalcular_stock_actual(modelo)
+
+            total_desfasados += cantidad
+            self.stdout.write(f"{modelo._meta.verbose_name_plural}: {cantidad} desfasados")
+
+        accion = 'encontrados' if options['dry_run'] else 'corregidos'
+        self.stdout.write(self.style.SUCCESS(f"Productos {accion}: {total_desfasados}"))
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:05
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0004_rename_inventario__marca_b5f1cc_idx_inventario__marca_i_0f8c1f_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accessory',
+            name='stock_actual',
+            field=models.DecimalField(db_index=True, decimal_places=3, default=Decimal('0.000'), help_text='Stock total de todas las ubicaciones (se mantiene con cada movimiento)', max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.000'))]),
+        ),
+        migrations.AlterField(
+            model_name='chemicalproduct',
+            name='stock_actual',
+            field=models.DecimalField(db_index=True, decimal_places=3, default=Decimal('0.000'), help_text='Stock total de todas las ubicaciones (se mantiene con cada movimiento)', max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.000'))]),
+        ),
+        migrations.AlterField(
+            model_name='pipe',
+            name='stock_actual',
+            field=models.DecimalField(db_index=True, decimal_places=3, default=Decimal('0.000'), help_text='Stock total de todas las ubicaciones (se mantiene con cada movimiento)', max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.000'))]),
+        ),
+        migrations.AlterField(
+            model_name='pumpandmotor',
+            name='stock_actual',
+            field=models.DecimalField(db_index=True, decimal_places=3, default=Decimal('0.000'), help_text='Stock total de todas las ubicaciones (se mantiene con cada movimiento)', max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal('0.000'))]),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('geography', '0001_initial'),
+        ('inventario', '0005_stock_actual_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KardexStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('lote', models.CharField(blank=True, max_length=50)),
+                ('cantidad', models.DecimalField(decimal_places=3, help_text='Delta aplicado (negativo en salidas)', max_digits=12)),
+                ('saldo', models.DecimalField(decimal_places=3, help_text='Saldo de la ubicación después del delta', max_digits=12)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='contenttypes.contenttype')),
+                ('movimiento', models.ForeignKey(blank=True, help_text='Vacío en aperturas y ediciones directas de stock', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='kardex', to='inventario.movimientoinventario')),
+                ('ubicacion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='kardex', to='geography.ubicacion')),
+            ],
+            options={
+                'verbose_name': 'Kardex de Stock',
+                'verbose_name_plural': 'Kardex de Stock',
+                'ordering': ['fecha', 'id'],
+                'indexes': [
+                    models.Index(fields=['content_type', 'object_id', 'ubicacion', 'lote', 'fecha'], name='inventario_kardex_clave_idx'),
+                    models.Index(fields=['fecha'], name='inventario_kardex_fecha_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:07
+
+from django.db import migrations
+from django.utils import timezone
+
+from auditoria.particiones import crear_particiones
+
+
+TABLA = 'inventario_kardexstock'
+
+STOCK_MODELS = {
+    'StockChemical': 'chemicalproduct',
+    'StockPipe': 'pipe',
+    'StockPumpAndMotor': 'pumpandmotor',
+    'StockAccessory': 'accessory',
+}
+
+
+def particionar_kardex(apps, schema_editor):
+    """
+    En PostgreSQL recrea la tabla (aún vacía) particionada por rango de ``fecha``,
+    con una partición por defecto y las del mes actual y el siguiente.
+    La PK pasa a ser (id, fecha) porque debe incluir la clave de partición.
+    El id sale de una secuencia propia (``nextval`` como default, igual que
+    ``bigserial``) en lugar de la columna identity de la tabla original.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(
+        f"CREATE TABLE {TABLA}_nueva (LIKE {TABLA} INCLUDING DEFAULTS) PARTITION BY RANGE (fecha)"
+    )
+    schema_editor.execute(f"DROP TABLE {TABLA}")
+    schema_editor.execute(f"ALTER TABLE {TABLA}_nueva RENAME TO {TABLA}")
+    schema_editor.execute(f"CREATE SEQUENCE {TABLA}_id_seq AS bigint OWNED BY {TABLA}.id")
+    schema_editor.execute(f"ALTER TABLE {TABLA} ALTER COLUMN id SET DEFAULT nextval('{TABLA}_id_seq')")
+    schema_editor.execute(f"ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_pkey PRIMARY KEY (id, fecha)")
+    schema_editor.execute(
+        f"CREATE INDEX inventario_kardex_clave_idx ON {TABLA} "
+        f"(content_type_id, object_id, ubicacion_id, lote, fecha)"
+    )
+    schema_editor.execute(f"CREATE INDEX inventario_kardex_fecha_idx ON {TABLA} (fecha)")
+    schema_editor.execute(f"CREATE INDEX {TABLA}_ubicacion_id_idx ON {TABLA} (ubicacion_id)")
+    schema_editor.execute(f"CREATE INDEX {TABLA}_movimiento_id_idx ON {TABLA} (movimiento_id)")
+    for columna, destino in (
+        ('content_type_id', 'django_content_type'),
+        ('ubicacion_id', 'geography_ubicacion'),
+        ('movimiento_id', 'inventario_movimientoinventario'),
+    ):
+        schema_editor.execute(
+            f"ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_{columna}_fk "
+            f"FOREIGN KEY ({columna}) REFERENCES {destino} (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+    schema_editor.execute(f"CREATE TABLE {TABLA}_default PARTITION OF {TABLA} DEFAULT")
+    crear_particiones(TABLA, 'fecha', meses=2, desde=timezone.now().date(), conexion=schema_editor.connection)
+
+
+def abrir_kardex(apps, schema_editor):
+    """Fila de apertura por cada saldo existente, para que el kardex cuadre con Stock*."""
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    KardexStock = apps.get_model('inventario', 'KardexStock')
+    ahora = timezone.now()
+
+    for stock_model_name, producto_model in STOCK_MODELS.items():
+        StockModel = apps.get_model('inventario', stock_model_name)
+        ct, _ = ContentType.objects.get_or_create(app_label='inventario', model=producto_model)
+        tiene_lote = any(f.name == 'lote' for f in StockModel._meta.get_fields())
+        filas = []
+        for stock in StockModel.objects.exclude(cantidad=0).iterator():
+            filas.append(KardexStock(
+                content_type_id=ct.pk, object_id=stock.producto_id,
+                ubicacion_id=stock.ubicacion_id, lote=stock.lote if tiene_lote else '',
+                cantidad=stock.cantidad, saldo=stock.cantidad, fecha=ahora,
+            ))
+        KardexStock.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_kardexstock'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar_kardex, migrations.RunPython.noop),
+        migrations.RunPython(abrir_kardex, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-17 20:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('geography', '0001_initial'),
+        ('inventario', '0007_kardex_particiones_apertura'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoDiarioStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('object_id', models.PositiveIntegerField()),
+                ('lote', models.CharField(blank=True, max_length=50)),
+                ('cantidad', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='contenttypes.contenttype')),
+                ('ubicacion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='saldos_diarios', to='geography.ubicacion')),
+            ],
+            options={
+                'verbose_name': 'Saldo Diario de Stock',
+                'verbose_name_plural': 'Saldos Diarios de Stock',
+                'ordering': ['-fecha'],
+                'unique_together': {('fecha', 'content_type', 'object_id', 'ubicacion', 'lote')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+def sembrar_secuencias(apps, schema_editor):
+    """Una fila por prefijo con el mayor correlativo numérico existente."""
+    SecuenciaSku = apps.get_model('inventario', 'SecuenciaSku')
+    maximos = {}
+    for nombre in ('ChemicalProduct', 'Pipe', 'PumpAndMotor', 'Accessory'):
+        modelo = apps.get_model('inventario', nombre)
+        for sku in modelo.objects.values_list('sku', flat=True).iterator():
+            prefijo, _, sufijo = (sku or '').rpartition('-')
+            if prefijo and sufijo.isdigit():
+                clave = f"{prefijo}-"
+                maximos[clave] = max(maximos.get(clave, 0), int(sufijo))
+    SecuenciaSku.objects.bulk_create(
+        [SecuenciaSku(prefijo=prefijo, ultimo=ultimo) for prefijo, ultimo in maximos.items()],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0008_saldodiariostock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaSku',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefijo', models.CharField(max_length=50, unique=True)),
+                ('ultimo', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Secuencia de SKU',
+                'verbose_name_plural': 'Secuencias de SKU',
+            },
+        ),
+        migrations.RunPython(sembrar_secuencias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_secuenciasku'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(
+                condition=models.Q(('deleted_at__isnull', True)),
+                fields=['-fecha_movimiento', '-id'], name='movimiento_fecha_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_movimiento_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(
+                condition=models.Q(('deleted_at__isnull', True)),
+                fields=['content_type', 'object_id', '-fecha_movimiento'], name='movimiento_producto_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(
+                condition=models.Q(('deleted_at__isnull', True), ('status', 'PENDIENTE')),
+                fields=['-fecha_movimiento'], name='movimiento_pendientes_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(
+                condition=models.Q(('deleted_at__isnull', True)),
+                fields=['ubicacion_origen', '-fecha_movimiento'], name='movimiento_origen_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(
+                condition=models.Q(('deleted_at__isnull', True)),
+                fields=['ubicacion_destino', '-fecha_movimiento'], name='movimiento_destino_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0011_movimiento_indices'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='kardexstock',
+            name='movimiento',
+            field=models.ForeignKey(
+                blank=True, help_text='Vacío en aperturas y ediciones directas de stock', null=True,
+                on_delete=django.db.models.deletion.PROTECT, related_name='kardex',
+                to='inventario.movimientoinventario',
+            ),
+        ),
+    ]
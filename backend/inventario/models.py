@@ -74,6 +74,73 @@ class Supplier(SoftDeleteModel):
         return self.nombre
 
 
+class SecuenciaSku(models.Model):
+    """
+    Último correlativo entregado por prefijo de SKU (``{CATEGORIA}-{TIPO}-``).
+
+    ``reservar`` incrementa la fila con un UPDATE atómico y devuelve el rango
+    reservado; la tabla de productos solo se lee al crear la secuencia.
+
+    El lock de fila del UPDATE dura hasta que se confirma la transacción que
+    lo contiene: en autocommit (alta por la API) solo la reserva, pero dentro
+    de otra transacción (admin, ``ProductBase.save`` en un ``atomic``) hasta
+    su commit, y las altas concurrentes del mismo prefijo esperan. La
+    importación masiva reserva antes de abrir el savepoint de cada bloque.
+    """
+    prefijo = models.CharField(max_length=50, unique=True)
+    ultimo = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Secuencia de SKU'
+        verbose_name_plural = 'Secuencias de SKU'
+
+    def __str__(self):
+        return f"{self.prefijo}{self.ultimo}"
+
+    @staticmethod
+    def separar(sku):
+        """``'ACC-ACC-0012'`` -> ``('ACC-ACC-', 12)``; ``None`` si no termina en número."""
+        prefijo, _, sufijo = (sku or '').rpartition('-')
+        if not prefijo or not sufijo.isdigit():
+            return None
+        return f"{prefijo}-", int(sufijo)
+
+    @classmethod
+    def _crear(cls, modelo, prefijo):
+        ultimo = 0
+        for sku in modelo.all_objects.filter(sku__startswith=prefijo).values_list('sku', flat=True).iterator():
+            partes = cls.separar(sku)
+            if partes and partes[0] == prefijo:
+                ultimo = max(ultimo, partes[1])
+        # ignore_conflicts: si otro proceso la creó primero, se usa la suya
+        cls.objects.bulk_create([cls(prefijo=prefijo, ultimo=ultimo)], ignore_conflicts=True)
+
+    @classmethod
+    def reservar(cls, modelo, prefijo, cantidad=1):
+        """Reserva ``cantidad`` números consecutivos para ``prefijo``; devuelve un ``range``."""
+        with transaction.atomic():
+            filas = cls.objects.filter(prefijo=prefijo)
+            if not filas.update(ultimo=models.F('ultimo') + cantidad):
+                cls._crear(modelo, prefijo)
+                filas.update(ultimo=models.F('ultimo') + cantidad)
+            ultimo = filas.values_list('ultimo', flat=True).get()
+        return range(ultimo - cantidad + 1, ultimo + 1)
+
+    @classmethod
+    def registrar_existentes(cls, skus):
+        """
+        Adelanta las secuencias ya creadas para que no entreguen números que
+        llegaron con SKU explícito (altas manuales, importaciones).
+        """
+        maximos = {}
+        for sku in skus:
+            partes = cls.separar(sku)
+            if partes:
+                maximos[partes[0]] = max(maximos.get(partes[0], 0), partes[1])
+        for prefijo, numero in maximos.items():
+            cls.objects.filter(prefijo=prefijo, ultimo__lt=numero).update(ultimo=numero)
+
+
 # ============================================================================
 # MODELO BASE ABSTRACTO
 # ============================================================================
@@ -111,7 +178,8 @@ class ProductBase(SoftDeleteModel):
         decimal_places=3,
         default=Decimal('0.000'),
         validators=[MinValueValidator(Decimal('0.000'))],
-        help_text='Stock actual disponible'
+        db_index=True,
+        help_text='Stock total de todas las ubicaciones (se mantiene con cada movimiento)'
     )
     stock_minimo = models.DecimalField(
         max_digits=12,
@@ -163,38 +231,64 @@ class ProductBase(SoftDeleteModel):
         if self.precio_unitario < 0:
             raise ValidationError('El precio unitario no puede ser negativo')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._dashboard_leido = instance._estado_dashboard()
+        return instance
+
+    def _estado_dashboard(self):
+        """Lo que de este producto cuenta en el dashboard; ``None`` si no está cargado."""
+        if {'deleted_at', 'stock_minimo'} & self.get_deferred_fields():
+            return None
+        return (self.deleted_at is None, self.stock_minimo)
+
     def save(self, *args, **kwargs):
         # Generar SKU si no existe
         if not self.sku:
             self.sku = self.generate_sku()
+        elif self._state.adding:
+            SecuenciaSku.registrar_existentes([self.sku])
         
+        self.calcular_campos_derivados()
         self.full_clean()
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # stock_actual lo mantienen los movimientos con UPDATE ... F(): escribir el
+            # valor leído antes pisaría los ajustes concurrentes
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'stock_actual'
+            ]
         super().save(*args, **kwargs)
+        # Solo altas, bajas (soft delete), restauraciones y cambios de stock_minimo
+        # cambian el dashboard; editar precio o descripción no lo invalida
+        estado = self._estado_dashboard()
+        if estado is None or estado != getattr(self, '_dashboard_leido', None):
+            from inventario.dashboard import invalidar_dashboard_al_confirmar
+            invalidar_dashboard_al_confirmar()
+        self._dashboard_leido = estado
+
+    def calcular_campos_derivados(self):
+        """Campos calculados a partir de otros (también lo usa la importación masiva)."""
+
+    @classmethod
+    def prefijo_sku(cls, categoria):
+        return f"{categoria.codigo if categoria else 'GEN'}-{cls.__name__[:3].upper()}-"
+
+    @classmethod
+    def reservar_skus(cls, categoria, cantidad):
+        """Reserva ``cantidad`` SKUs consecutivos para ``categoria`` (importaciones masivas)."""
+        prefijo = cls.prefijo_sku(categoria)
+        return [f"{prefijo}{numero:04d}" for numero in SecuenciaSku.reservar(cls, prefijo, cantidad)]
 
     def generate_sku(self):
         """
         Genera un SKU único basado en categoría y correlativo.
         Formato: {CATEGORIA_CODE}-{TIPO}-{CORRELATIVO}
+        El correlativo sale de SecuenciaSku (sin recorrer la tabla de productos).
         """
-        categoria_code = self.categoria.codigo if self.categoria else 'GEN'
-        tipo_code = self.__class__.__name__[:3].upper()
-        
-        # Buscar último correlativo para esta categoría
-        model_class = self.__class__
-        last_product = model_class.objects.filter(
-            sku__startswith=f"{categoria_code}-{tipo_code}-"
-        ).order_by('-sku').first()
-        
-        if last_product:
-            try:
-                last_number = int(last_product.sku.split('-')[-1])
-                new_number = last_number + 1
-            except (ValueError, IndexError):
-                new_number = 1
-        else:
-            new_number = 1
-        
-        return f"{categoria_code}-{tipo_code}-{new_number:04d}"
+        categoria = self.categoria if self.categoria_id else None
+        return self.reservar_skus(categoria, 1)[0]
 
     def get_stock_status(self):
         """
@@ -431,7 +525,7 @@ class Pipe(ProductBase):
             models.Index(fields=['tipo_uso']),
         ]
 
-    def save(self, *args, **kwargs):
+    def calcular_campos_derivados(self):
         # Calcular presión en PSI si está en PN
         if self.presion_nominal.startswith('PN'):
             try:
@@ -439,7 +533,6 @@ class Pipe(ProductBase):
                 self.presion_psi = Decimal(str(bar * 14.5038)).quantize(Decimal('0.00'))
             except:
                 pass
-        super().save(*args, **kwargs)
 
     def get_diametro_display(self):
         """Retorna el diámetro con su unidad."""
@@ -587,10 +680,12 @@ class PumpAndMotor(ProductBase):
         if (not self.categoria_id) or (self.categoria_id != bom.id):
             self.categoria = bom
 
+        super().save(*args, **kwargs)
+
+    def calcular_campos_derivados(self):
         # Calcular potencia en kW automáticamente
         if self.potencia_hp:
             self.potencia_kw = (self.potencia_hp * Decimal('0.7457')).quantize(Decimal('0.01'))
-        super().save(*args, **kwargs)
 
     def get_potencia_display(self):
         """Retorna potencia en ambas unidades."""
@@ -1006,6 +1101,35 @@ class MovimientoInventario(SoftDeleteModel):
         verbose_name = 'Movimiento de Inventario'
         verbose_name_plural = 'Movimientos de Inventario'
         ordering = ['-fecha_movimiento']
+        # Todas parciales sobre los no eliminados (lo que lee ``objects``).
+        # ``manage.py benchmark_movimientos`` compara planes con y sin ellas.
+        indexes = [
+            # Listado por cursor (MovimientoPagination) y rangos de fecha
+            # (movimientos_recientes, resumen_movimientos)
+            models.Index(
+                fields=['-fecha_movimiento', '-id'], name='movimiento_fecha_idx',
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+            # Historial de un producto (acciones ``history``)
+            models.Index(
+                fields=['content_type', 'object_id', '-fecha_movimiento'], name='movimiento_producto_idx',
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+            # Cola de aprobación: pocas filas, el índice queda chico
+            models.Index(
+                fields=['-fecha_movimiento'], name='movimiento_pendientes_idx',
+                condition=models.Q(status='PENDIENTE', deleted_at__isnull=True),
+            ),
+            # Filtros por acueducto de origen/destino (vía la ubicación)
+            models.Index(
+                fields=['ubicacion_origen', '-fecha_movimiento'], name='movimiento_origen_idx',
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+            models.Index(
+                fields=['ubicacion_destino', '-fecha_movimiento'], name='movimiento_destino_idx',
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+        ]
 
     def __init__(self, *args, **kwargs):
         # Compatibilidad con kwargs legacy
@@ -1031,6 +1155,31 @@ class MovimientoInventario(SoftDeleteModel):
     def __str__(self):
         return f"{self.tipo_movimiento} {self.cantidad} - {self.producto}"
 
+    # Columnas del producto que usan los listados (``ProductBase.__str__``)
+    CAMPOS_PRODUCTO_LISTADO = ('id', 'sku', 'nombre')
+
+    @classmethod
+    def para_listado(cls, queryset=None):
+        """
+        Queryset de movimientos listo para serializar sin N+1.
+
+        Une ubicaciones, acueductos, usuario y content type, y precarga el
+        producto genérico con una consulta por tipo de producto trayendo solo
+        las columnas que se muestran. Incluye productos dados de baja.
+        """
+        from django.contrib.contenttypes.prefetch import GenericPrefetch
+
+        if queryset is None:
+            queryset = cls.objects.all()
+        productos = [
+            modelo.all_objects.only(*cls.CAMPOS_PRODUCTO_LISTADO)
+            for modelo in (ChemicalProduct, Pipe, PumpAndMotor, Accessory)
+        ]
+        return queryset.select_related(
+            'ubicacion_origen__acueducto', 'ubicacion_destino__acueducto',
+            'creado_por', 'content_type'
+        ).prefetch_related(GenericPrefetch('producto', productos))
+
     def get_stock_model(self):
         """Determina el modelo de stock basado en el producto."""
         model_name = self.content_type.model
@@ -1045,36 +1194,63 @@ class MovimientoInventario(SoftDeleteModel):
         raise ValidationError(f"Tipo de producto no soportado: {model_name}")
 
     def _update_stock(self, stock_model, ubicacion, cantidad, operacion):
-        """Actualiza o crea registro de stock."""
-        stock, created = stock_model.objects.get_or_create(
-            producto_id=self.object_id,
-            ubicacion=ubicacion,
-            defaults={'cantidad': 0}
-        )
-        
+        """Actualiza o crea registro de stock con un UPDATE condicional."""
+        from inventario.stock import sumar_stock, restar_stock
+
+        ubicacion_id = getattr(ubicacion, 'pk', ubicacion)
         if operacion == 'sumar':
-            stock.cantidad += cantidad
+            sumar_stock(stock_model, self.object_id, ubicacion_id, cantidad)
         elif operacion == 'restar':
-            if stock.cantidad < cantidad:
-                raise ValidationError(f"Stock insuficiente en {ubicacion}")
-            stock.cantidad -= cantidad
-            
-        stock.save()
+            restar_stock(stock_model, self.object_id, ubicacion_id, cantidad)
+
+    def get_stock_deltas(self):
+        """
+        Deltas de stock que produce este movimiento al aprobarse.
+
+        Returns:
+            list[StockDelta]: cantidades positivas suman y negativas restan.
+        """
+        from inventario.stock import StockDelta
+
+        StockModel = self.get_stock_model()
+
+        def delta(ubicacion, cantidad):
+            return StockDelta(StockModel, self.object_id, ubicacion.pk, cantidad, movimiento_id=self.pk)
+
+        if self.tipo_movimiento == self.T_ENTRADA:
+            if not self.ubicacion_destino:
+                raise ValidationError("Destino requerido para entrada")
+            return [delta(self.ubicacion_destino, self.cantidad)]
+
+        elif self.tipo_movimiento == self.T_SALIDA:
+            if not self.ubicacion_origen:
+                raise ValidationError("Origen requerido para salida")
+            return [delta(self.ubicacion_origen, -self.cantidad)]
+
+        elif self.tipo_movimiento == self.T_TRANSFER:
+            if not self.ubicacion_origen or not self.ubicacion_destino:
+                raise ValidationError("Origen y Destino requeridos para transferencia")
+            return [
+                delta(self.ubicacion_origen, -self.cantidad),
+                delta(self.ubicacion_destino, self.cantidad),
+            ]
+
+        elif self.tipo_movimiento == self.T_AJUSTE:
+            if self.ubicacion_destino:
+                return [delta(self.ubicacion_destino, self.cantidad)]
+            elif self.ubicacion_origen:
+                return [delta(self.ubicacion_origen, -self.cantidad)]
+        return []
 
     def save(self, *args, **kwargs):
+        from inventario.stock import aplicar_deltas
+
         is_new = self.pk is None
-        old_status = None
-        if not is_new:
-            old_instance = MovimientoInventario.objects.get(pk=self.pk)
-            old_status = old_instance.status
 
         try:
             StockModel = self.get_stock_model()
         except Exception as e:
             raise e
-        
-        should_update_stock = (is_new and self.status == self.STATUS_APROBADO) or \
-                              (not is_new and old_status == self.STATUS_PENDIENTE and self.status == self.STATUS_APROBADO)
 
         audit = None
         if is_new:
@@ -1092,35 +1268,30 @@ class MovimientoInventario(SoftDeleteModel):
 
         try:
             with transaction.atomic():
+                old_status = None
+                if not is_new:
+                    # Bloquear la fila del movimiento: dos aprobaciones simultáneas
+                    # del mismo movimiento no deben aplicar el stock dos veces.
+                    old_status = MovimientoInventario.all_objects.select_for_update().values_list(
+                        'status', flat=True
+                    ).get(pk=self.pk)
+
+                should_update_stock = (is_new and self.status == self.STATUS_APROBADO) or \
+                                      (not is_new and old_status == self.STATUS_PENDIENTE and self.status == self.STATUS_APROBADO)
+
                 super().save(*args, **kwargs)
+                if not is_new:
+                    # Las páginas del historial en caché pueden incluir este movimiento
+                    from inventario.historial import invalidar_historial_al_confirmar
+                    invalidar_historial_al_confirmar(self.content_type_id, self.object_id)
                 
                 if is_new and audit:
                     audit.movimiento = self
                     audit.save()
 
                 if should_update_stock:
-                    if self.tipo_movimiento == self.T_ENTRADA:
-                        if not self.ubicacion_destino:
-                            raise ValidationError("Destino requerido para entrada")
-                        self._update_stock(StockModel, self.ubicacion_destino, self.cantidad, 'sumar')
-
-                    elif self.tipo_movimiento == self.T_SALIDA:
-                        if not self.ubicacion_origen:
-                            raise ValidationError("Origen requerido para salida")
-                        self._update_stock(StockModel, self.ubicacion_origen, self.cantidad, 'restar')
-
-                    elif self.tipo_movimiento == self.T_TRANSFER:
-                        if not self.ubicacion_origen or not self.ubicacion_destino:
-                            raise ValidationError("Origen y Destino requeridos para transferencia")
-                        
-                        self._update_stock(StockModel, self.ubicacion_origen, self.cantidad, 'restar')
-                        self._update_stock(StockModel, self.ubicacion_destino, self.cantidad, 'sumar')
-
-                    elif self.tipo_movimiento == self.T_AJUSTE:
-                        if self.ubicacion_destino:
-                            self._update_stock(StockModel, self.ubicacion_destino, self.cantidad, 'sumar')
-                        elif self.ubicacion_origen:
-                            self._update_stock(StockModel, self.ubicacion_origen, self.cantidad, 'restar')
+                    # Un UPDATE condicional por fila, en orden determinista de locks
+                    aplicar_deltas(self.get_stock_deltas())
 
                     # Lógica para Orden de Compra/Transferencia (Modularizada en app 'compras')
                     if self.tipo_movimiento == self.T_TRANSFER:
@@ -1152,6 +1323,8 @@ class MovimientoInventario(SoftDeleteModel):
 
         except Exception as e:
             if audit:
+                # El movimiento nuevo se revirtió junto con la transacción
+                audit.movimiento = None
                 audit.status = InventoryAudit.STATUS_FAILED
                 audit.mensaje = str(e)
                 try:
@@ -1159,6 +1332,241 @@ class MovimientoInventario(SoftDeleteModel):
                 except:
                     pass
             raise e
+
+    def hard_delete(self):
+        from inventario.historial import invalidar_historial_al_confirmar
+        invalidar_historial_al_confirmar(self.content_type_id, self.object_id)
+        super().hard_delete()
+
+    @classmethod
+    def aprobar_lote(cls, ids, usuario=None):
+        """
+        Aprueba varios movimientos pendientes en una sola transacción.
+
+        Los saldos afectados se bloquean una vez, cada movimiento se valida
+        contra el saldo acumulado del lote (en el orden recibido) y los deltas
+        de los aprobados se aplican con un único UPDATE por fila de stock.
+        Auditorías, órdenes de compra y fichas técnicas se crean en bloque y
+        el historial en caché de cada producto afectado se descarta al confirmar.
+
+        Returns:
+            list[dict]: un resultado por id, ``{'id', 'status'[, 'error']}``.
+        """
+        from auditoria.utils import log_update_masivo
+        from inventario.historial import invalidar_historial_al_confirmar
+        from inventario.stock import agrupar_deltas, aplicar_deltas, bloquear_saldos, clave_delta
+
+        ids = list(dict.fromkeys(ids))
+        errores = {}
+
+        with transaction.atomic():
+            movimientos = {
+                m.pk: m for m in cls.objects.select_for_update(of=('self',)).select_related(
+                    'content_type', 'ubicacion_origen__acueducto', 'ubicacion_destino__acueducto',
+                    'creado_por'
+                ).prefetch_related('producto').filter(pk__in=ids)
+            }
+
+            deltas_por_movimiento = {}
+            for pk in ids:
+                movimiento = movimientos.get(pk)
+                if movimiento is None:
+                    errores[pk] = 'Movimiento no encontrado'
+                elif movimiento.status != cls.STATUS_PENDIENTE:
+                    errores[pk] = 'Solo se pueden aprobar movimientos en estado PENDIENTE'
+                elif movimiento.tipo_movimiento == cls.T_TRANSFER and not movimiento.creado_por_id:
+                    errores[pk] = 'La transferencia requiere un solicitante para su orden de compra'
+                else:
+                    try:
+                        deltas_por_movimiento[pk] = agrupar_deltas(movimiento.get_stock_deltas())
+                    except ValidationError as e:
+                        errores[pk] = '; '.join(e.messages)
+
+            saldos = bloquear_saldos(
+                [d for deltas in deltas_por_movimiento.values() for d in deltas]
+            )
+            aprobados = []
+            for pk, deltas in deltas_por_movimiento.items():
+                if any(d.cantidad < 0 and saldos.get(clave_delta(d), 0) + d.cantidad < 0 for d in deltas):
+                    errores[pk] = f"Stock insuficiente en {movimientos[pk].ubicacion_origen}"
+                    continue
+                for d in deltas:
+                    saldos[clave_delta(d)] = saldos.get(clave_delta(d), 0) + d.cantidad
+                aprobados.append(movimientos[pk])
+
+            aplicar_deltas([d for m in aprobados for d in deltas_por_movimiento[m.pk]])
+
+            ids_aprobados = {m.pk for m in aprobados}
+            cambios = {'status': cls.STATUS_APROBADO, 'aprobado_por': usuario}
+            cls.objects.filter(pk__in=ids_aprobados).update(**cambios)
+            log_update_masivo(aprobados, cambios)
+            for movimiento in aprobados:
+                movimiento.status = cls.STATUS_APROBADO
+                movimiento.aprobado_por = usuario
+            # El UPDATE no pasa por save(): se descarta aquí el historial en caché
+            for content_type_id, object_id in {(m.content_type_id, m.object_id) for m in aprobados}:
+                invalidar_historial_al_confirmar(content_type_id, object_id)
+
+            InventoryAudit.objects.bulk_create([
+                InventoryAudit(
+                    movimiento=m,
+                    content_type=m.content_type,
+                    object_id=m.object_id,
+                    tipo_movimiento=m.tipo_movimiento,
+                    cantidad=m.cantidad,
+                    ubicacion_origen=m.ubicacion_origen,
+                    ubicacion_destino=m.ubicacion_destino,
+                    user=usuario,
+                    status=InventoryAudit.STATUS_FAILED if m.pk in errores else InventoryAudit.STATUS_SUCCESS,
+                    mensaje=errores.get(m.pk, 'Aprobado en lote'),
+                )
+                for m in movimientos.values() if m.pk in errores or m.pk in ids_aprobados
+            ])
+
+            transferencias = [m for m in aprobados if m.tipo_movimiento == cls.T_TRANSFER]
+            cls._crear_ordenes_transferencia(transferencias)
+            cls._actualizar_fichas_transferencia(
+                [m for m in transferencias if m.content_type.model == 'pumpandmotor']
+            )
+
+        return [
+            {'id': pk, 'status': 'ERROR', 'error': errores[pk]} if pk in errores
+            else {'id': pk, 'status': cls.STATUS_APROBADO}
+            for pk in ids
+        ]
+
+    @classmethod
+    def _crear_ordenes_transferencia(cls, movimientos):
+        """Crea en bloque las órdenes de compra de transferencias aprobadas."""
+        if not movimientos:
+            return
+        try:
+            from compras.models import OrdenCompra
+        except ImportError:
+            return
+        codigos = OrdenCompra.generar_codigos(len(movimientos))
+        OrdenCompra.objects.bulk_create([
+            OrdenCompra(
+                codigo=codigo,
+                movimiento=m,
+                solicitante=m.creado_por,
+                aprobador=m.aprobado_por,
+                notas=f"Transferencia de {m.producto} de {m.ubicacion_origen} a {m.ubicacion_destino}."
+            )
+            for codigo, m in zip(codigos, movimientos)
+        ])
+
+    @classmethod
+    def _actualizar_fichas_transferencia(cls, movimientos):
+        """Actualiza en bloque las fichas técnicas de bombas/motores transferidos."""
+        if not movimientos:
+            return
+        fichas = FichaTecnicaMotor.objects.in_bulk(
+            [m.object_id for m in movimientos], field_name='equipo_id'
+        )
+        nuevas = {}
+        hoy = timezone.now().date()
+        for m in movimientos:
+            ficha = fichas.get(m.object_id) or nuevas.setdefault(
+                m.object_id, FichaTecnicaMotor(equipo_id=m.object_id)
+            )
+            if m.ubicacion_destino.tipo == Ubicacion.TipoUbicacion.INSTALACION:
+                ficha.estado_actual = 'Instalado'
+                if not ficha.fecha_instalacion:
+                    ficha.fecha_instalacion = hoy
+            else:
+                ficha.estado_actual = 'En Almacén'
+        FichaTecnicaMotor.objects.bulk_create(nuevas.values())
+        FichaTecnicaMotor.objects.bulk_update(
+            fichas.values(), ['estado_actual', 'fecha_instalacion']
+        )
+
+
+class KardexStock(models.Model):
+    """
+    Libro de stock (kardex) de solo inserción.
+
+    Una fila por cada delta aplicado sobre una fila Stock*, con el saldo que
+    dejó. Las tablas Stock* son el saldo materializado de este libro; el stock
+    a una fecha es la última fila de cada (producto, ubicación, lote) hasta esa
+    fecha (``inventario.stock.saldos_a_fecha``). En PostgreSQL la tabla está
+    particionada por mes sobre ``fecha`` (comando ``crear_particiones_kardex``).
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
+    object_id = models.PositiveIntegerField()
+    producto = GenericForeignKey('content_type', 'object_id')
+    ubicacion = models.ForeignKey(
+        'geography.Ubicacion', on_delete=models.PROTECT, related_name='kardex'
+    )
+    lote = models.CharField(max_length=50, blank=True)
+    cantidad = models.DecimalField(
+        max_digits=12, decimal_places=3,
+        help_text='Delta aplicado (negativo en salidas)'
+    )
+    saldo = models.DecimalField(
+        max_digits=12, decimal_places=3,
+        help_text='Saldo de la ubicación después del delta'
+    )
+    # PROTECT: el libro no se reescribe; un movimiento que aplicó stock no se borra físicamente
+    movimiento = models.ForeignKey(
+        MovimientoInventario, on_delete=models.PROTECT, null=True, blank=True,
+        related_name='kardex', help_text='Vacío en aperturas y ediciones directas de stock'
+    )
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Kardex de Stock'
+        verbose_name_plural = 'Kardex de Stock'
+        ordering = ['fecha', 'id']
+        indexes = [
+            models.Index(
+                fields=['content_type', 'object_id', 'ubicacion', 'lote', 'fecha'],
+                name='inventario_kardex_clave_idx'
+            ),
+            models.Index(fields=['fecha'], name='inventario_kardex_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha:%Y-%m-%d %H:%M} {self.cantidad:+} → {self.saldo}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError('El kardex es de solo inserción')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError('El kardex es de solo inserción')
+
+
+class SaldoDiarioStock(models.Model):
+    """
+    Foto diaria del stock por (producto, ubicación, lote) al cierre de ``fecha``.
+
+    La genera la tarea ``inventario.tasks.generar_saldos_diarios``; solo se
+    guardan saldos distintos de cero. El stock a una fecha pasada se obtiene
+    de la foto más cercana más los deltas del kardex desde entonces
+    (``inventario.stock.stock_a_fecha``).
+    """
+    fecha = models.DateField()
+    content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
+    object_id = models.PositiveIntegerField()
+    producto = GenericForeignKey('content_type', 'object_id')
+    ubicacion = models.ForeignKey(
+        'geography.Ubicacion', on_delete=models.PROTECT, related_name='saldos_diarios'
+    )
+    lote = models.CharField(max_length=50, blank=True)
+    cantidad = models.DecimalField(max_digits=12, decimal_places=3)
+
+    class Meta:
+        verbose_name = 'Saldo Diario de Stock'
+        verbose_name_plural = 'Saldos Diarios de Stock'
+        ordering = ['-fecha']
+        unique_together = ('fecha', 'content_type', 'object_id', 'ubicacion', 'lote')
+
+    def __str__(self):
+        return f"{self.fecha} {self.content_type.model}#{self.object_id} @ {self.ubicacion_id}: {self.cantidad}"
+
+
 # Los modelos Tuberia, Equipo, StockTuberia, StockEquipo, MovimientoInventario
 # se mantienen en models.py original para compatibilidad durante la transición
 
@@ -13,6 +13,7 @@ from inventario.models import (
     FichaTecnicaMotor, RegistroMantenimiento
 )
 from catalogo.models import CategoriaProducto, Marca
+from geography.models import Ubicacion
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
@@ -207,7 +208,7 @@ class ChemicalProductSerializer(ProductBaseSerializer):
         ]
         read_only_fields = [
             'id', 'sku', 'creado_en', 'actualizado_en',
-            'stock_status', 'stock_percentage', 'valor_total'
+            'stock_actual', 'stock_status', 'stock_percentage', 'valor_total'
         ]
     
     def validate(self, data):
@@ -267,7 +268,7 @@ class PipeSerializer(ProductBaseSerializer):
         ]
         read_only_fields = [
             'id', 'sku', 'presion_psi', 'creado_en', 'actualizado_en',
-            'stock_status', 'stock_percentage', 'valor_total'
+            'stock_actual', 'stock_status', 'stock_percentage', 'valor_total'
         ]
 
     def get_material_display(self, obj):
@@ -324,7 +325,7 @@ class PumpAndMotorSerializer(ProductBaseSerializer):
         ]
         read_only_fields = [
             'id', 'sku', 'potencia_kw', 'creado_en', 'actualizado_en',
-            'stock_status', 'stock_percentage', 'valor_total'
+            'stock_actual', 'stock_status', 'stock_percentage', 'valor_total'
         ]
 
     def get_tipo_equipo_display(self, obj):
@@ -367,7 +368,7 @@ class AccessorySerializer(ProductBaseSerializer):
         ]
         read_only_fields = [
             'id', 'sku', 'creado_en', 'actualizado_en',
-            'stock_status', 'stock_percentage', 'valor_total'
+            'stock_actual', 'stock_status', 'stock_percentage', 'valor_total'
         ]
 
     def get_tipo_accesorio_display(self, obj):
@@ -472,6 +473,146 @@ class StockAccessorySerializer(serializers.ModelSerializer):
 # SERIALIZERS DE MOVIMIENTOS
 # ============================================================================
 
+PRODUCT_TYPE_MAP = {
+    'chemical': 'chemicalproduct',
+    'pipe': 'pipe',
+    'pump': 'pumpandmotor',
+    'accessory': 'accessory'
+}
+
+
+def content_type_for_product_type(product_type):
+    """ContentType del tipo de producto (usa la caché de ContentType, sin consulta repetida)."""
+    from django.contrib.contenttypes.models import ContentType
+
+    try:
+        return ContentType.objects.get_by_natural_key('inventario', PRODUCT_TYPE_MAP[product_type])
+    except ContentType.DoesNotExist:
+        raise serializers.ValidationError({'product_type': 'ContentType no encontrado'})
+
+
+class UbicacionLoteField(serializers.PrimaryKeyRelatedField):
+    """
+    PK de Ubicacion que, dentro de un lote (``many=True``), se resuelve contra
+    las ubicaciones precargadas por el ListSerializer en una sola consulta.
+    """
+
+    def to_internal_value(self, data):
+        precargadas = getattr(self.root, '_ubicaciones_lote', None)
+        if precargadas is not None:
+            try:
+                return precargadas[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
+
+class MovimientoInventarioListSerializer(serializers.ListSerializer):
+    """
+    Creación masiva de movimientos (``POST /api/movimientos/`` con una lista).
+
+    Valida la existencia de los productos con una consulta ``IN`` por tipo,
+    resuelve las ubicaciones en una sola consulta e inserta movimientos y
+    auditorías con ``bulk_create``. Los errores se reportan por fila.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            ids = set()
+            for item in data:
+                if isinstance(item, dict):
+                    ids.update(item.get(campo) for campo in ('ubicacion_origen', 'ubicacion_destino'))
+            ids = {i for i in ids if isinstance(i, int) or (isinstance(i, str) and i.isdigit())}
+            self._ubicaciones_lote = Ubicacion.objects.select_related('acueducto').in_bulk(ids)
+        return self._resolver_productos(super().to_internal_value(data))
+
+    def _resolver_productos(self, attrs):
+        """
+        Asigna ``producto`` a cada fila validada.
+
+        Se hace en ``to_internal_value`` (y no en ``validate``) para que los
+        errores se devuelvan como lista por fila y no bajo ``non_field_errors``.
+        """
+        ids_por_tipo = {}
+        for item in attrs:
+            ids_por_tipo.setdefault(item['product_type'], set()).add(item['product_id'])
+
+        productos = {}
+        for product_type, ids in ids_por_tipo.items():
+            ct = content_type_for_product_type(product_type)
+            productos[product_type] = ct.get_all_objects_for_this_type(id__in=ids).in_bulk()
+
+        errores = []
+        for item in attrs:
+            producto = productos[item['product_type']].get(item['product_id'])
+            if producto is None:
+                errores.append({'product_id': [
+                    f"El producto con ID {item['product_id']} no existe para el tipo {item['product_type']}"
+                ]})
+            else:
+                item['producto'] = producto
+                errores.append({})
+        if any(errores):
+            raise serializers.ValidationError(errores)
+        return attrs
+
+    def create(self, validated_data):
+        from django.db import transaction
+        from inventario.models import MovimientoInventario, InventoryAudit
+
+        request = self.context.get('request')
+        usuario = request.user if request and hasattr(request, 'user') else None
+
+        movimientos = []
+        por_aprobar = []
+        for attrs in validated_data:
+            attrs = dict(attrs)
+            attrs.pop('product_type')
+            attrs.pop('product_id')
+            producto = attrs.pop('producto')
+            status = attrs.pop('status', MovimientoInventario.STATUS_PENDIENTE)
+            movimiento = MovimientoInventario(
+                creado_por=usuario, status=MovimientoInventario.STATUS_PENDIENTE, **attrs
+            )
+            movimiento.producto = producto
+            movimientos.append(movimiento)
+            if status == MovimientoInventario.STATUS_APROBADO:
+                por_aprobar.append(movimiento)
+
+        with transaction.atomic():
+            MovimientoInventario.objects.bulk_create(movimientos)
+            InventoryAudit.objects.bulk_create([
+                InventoryAudit(
+                    movimiento=m,
+                    content_type=m.content_type,
+                    object_id=m.object_id,
+                    tipo_movimiento=m.tipo_movimiento,
+                    cantidad=m.cantidad,
+                    ubicacion_origen=m.ubicacion_origen,
+                    ubicacion_destino=m.ubicacion_destino,
+                    user=usuario,
+                    status=InventoryAudit.STATUS_SUCCESS,
+                )
+                for m in movimientos
+            ])
+
+            if por_aprobar:
+                resultados = MovimientoInventario.aprobar_lote(
+                    [m.pk for m in por_aprobar], usuario=usuario
+                )
+                fallidos = {r['id']: r['error'] for r in resultados if r['status'] == 'ERROR'}
+                if fallidos:
+                    raise serializers.ValidationError([
+                        {'non_field_errors': [fallidos[m.pk]]} if m.pk in fallidos else {}
+                        for m in movimientos
+                    ])
+                for movimiento in por_aprobar:
+                    movimiento.status = MovimientoInventario.STATUS_APROBADO
+                    movimiento.aprobado_por = usuario
+
+        return movimientos
+
+
 class MovimientoInventarioSerializer(serializers.ModelSerializer):
     """Serializer para movimientos de inventario con soporte genérico."""
     producto_str = serializers.SerializerMethodField()
@@ -492,9 +633,14 @@ class MovimientoInventarioSerializer(serializers.ModelSerializer):
     product_type = serializers.CharField(write_only=True)  # 'chemical', 'pipe', 'pump', 'accessory'
     product_id = serializers.IntegerField(write_only=True)
 
+    # Ubicaciones resueltas en bloque cuando se crea una lista de movimientos
+    ubicacion_origen = UbicacionLoteField(queryset=Ubicacion.objects.all(), required=False, allow_null=True)
+    ubicacion_destino = UbicacionLoteField(queryset=Ubicacion.objects.all(), required=False, allow_null=True)
+
     class Meta:
         from inventario.models import MovimientoInventario
         model = MovimientoInventario
+        list_serializer_class = MovimientoInventarioListSerializer
         fields = [
             'id', 'tipo_movimiento', 'cantidad', 'fecha_movimiento',
             'ubicacion_origen', 'acueducto_origen', 'acueducto_origen_nombre',
@@ -536,29 +682,17 @@ class MovimientoInventarioSerializer(serializers.ModelSerializer):
             return obj.ubicacion_destino.acueducto.nombre
         return None
 
+    def validate_product_type(self, value):
+        if value not in PRODUCT_TYPE_MAP:
+            raise serializers.ValidationError('Tipo inválido')
+        return value
+
     def create(self, validated_data):
         product_type = validated_data.pop('product_type')
 
         product_id = validated_data.pop('product_id')
         
-        # Mapear string a ContentType
-        from django.contrib.contenttypes.models import ContentType
-        
-        type_map = {
-            'chemical': 'chemicalproduct',
-            'pipe': 'pipe',
-            'pump': 'pumpandmotor',
-            'accessory': 'accessory'
-        }
-        
-        if product_type not in type_map:
-            raise serializers.ValidationError({'product_type': 'Tipo inválido'})
-            
-        try:
-            ct = ContentType.objects.get(app_label='inventario', model=type_map[product_type])
-        except ContentType.DoesNotExist:
-             raise serializers.ValidationError({'product_type': 'ContentType no encontrado'})
-             
+        ct = content_type_for_product_type(product_type)
         validated_data['content_type'] = ct
         validated_data['object_id'] = product_id
         
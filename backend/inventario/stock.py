@@ -0,0 +1,447 @@
+"""
+Motor de mutación de stock.
+
+Aplica deltas sobre las tablas Stock* con un único UPDATE condicional
+(``cantidad = cantidad - x WHERE cantidad >= x``). La validación de stock
+suficiente la hace la base de datos dentro del mismo UPDATE, por lo que dos
+aprobaciones concurrentes (en distintos workers de gunicorn/daphne) no pueden
+dejar una fila en negativo ni perder una actualización.
+
+Los deltas se aplican siempre en un orden determinista (modelo, producto,
+ubicación, lote) para que dos transferencias cruzadas (A→B y B→A) tomen los
+locks de fila en el mismo orden y no se produzcan deadlocks.
+
+``ProductBase.stock_actual`` es el total desnormalizado de todas las
+ubicaciones; se ajusta con el neto por producto en la misma transacción que
+los deltas, y ``recalcular_stock_actual`` lo reconstruye desde las tablas Stock*.
+
+Cada delta aplicado deja además una fila en ``KardexStock`` (libro de solo
+inserción) con el saldo resultante; las tablas Stock* son el saldo
+materializado de ese libro y ``saldos_a_fecha`` responde el stock a una fecha.
+Para reportes por día, ``stock_a_fecha`` parte de la foto diaria más cercana
+(``SaldoDiarioStock``) y suma solo los deltas del kardex posteriores.
+"""
+from collections import namedtuple, OrderedDict, defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DecimalField, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventario.dashboard import invalidar_dashboard_al_confirmar
+from notificaciones.alertas import revisar_umbrales_al_confirmar
+
+StockDelta = namedtuple(
+    'StockDelta',
+    ['stock_model', 'producto_id', 'ubicacion_id', 'cantidad', 'lote', 'movimiento_id'],
+    defaults=['', None],
+)
+
+
+def _tiene_lote(stock_model):
+    return any(f.name == 'lote' for f in stock_model._meta.get_fields())
+
+
+def clave_delta(delta):
+    """Clave de agrupación y orden de locks de un delta."""
+    return (
+        delta.stock_model._meta.label,
+        delta.producto_id,
+        delta.ubicacion_id,
+        delta.lote if _tiene_lote(delta.stock_model) else '',
+    )
+
+
+def _filtro(stock_model, producto_id, ubicacion_id, lote=''):
+    filtro = {'producto_id': producto_id, 'ubicacion_id': ubicacion_id}
+    if _tiene_lote(stock_model):
+        filtro['lote'] = lote
+    return filtro
+
+
+def _campos_derivados(stock_model, nueva_cantidad):
+    """
+    Campos que ``save()`` calcularía y que un UPDATE directo se saltaría.
+    """
+    from inventario.models import Pipe, StockPipe
+
+    campos = {'fecha_ultima_actualizacion': timezone.now()}
+    if issubclass(stock_model, StockPipe):
+        longitud = Subquery(
+            Pipe.all_objects.filter(pk=OuterRef('producto_id')).values('longitud_unitaria')[:1]
+        )
+        campos['metros_totales'] = nueva_cantidad * longitud
+    return campos
+
+
+def _normalizar_cantidad(stock_model, cantidad):
+    """Convierte el delta al tipo de la columna ``cantidad`` (Decimal o entero)."""
+    return stock_model._meta.get_field('cantidad').to_python(cantidad)
+
+
+def _stock_insuficiente(ubicacion_id):
+    from geography.models import Ubicacion
+
+    ubicacion = Ubicacion.objects.filter(pk=ubicacion_id).first()
+    return ValidationError(f"Stock insuficiente en {ubicacion or ubicacion_id}")
+
+
+def modelo_producto(stock_model):
+    """Modelo de producto al que apunta una tabla Stock*."""
+    return stock_model._meta.get_field('producto').related_model
+
+
+def modelo_stock(producto_model):
+    """Tabla Stock* de un modelo de producto (``related_name='stocks'``)."""
+    return producto_model._meta.get_field('stocks').related_model
+
+
+def _ajustar_stock_actual(deltas):
+    """
+    Suma a ``stock_actual`` el neto de los deltas de cada producto.
+
+    Las transferencias entre ubicaciones se cancelan y no generan UPDATE.
+    """
+    netos = defaultdict(Decimal)
+    for delta in deltas:
+        netos[(delta.stock_model._meta.label, delta.producto_id, delta.stock_model)] += Decimal(delta.cantidad)
+    for (_, producto_id, stock_model), neto in sorted(netos.items(), key=lambda i: i[0][:2]):
+        if neto:
+            modelo_producto(stock_model).all_objects.filter(pk=producto_id).update(
+                stock_actual=F('stock_actual') + neto
+            )
+
+
+def recalcular_stock_actual(producto_model, ids=None):
+    """
+    Recalcula ``stock_actual`` como la suma de las filas de stock del producto.
+
+    Es un único UPDATE con subconsulta agregada por tipo de producto.
+
+    Returns:
+        int: productos actualizados.
+    """
+    productos = producto_model.all_objects.all()
+    if ids is not None:
+        productos = productos.filter(pk__in=ids)
+    return productos.update(stock_actual=total_stock_expr(producto_model))
+
+
+def total_stock_expr(producto_model):
+    """Expresión con la suma de stock de todas las ubicaciones del producto."""
+    total = modelo_stock(producto_model).objects.filter(
+        producto_id=OuterRef('pk')
+    ).values('producto_id').annotate(total=Sum('cantidad')).values('total')
+    campo = DecimalField(max_digits=12, decimal_places=3)
+    return Coalesce(Subquery(total, output_field=campo), Value(Decimal('0')), output_field=campo)
+
+
+def _sumar(stock_model, producto_id, ubicacion_id, cantidad, lote=''):
+    cantidad = _normalizar_cantidad(stock_model, cantidad)
+    filtro = _filtro(stock_model, producto_id, ubicacion_id, lote)
+    nueva = F('cantidad') + cantidad
+    cambios = dict(cantidad=nueva, **_campos_derivados(stock_model, nueva))
+
+    if stock_model.objects.filter(**filtro).update(**cambios):
+        return
+    stock_model.objects.get_or_create(**filtro, defaults={'cantidad': 0})
+    stock_model.objects.filter(**filtro).update(**cambios)
+
+
+def _restar(stock_model, producto_id, ubicacion_id, cantidad, lote=''):
+    cantidad = _normalizar_cantidad(stock_model, cantidad)
+    filtro = _filtro(stock_model, producto_id, ubicacion_id, lote)
+    nueva = F('cantidad') - cantidad
+    cambios = dict(cantidad=nueva, **_campos_derivados(stock_model, nueva))
+
+    actualizadas = stock_model.objects.filter(
+        cantidad__gte=cantidad, **filtro
+    ).update(**cambios)
+    if not actualizadas:
+        raise _stock_insuficiente(ubicacion_id)
+
+
+def sumar_stock(stock_model, producto_id, ubicacion_id, cantidad, lote=''):
+    """
+    Incrementa el stock con ``UPDATE ... SET cantidad = cantidad + x``.
+
+    Si la fila aún no existe se crea (``get_or_create`` resuelve la carrera
+    con el unique_together) y se repite el UPDATE.
+    """
+    aplicar_deltas([StockDelta(stock_model, producto_id, ubicacion_id, cantidad, lote)])
+
+
+def restar_stock(stock_model, producto_id, ubicacion_id, cantidad, lote=''):
+    """
+    Descuenta stock con ``UPDATE ... SET cantidad = cantidad - x WHERE cantidad >= x``.
+
+    Raises:
+        ValidationError: si no hay fila o la cantidad disponible no alcanza.
+    """
+    aplicar_deltas([StockDelta(stock_model, producto_id, ubicacion_id, -cantidad, lote)])
+
+
+def agrupar_deltas(deltas):
+    """
+    Suma los deltas que caen sobre la misma fila y los devuelve en orden de lock.
+
+    Returns:
+        list[StockDelta]: un delta neto por (modelo, producto, ubicación, lote),
+        omitiendo los que se cancelan.
+    """
+    agrupados = OrderedDict()
+    for delta in sorted(deltas, key=clave_delta):
+        clave = clave_delta(delta)
+        if clave in agrupados:
+            previo = agrupados[clave]
+            agrupados[clave] = previo._replace(cantidad=previo.cantidad + delta.cantidad)
+        else:
+            agrupados[clave] = delta
+    return [d for d in agrupados.values() if d.cantidad != 0]
+
+
+def _leer_saldos(deltas, bloquear=False):
+    por_modelo = defaultdict(list)
+    for delta in deltas:
+        por_modelo[delta.stock_model].append(delta)
+
+    saldos = {}
+    for stock_model in sorted(por_modelo, key=lambda m: m._meta.label):
+        campos = ['producto_id', 'ubicacion_id']
+        if _tiene_lote(stock_model):
+            campos.append('lote')
+        filas = stock_model.objects.all()
+        if bloquear:
+            filas = filas.select_for_update()
+        filas = filas.filter(
+            producto_id__in={d.producto_id for d in por_modelo[stock_model]},
+            ubicacion_id__in={d.ubicacion_id for d in por_modelo[stock_model]},
+        ).order_by(*campos).values_list(*campos, 'cantidad')
+        for fila in filas:
+            lote = fila[2] if len(fila) == 4 else ''
+            saldos[(stock_model._meta.label, fila[0], fila[1], lote)] = fila[-1]
+    return saldos
+
+
+def bloquear_saldos(deltas):
+    """
+    Bloquea (``SELECT ... FOR UPDATE``) las filas de stock que tocan los deltas.
+
+    Se hace una consulta por modelo de stock, en el mismo orden que usa
+    ``aplicar_deltas`` para no invertir el orden de locks.
+
+    Returns:
+        dict: saldo actual por ``clave_delta``; las filas inexistentes no aparecen.
+    """
+    return _leer_saldos(deltas, bloquear=True)
+
+
+def _fila_kardex(delta, saldo, fecha):
+    from django.contrib.contenttypes.models import ContentType
+    from inventario.models import KardexStock
+
+    return KardexStock(
+        content_type=ContentType.objects.get_for_model(modelo_producto(delta.stock_model)),
+        object_id=delta.producto_id,
+        ubicacion_id=delta.ubicacion_id,
+        lote=clave_delta(delta)[3],
+        cantidad=delta.cantidad,
+        saldo=saldo,
+        movimiento_id=delta.movimiento_id,
+        fecha=fecha,
+    )
+
+
+def _registrar_kardex(deltas):
+    """
+    Inserta una fila de kardex por delta con el saldo que dejó en su fila.
+
+    Se llama después de los UPDATE, con las filas de stock ya bloqueadas por
+    esta transacción, así que el saldo leído es el final; el de cada delta
+    intermedio se obtiene recorriendo los deltas hacia atrás.
+    """
+    from inventario.models import KardexStock
+
+    deltas = [d for d in deltas if d.cantidad]
+    if not deltas:
+        return
+    saldos = _leer_saldos(deltas)
+    ahora = timezone.now()
+    filas = []
+    for delta in reversed(deltas):
+        clave = clave_delta(delta)
+        saldo = Decimal(saldos.get(clave, 0))
+        filas.append(_fila_kardex(delta, saldo, ahora))
+        saldos[clave] = saldo - Decimal(delta.cantidad)
+    filas.reverse()
+    KardexStock.objects.bulk_create(filas)
+
+
+def registrar_edicion_directa(stock, cantidad_anterior, saldo=None):
+    """
+    Registra en el kardex el cambio de una fila Stock* editada sin movimiento
+    (CRUD de los viewsets de stock). El saldo nuevo es ``stock.cantidad`` salvo
+    que se indique otro (0 cuando la fila se eliminó).
+    """
+    saldo = Decimal(stock.cantidad if saldo is None else saldo)
+    cambio = saldo - Decimal(cantidad_anterior)
+    if not cambio:
+        return
+    delta = StockDelta(
+        type(stock), stock.producto_id, stock.ubicacion_id, cambio, getattr(stock, 'lote', '')
+    )
+    _fila_kardex(delta, saldo, timezone.now()).save()
+    invalidar_dashboard_al_confirmar()
+
+
+def saldos_a_fecha(fecha, queryset=None):
+    """
+    Saldos de stock vigentes en ``fecha``.
+
+    Toma la última fila de kardex de cada (producto, ubicación, lote) con
+    ``fecha <= fecha``; en una sola consulta sobre el índice de la clave.
+
+    Args:
+        fecha: datetime límite (inclusive).
+        queryset: queryset de ``KardexStock`` para acotar por producto o ubicación.
+
+    Returns:
+        QuerySet[KardexStock]: una fila por clave con ``saldo`` a esa fecha.
+    """
+    from inventario.models import KardexStock
+
+    if queryset is None:
+        queryset = KardexStock.objects.all()
+    ultimos = queryset.filter(fecha__lte=fecha).values(
+        'content_type_id', 'object_id', 'ubicacion_id', 'lote'
+    ).annotate(ultimo=Max('id')).values('ultimo')
+    return KardexStock.objects.filter(id__in=Subquery(ultimos))
+
+
+def aplicar_deltas(deltas):
+    """
+    Aplica una lista de deltas de stock de forma atómica.
+
+    Cada fila afectada recibe un único UPDATE y las filas se visitan en orden
+    determinista; luego se ajusta ``stock_actual`` de cada producto y se
+    registra cada delta en el kardex. Si algún descuento no tiene stock
+    suficiente se revierte todo el bloque. Al confirmar se revisan las
+    alertas de stock de las filas que bajaron.
+    """
+    agrupados = agrupar_deltas(deltas)
+    with transaction.atomic():
+        for delta in agrupados:
+            if delta.cantidad > Decimal('0'):
+                _sumar(
+                    delta.stock_model, delta.producto_id, delta.ubicacion_id,
+                    delta.cantidad, delta.lote
+                )
+            else:
+                _restar(
+                    delta.stock_model, delta.producto_id, delta.ubicacion_id,
+                    -delta.cantidad, delta.lote
+                )
+        _ajustar_stock_actual(agrupados)
+        _registrar_kardex(deltas)
+        invalidar_dashboard_al_confirmar()
+        revisar_umbrales_al_confirmar(agrupados)
+
+
+CLAVE_SALDO = ('content_type_id', 'object_id', 'ubicacion_id', 'lote')
+
+
+def fin_del_dia(fecha):
+    """Primer instante (zona horaria local) posterior al día ``fecha``."""
+    return timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+
+
+def stock_a_fecha(fecha, filtro=None):
+    """
+    Stock al cierre del día ``fecha``.
+
+    Toma la foto diaria más reciente hasta ``fecha`` y le suma los deltas del
+    kardex ocurridos después de ella, agregados en la base de datos. Sin fotos
+    se suma todo el kardex (que incluye las filas de apertura).
+
+    Args:
+        fecha: ``date`` del corte.
+        filtro: ``Q`` sobre campos comunes a ``SaldoDiarioStock`` y
+            ``KardexStock`` (content_type, object_id, ubicacion...).
+
+    Returns:
+        dict: cantidad por ``(content_type_id, object_id, ubicacion_id, lote)``,
+        sin claves en cero.
+    """
+    from inventario.models import KardexStock, SaldoDiarioStock
+
+    filtro = filtro or Q()
+    saldos = defaultdict(Decimal)
+    deltas = KardexStock.objects.filter(filtro, fecha__lt=fin_del_dia(fecha))
+
+    fecha_foto = SaldoDiarioStock.objects.filter(fecha__lte=fecha).aggregate(m=Max('fecha'))['m']
+    if fecha_foto:
+        for *clave, cantidad in SaldoDiarioStock.objects.filter(
+            filtro, fecha=fecha_foto
+        ).values_list(*CLAVE_SALDO, 'cantidad'):
+            saldos[tuple(clave)] += cantidad
+        deltas = deltas.filter(fecha__gte=fin_del_dia(fecha_foto))
+
+    for *clave, total in deltas.values(*CLAVE_SALDO).annotate(
+        total=Sum('cantidad')
+    ).values_list(*CLAVE_SALDO, 'total'):
+        saldos[tuple(clave)] += total
+    return {clave: cantidad for clave, cantidad in saldos.items() if cantidad}
+
+
+def generar_saldos_diarios(fecha):
+    """
+    Guarda la foto de stock al cierre de ``fecha`` (reemplaza la existente).
+
+    Returns:
+        int: filas guardadas.
+    """
+    from inventario.models import SaldoDiarioStock
+
+    with transaction.atomic():
+        SaldoDiarioStock.objects.filter(fecha=fecha).delete()
+        filas = [
+            SaldoDiarioStock(
+                fecha=fecha, content_type_id=ct_id, object_id=object_id,
+                ubicacion_id=ubicacion_id, lote=lote, cantidad=cantidad
+            )
+            for (ct_id, object_id, ubicacion_id, lote), cantidad in stock_a_fecha(fecha).items()
+        ]
+        SaldoDiarioStock.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
+
+
+def totales_por_ubicacion(fecha=None):
+    """
+    Stock total por (tabla Stock*, ubicación).
+
+    Una consulta agrupada por tabla de stock; con ``fecha`` se usan los saldos
+    de ``stock_a_fecha`` en lugar de las filas actuales.
+
+    Returns:
+        dict: total por ``(stock_model, ubicacion_id)``.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from inventario.models import StockChemical, StockPipe, StockPumpAndMotor, StockAccessory
+
+    totales = defaultdict(Decimal)
+    if fecha is None:
+        for stock_model in (StockChemical, StockPipe, StockPumpAndMotor, StockAccessory):
+            filas = stock_model.objects.values('ubicacion_id').annotate(
+                total=Sum('cantidad')
+            ).values_list('ubicacion_id', 'total')
+            for ubicacion_id, total in filas:
+                totales[(stock_model, ubicacion_id)] += total
+        return totales
+
+    for (ct_id, _, ubicacion_id, _), cantidad in stock_a_fecha(fecha).items():
+        stock_model = modelo_stock(ContentType.objects.get_for_id(ct_id).model_class())
+        totales[(stock_model, ubicacion_id)] += cantidad
+    return totales
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+@shared_task
+def generar_saldos_diarios(fecha=None):
+    """
+    Tarea periódica (Celery beat): foto de stock al cierre del día.
+    Por defecto genera la del día anterior; ``fecha`` (YYYY-MM-DD) permite
+    regenerar un día puntual.
+    """
+    from inventario.stock import generar_saldos_diarios as generar
+
+    dia = parse_date(fecha) if fecha else timezone.localdate() - timedelta(days=1)
+    return generar(dia)
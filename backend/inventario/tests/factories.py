@@ -0,0 +1,31 @@
+"""
+Datos de prueba compartidos por los módulos de pruebas de inventario.
+"""
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+
+from catalogo.models import CategoriaProducto
+from geography.models import Ubicacion
+from institucion.models import OrganizacionCentral, Sucursal, Acueducto
+from inventario.models import Accessory, UnitOfMeasure, Supplier
+
+
+def crear_datos_base(obj):
+    """Crea la estructura mínima (ubicaciones y un accesorio) sobre ``obj``."""
+    org = OrganizacionCentral.objects.create(nombre='Org Stock')
+    sucursal = Sucursal.objects.create(nombre='Sucursal Stock', organizacion_central=org)
+    acueducto = Acueducto.objects.create(nombre='Acueducto Stock', sucursal=sucursal)
+    obj.ubicacion_a = Ubicacion.objects.create(nombre='Almacén A', acueducto=acueducto, tipo='ALMACEN')
+    obj.ubicacion_b = Ubicacion.objects.create(nombre='Almacén B', acueducto=acueducto, tipo='ALMACEN')
+    obj.categoria = CategoriaProducto.objects.create(nombre='Accesorios', codigo='ACC')
+    obj.proveedor = Supplier.objects.create(nombre='Proveedor Stock')
+    obj.unidad = UnitOfMeasure.objects.create(nombre='Unidad', simbolo='u', tipo='UNIDAD')
+    obj.accesorio = Accessory.objects.create(
+        nombre='Unión 2"', sku='STK-ACC-001', categoria=obj.categoria,
+        proveedor=obj.proveedor, unidad_medida=obj.unidad,
+        tipo_accesorio='UNION', material='PVC',
+        diametro_entrada=Decimal('2.0'), unidad_diametro='PULGADAS',
+        tipo_conexion='RAPIDA', presion_trabajo='PN10'
+    )
+    obj.ct_accesorio = ContentType.objects.get_for_model(Accessory)
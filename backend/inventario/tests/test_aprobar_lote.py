@@ -0,0 +1,141 @@
+"""
+Pruebas del endpoint de aprobación en lote de movimientos.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from auditoria.models import AuditLog
+from catalogo.models import CategoriaProducto
+from compras.models import OrdenCompra
+from geography.models import Ubicacion
+from institucion.models import OrganizacionCentral, Sucursal, Acueducto
+from inventario.models import (
+    Accessory, MovimientoInventario, StockAccessory, InventoryAudit,
+    UnitOfMeasure, Supplier,
+)
+
+User = get_user_model()
+URL = '/api/movimientos/aprobar_lote/'
+
+
+class AprobarLoteTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        org = OrganizacionCentral.objects.create(nombre='Org Lote')
+        sucursal = Sucursal.objects.create(nombre='Sucursal Lote', organizacion_central=org)
+        acueducto = Acueducto.objects.create(nombre='Acueducto Lote', sucursal=sucursal)
+        cls.almacen_a = Ubicacion.objects.create(nombre='Almacén A', acueducto=acueducto, tipo='ALMACEN')
+        cls.almacen_b = Ubicacion.objects.create(nombre='Almacén B', acueducto=acueducto, tipo='ALMACEN')
+        categoria = CategoriaProducto.objects.create(nombre='Accesorios', codigo='ACC')
+        cls.accesorio = Accessory.objects.create(
+            nombre='Codo 90°', sku='LOT-ACC-001', categoria=categoria,
+            proveedor=Supplier.objects.create(nombre='Proveedor Lote'),
+            unidad_medida=UnitOfMeasure.objects.create(nombre='Unidad', simbolo='u', tipo='UNIDAD'),
+            tipo_accesorio='CODO', angulo=90, material='PVC',
+            diametro_entrada=Decimal('2.0'), unidad_diametro='PULGADAS',
+            tipo_conexion='SOLDABLE', presion_trabajo='PN10'
+        )
+        cls.ct = ContentType.objects.get_for_model(Accessory)
+        cls.admin = User.objects.create_user(username='admin_lote', password='x', role='ADMIN')
+        cls.operador = User.objects.create_user(username='oper_lote', password='x')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.admin)
+
+    def _pendiente(self, tipo, cantidad, **kwargs):
+        return MovimientoInventario.objects.create(
+            content_type=self.ct, object_id=self.accesorio.id,
+            tipo_movimiento=tipo, cantidad=Decimal(cantidad),
+            creado_por=self.operador, **kwargs
+        )
+
+    def _stock(self, ubicacion):
+        return StockAccessory.objects.get(producto=self.accesorio, ubicacion=ubicacion).cantidad
+
+    def test_aprueba_lote_y_reporta_por_movimiento(self):
+        entrada = self._pendiente('ENTRADA', '10', ubicacion_destino=self.almacen_a)
+        salida = self._pendiente('SALIDA', '4', ubicacion_origen=self.almacen_a)
+        excedida = self._pendiente('SALIDA', '7', ubicacion_origen=self.almacen_a)
+        transfer = self._pendiente(
+            'TRANSFER', '5', ubicacion_origen=self.almacen_a, ubicacion_destino=self.almacen_b
+        )
+
+        ids = [entrada.pk, salida.pk, excedida.pk, transfer.pk, 999999]
+        response = self.client.post(URL, {'ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['aprobados'], 3)
+        self.assertEqual(response.data['fallidos'], 2)
+        por_id = {r['id']: r for r in response.data['resultados']}
+        self.assertEqual(por_id[entrada.pk]['status'], 'APROBADO')
+        self.assertEqual(por_id[salida.pk]['status'], 'APROBADO')
+        self.assertEqual(por_id[transfer.pk]['status'], 'APROBADO')
+        self.assertIn('Stock insuficiente', por_id[excedida.pk]['error'])
+        self.assertEqual(por_id[999999]['status'], 'ERROR')
+
+        self.assertEqual(self._stock(self.almacen_a), Decimal('1.000'))
+        self.assertEqual(self._stock(self.almacen_b), Decimal('5.000'))
+        excedida.refresh_from_db()
+        self.assertEqual(excedida.status, MovimientoInventario.STATUS_PENDIENTE)
+        transfer.refresh_from_db()
+        self.assertEqual(transfer.aprobado_por, self.admin)
+
+        self.assertEqual(OrdenCompra.objects.filter(movimiento=transfer).count(), 1)
+        self.assertTrue(
+            InventoryAudit.objects.filter(movimiento=excedida, status=InventoryAudit.STATUS_FAILED).exists()
+        )
+        self.assertEqual(
+            InventoryAudit.objects.filter(mensaje='Aprobado en lote', status=InventoryAudit.STATUS_SUCCESS).count(),
+            3
+        )
+
+    def test_un_update_por_fila_de_stock(self):
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.almacen_a, cantidad=Decimal('100'))
+        ids = [
+            self._pendiente('SALIDA', '1', ubicacion_origen=self.almacen_a).pk
+            for _ in range(25)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(URL, {'ids': ids}, format='json')
+
+        self.assertEqual(response.data['aprobados'], 25)
+        self.assertEqual(self._stock(self.almacen_a), Decimal('75.000'))
+        stock_updates = [
+            q for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE "inventario_stockaccessory"')
+        ]
+        self.assertEqual(len(stock_updates), 1)
+        self.assertLess(len(ctx.captured_queries), 20)
+
+        # Auditoría con el cambio de cada fila, en un solo INSERT
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "auditoria_auditlog"')]
+        self.assertEqual(len(inserts), 1)
+        logs = AuditLog.objects.filter(action='UPDATE', object_id__in=ids)
+        self.assertEqual(logs.count(), 25)
+        self.assertEqual(
+            logs.first().changes,
+            {'status': ['PENDIENTE', 'APROBADO'], 'aprobado_por': [None, self.admin.pk]}
+        )
+
+    def test_repetir_lote_no_reaplica_stock(self):
+        entrada = self._pendiente('ENTRADA', '3', ubicacion_destino=self.almacen_a)
+        self.client.post(URL, {'ids': [entrada.pk]}, format='json')
+        response = self.client.post(URL, {'ids': [entrada.pk]}, format='json')
+        self.assertEqual(response.data['resultados'][0]['status'], 'ERROR')
+        self.assertEqual(self._stock(self.almacen_a), Decimal('3.000'))
+
+    def test_solo_admin(self):
+        self.client.force_authenticate(user=self.operador)
+        response = self.client.post(URL, {'ids': [1]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_ids_invalidos(self):
+        response = self.client.post(URL, {'ids': 'abc'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,105 @@
+"""
+Pruebas del caché de dashboard_stats y su invalidación.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from geography.models import Ubicacion
+from institucion.models import Sucursal, Acueducto
+from inventario.models import Accessory, MovimientoInventario, StockAccessory
+from inventario.tests.factories import crear_datos_base
+
+URL = '/api/reportes-v2/dashboard_stats/'
+
+
+class DashboardCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_datos_base(cls)
+        User = get_user_model()
+        cls.admin = User.objects.create_user(username='jefe', password='x', role='ADMIN')
+        cls.otra_sucursal = Sucursal.objects.create(
+            nombre='Sucursal Sur', organizacion_central=cls.ubicacion_a.acueducto.sucursal.organizacion_central
+        )
+        cls.ubicacion_sur = Ubicacion.objects.create(
+            nombre='Almacén Sur',
+            acueducto=Acueducto.objects.create(nombre='Acueducto Sur', sucursal=cls.otra_sucursal),
+            tipo='ALMACEN'
+        )
+        cls.operador = User.objects.create_user(
+            username='operador_sur', password='x', sucursal=cls.otra_sucursal
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_segunda_lectura_sale_del_cache(self):
+        with self.assertNumQueries(5):
+            primera = self.client.get(URL)
+        with self.assertNumQueries(0):
+            segunda = self.client.get(URL)
+        self.assertEqual(primera.data, segunda.data)
+        self.assertEqual(primera.data['total_accesorios'], 1)
+
+    def test_aprobacion_invalida(self):
+        self.client.get(URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            MovimientoInventario.objects.create(
+                content_type=self.ct_accesorio, object_id=self.accesorio.id,
+                tipo_movimiento='ENTRADA', cantidad=Decimal('6'),
+                ubicacion_destino=self.ubicacion_a, status=MovimientoInventario.STATUS_APROBADO
+            )
+        self.assertEqual(self.client.get(URL).data['total_stock_accesorios'], Decimal('6.000'))
+
+    def test_alta_y_baja_de_producto_invalidan(self):
+        self.client.get(URL)
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = Accessory.objects.create(
+                nombre='Tapón 2"', sku='STK-ACC-002', categoria=self.categoria,
+                proveedor=self.proveedor, unidad_medida=self.unidad,
+                tipo_accesorio='TAPON', material='PVC', diametro_entrada=Decimal('2.0'),
+                unidad_diametro='PULGADAS', tipo_conexion='SOLDABLE', presion_trabajo='PN10'
+            )
+        self.assertEqual(self.client.get(URL).data['total_accesorios'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo.delete()
+        self.assertEqual(self.client.get(URL).data['total_accesorios'], 1)
+
+    def test_alcance_por_sucursal(self):
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_a, cantidad=Decimal('4'))
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_sur, cantidad=Decimal('1'))
+
+        self.assertEqual(self.client.get(URL).data['total_stock_accesorios'], Decimal('5.000'))
+        self.client.force_authenticate(user=self.operador)
+        self.assertEqual(self.client.get(URL).data['total_stock_accesorios'], Decimal('1.000'))
+
+    def test_solo_cambios_que_afectan_los_totales_invalidan(self):
+        self.client.get(URL)
+        producto = Accessory.objects.get(pk=self.accesorio.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.precio_unitario = Decimal('99.90')
+            producto.descripcion = 'Nueva descripción'
+            producto.save()
+        with self.assertNumQueries(0):
+            self.client.get(URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.stock_minimo = producto.stock_minimo + 1
+            producto.save()
+        with self.assertNumQueries(5):
+            self.client.get(URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.delete()
+        self.assertEqual(self.client.get(URL).data['total_accesorios'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.restore()
+        self.assertEqual(self.client.get(URL).data['total_accesorios'], 1)
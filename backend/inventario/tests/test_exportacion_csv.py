@@ -0,0 +1,141 @@
+"""
+Pruebas de la exportación ``?format=csv`` de los listados.
+"""
+import csv
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from auditoria.models import AuditLog
+from geography.models import Ubicacion
+from institucion.models import Sucursal, Acueducto
+from inventario.models import Accessory, MovimientoInventario, StockAccessory
+from inventario.tests.factories import crear_datos_base
+
+
+def leer_csv(response):
+    contenido = b''.join(response.streaming_content).decode('utf-8-sig')
+    return list(csv.reader(io.StringIO(contenido)))
+
+
+class ExportacionCSVTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_datos_base(cls)
+        User = get_user_model()
+        cls.admin = User.objects.create_user(username='exportador', password='x', role='ADMIN', is_staff=True)
+        cls.otra_sucursal = Sucursal.objects.create(
+            nombre='Sucursal Sur', organizacion_central=cls.ubicacion_a.acueducto.sucursal.organizacion_central
+        )
+        cls.ubicacion_sur = Ubicacion.objects.create(
+            nombre='Almacén Sur',
+            acueducto=Acueducto.objects.create(nombre='Acueducto Sur', sucursal=cls.otra_sucursal),
+            tipo='ALMACEN'
+        )
+        cls.operador = User.objects.create_user(username='operador_sur', password='x', sucursal=cls.otra_sucursal)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        ContentType.objects.get_for_models(Accessory)
+
+    def _accesorio(self, i):
+        return Accessory.objects.create(
+            nombre=f'Codo {i}', sku=f'EXP-ACC-{i:03d}', categoria=self.categoria,
+            proveedor=self.proveedor, unidad_medida=self.unidad,
+            tipo_accesorio='CODO', angulo=90, material='PVC', diametro_entrada=Decimal('2.0'),
+            unidad_diametro='PULGADAS', tipo_conexion='SOLDABLE', presion_trabajo='PN10'
+        )
+
+    def test_productos_sin_paginar_y_con_filtros(self):
+        for i in range(25):
+            self._accesorio(i)
+        response = self.client.get('/api/accessories/', {'format': 'csv', 'ordering': 'sku'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertIn('attachment; filename="accessory_', response['Content-Disposition'])
+
+        filas = leer_csv(response)
+        self.assertEqual(filas[0][:3], ['SKU', 'Nombre', 'Categoría'])
+        self.assertEqual(len(filas), 1 + 26)  # 25 + el accesorio base; PAGE_SIZE es 20
+        self.assertEqual(filas[1][0], 'EXP-ACC-000')
+
+        response = self.client.get('/api/accessories/', {'format': 'csv', 'search': 'EXP-ACC-01'})
+        self.assertEqual(len(leer_csv(response)), 1 + 10)
+
+    def test_consultas_constantes(self):
+        def exportar():
+            response = self.client.get('/api/accessories/', {'format': 'csv'})
+            return leer_csv(response)
+
+        with self.assertNumQueries(1):
+            exportar()
+        for i in range(10):
+            self._accesorio(i)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(exportar()), 12)
+
+    def test_stock_respeta_sucursal(self):
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_a, cantidad=Decimal('4'))
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_sur, cantidad=Decimal('1.5'))
+
+        self.assertEqual(len(leer_csv(self.client.get('/api/stock-accessories/?format=csv'))), 3)
+
+        self.client.force_authenticate(user=self.operador)
+        filas = leer_csv(self.client.get('/api/stock-accessories/?format=csv'))
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[1][2:], ['Sucursal Sur', 'Acueducto Sur', 'Almacén Sur', '1.500'])
+
+    def test_stock_as_of(self):
+        MovimientoInventario.objects.create(
+            content_type=self.ct_accesorio, object_id=self.accesorio.id,
+            tipo_movimiento='ENTRADA', cantidad=Decimal('6'), ubicacion_destino=self.ubicacion_a,
+            status=MovimientoInventario.STATUS_APROBADO, creado_por=self.admin
+        )
+        response = self.client.get(
+            '/api/stock-accessories/', {'format': 'csv', 'as_of': timezone.localdate().isoformat()}
+        )
+        filas = leer_csv(response)
+        self.assertEqual(filas[1][:5], [self.accesorio.sku, self.accesorio.nombre, str(self.ubicacion_a.acueducto),
+                                        self.ubicacion_a.nombre, ''])
+        self.assertEqual(Decimal(filas[1][5]), Decimal('6'))
+
+        ayer = (timezone.localdate() - timedelta(days=1)).isoformat()
+        response = self.client.get('/api/stock-accessories/', {'format': 'csv', 'as_of': ayer})
+        self.assertEqual(len(leer_csv(response)), 1)
+
+    def test_movimientos_con_sku(self):
+        MovimientoInventario.objects.create(
+            content_type=self.ct_accesorio, object_id=self.accesorio.id,
+            tipo_movimiento='ENTRADA', cantidad=Decimal('3'), ubicacion_destino=self.ubicacion_a,
+            razon='Compra, lote "A"', creado_por=self.admin
+        )
+        filas = leer_csv(self.client.get('/api/movimientos/?format=csv&tipo_movimiento=ENTRADA'))
+        self.assertEqual(len(filas), 2)
+        fila = dict(zip(filas[0], filas[1]))
+        self.assertEqual(fila['SKU'], self.accesorio.sku)
+        self.assertEqual(fila['Tipo de producto'], 'accessory')
+        self.assertEqual(fila['Destino'], self.ubicacion_a.nombre)
+        self.assertEqual(fila['Razón'], 'Compra, lote "A"')
+
+        filas = leer_csv(self.client.get('/api/movimientos/?format=csv&tipo_movimiento=SALIDA'))
+        self.assertEqual(len(filas), 1)
+
+    def test_auditoria(self):
+        AuditLog.objects.create(user=self.admin, action='UPDATE', object_repr='Codo', changes={'nombre': 'Codo 90°'})
+        filas = leer_csv(self.client.get('/api/auditoria/logs/?format=csv'))
+        fila = dict(zip(filas[0], filas[1]))
+        self.assertEqual(fila['Usuario'], 'exportador')
+        self.assertEqual(fila['Cambios'], '{"nombre": "Codo 90°"}')
+
+        self.client.force_authenticate(user=self.operador)
+        response = self.client.get('/api/auditoria/logs/?format=csv')
+        self.assertEqual(response.status_code, 403)
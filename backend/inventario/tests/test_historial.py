@@ -0,0 +1,143 @@
+"""
+Pruebas del historial de productos: cursor, saldos, filtros por fecha y caché.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from inventario.models import KardexStock, MovimientoInventario
+from inventario.stock import fin_del_dia
+from inventario.tests.factories import crear_datos_base
+
+
+class HistorialProductoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_datos_base(cls)
+        cls.admin = get_user_model().objects.create_user(username='historial', password='x', role='ADMIN')
+
+    def setUp(self):
+        cache.clear()
+        self.hoy = timezone.localdate()
+        self.url = f'/api/accessories/{self.accesorio.id}/history/'
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def _movimiento(self, tipo, cantidad, dias_atras, status='APROBADO', **kwargs):
+        """Crea un movimiento y lo lleva, con su kardex, ``dias_atras`` días al pasado."""
+        mov = MovimientoInventario.objects.create(
+            content_type=self.ct_accesorio, object_id=self.accesorio.id,
+            tipo_movimiento=tipo, cantidad=Decimal(cantidad), status=status,
+            creado_por=self.admin, **kwargs
+        )
+        fecha = fin_del_dia(self.hoy - timedelta(days=dias_atras)) - timedelta(hours=12)
+        MovimientoInventario.objects.filter(pk=mov.pk).update(fecha_movimiento=fecha)
+        KardexStock.objects.filter(movimiento=mov).update(fecha=fecha)
+        return mov
+
+    def _historia(self):
+        self._movimiento('ENTRADA', '10', 40, ubicacion_destino=self.ubicacion_a)
+        self._movimiento('TRANSFER', '4', 30, ubicacion_origen=self.ubicacion_a, ubicacion_destino=self.ubicacion_b)
+        self._movimiento('SALIDA', '3', 20, ubicacion_origen=self.ubicacion_b)
+        self._movimiento('SALIDA', '1', 10, status='RECHAZADO', ubicacion_origen=self.ubicacion_a)
+        self._movimiento('ENTRADA', '2', 1, ubicacion_destino=self.ubicacion_b)
+
+    def _todas(self, **params):
+        filas, url, params = [], self.url, {'page_size': 2, **params}
+        while url:
+            datos = self.client.get(url, params).json()
+            filas += datos['results']
+            url, params = datos['next'], None
+        return filas
+
+    def test_saldos_por_movimiento(self):
+        self._historia()
+        filas = self._todas()
+
+        self.assertEqual([f['cantidad'] for f in filas], ['2.000', '1.000', '3.000', '4.000', '10.000'])
+        self.assertEqual(
+            [f['saldo_total'] for f in filas], ['9.000', None, '7.000', '10.000', '10.000']
+        )
+        transferencia = filas[3]['saldos']
+        self.assertEqual(
+            [(s['ubicacion'], s['cantidad'], s['saldo']) for s in transferencia],
+            [(self.ubicacion_a.id, '-4.000', '6.000'), (self.ubicacion_b.id, '4.000', '4.000')]
+        )
+        self.assertEqual(filas[1]['saldos'], [])
+
+    def test_filtro_por_fechas(self):
+        self._historia()
+        desde = (self.hoy - timedelta(days=30)).isoformat()
+        hasta = (self.hoy - timedelta(days=20)).isoformat()
+
+        filas = self._todas(desde=desde, hasta=hasta)
+        self.assertEqual([f['cantidad'] for f in filas], ['3.000', '4.000'])
+        self.assertEqual([f['saldo_total'] for f in filas], ['7.000', '10.000'])
+
+        response = self.client.get(self.url, {'desde': '01/01/2026'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_etag_y_304(self):
+        self._historia()
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertNotIn('Cache-Control', response)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        for coincide in (f'"otro", W/{etag}', '*'):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=coincide).status_code, 304)
+        for distinto in (f'x{etag}x', f'{etag[:-1]}-2"'):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=distinto).status_code, 200)
+
+        self._movimiento('ENTRADA', '1', 0, ubicacion_destino=self.ubicacion_a)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pagina_antigua_en_cache_hasta_editar(self):
+        self._historia()
+        siguiente = self.client.get(self.url, {'page_size': 2}).json()['next']
+
+        primera = self.client.get(siguiente)
+        self.assertIn('max-age=300', primera['Cache-Control'])
+        with CaptureQueriesContext(connection) as consultas:
+            repetida = self.client.get(siguiente)
+        self.assertEqual(repetida.json(), primera.json())
+        self.assertEqual(repetida['ETag'], primera['ETag'])
+        tablas = ' '.join(c['sql'] for c in consultas.captured_queries)
+        self.assertNotIn(MovimientoInventario._meta.db_table, tablas)
+        self.assertNotIn(KardexStock._meta.db_table, tablas)
+
+        # Editar un movimiento de la página descarta el caché del producto
+        with self.captureOnCommitCallbacks(execute=True):
+            movimiento = MovimientoInventario.objects.get(cantidad=Decimal('3'))
+            movimiento.razon = 'Corregido'
+            movimiento.save()
+        editada = self.client.get(siguiente).json()
+        self.assertEqual(editada['results'][0]['razon'], 'Corregido')
+
+    def test_aprobar_lote_descarta_el_historial_en_cache(self):
+        self._historia()
+        pendiente = self._movimiento('ENTRADA', '5', 15, status='PENDIENTE', ubicacion_destino=self.ubicacion_a)
+        siguiente = self.client.get(self.url, {'page_size': 2}).json()['next']
+
+        # Una página con pendientes no se guarda sola: se fuerza para ver la invalidación
+        with mock.patch('inventario.historial._inmutable', return_value=True):
+            antes = self.client.get(siguiente).json()
+        self.assertEqual(antes['results'][0]['status'], 'PENDIENTE')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MovimientoInventario.aprobar_lote([pendiente.id], usuario=self.admin)
+        despues = self.client.get(siguiente).json()
+        self.assertEqual(despues['results'][0]['status'], 'APROBADO')
+        self.assertEqual(despues['results'][0]['saldos'][0]['cantidad'], '5.000')
@@ -0,0 +1,234 @@
+"""
+Pruebas de la importación masiva de plantillas CSV.
+"""
+import io
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from auditoria.models import AuditLog
+from catalogo.models import CategoriaProducto, Marca
+from institucion.models import OrganizacionCentral, Sucursal, Acueducto
+from inventario.importacion import ErrorImportacion, importar_csv
+from inventario.models import (
+    Accessory, Pipe, PumpAndMotor, ChemicalProduct, SecuenciaSku, Supplier, UnitOfMeasure
+)
+
+PLANTILLAS = Path(settings.BASE_DIR).parent / 'docs' / 'plantillas_importacion'
+
+ENCABEZADO_ACCESORIOS = (
+    'sku,nombre,tipo_accesorio,tipo_conexion,material,diametro_entrada,angulo,presion_trabajo,'
+    'stock_minimo,precio_unitario,categoria,unidad_medida,proveedor\n'
+)
+
+
+def csv_accesorios(filas):
+    return io.StringIO(ENCABEZADO_ACCESORIOS + ''.join(f'{f}\n' for f in filas))
+
+
+def fila_accesorio(sku, nombre, proveedor='Proveedor Hidro', tipo='TAPON', angulo=''):
+    return f'{sku},{nombre},{tipo},SOLDABLE,PVC,2.00,{angulo},PN10,1,2.50,Accesorios PVC,Unidades,{proveedor}'
+
+
+class ImportacionCSVTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for nombre, codigo in (
+            ('Accesorios PVC', 'ACP'), ('Accesorios Hidráulicos', 'ACH'), ('Tubería PVC', 'TPV'),
+            ('Tubería PEAD', 'TPE'), ('Químicos de Tratamiento', 'QTR'), ('Coagulantes', 'COA'),
+            ('Bombas y Motores', 'BOM'),
+        ):
+            CategoriaProducto.objects.create(nombre=nombre, codigo=codigo)
+        UnitOfMeasure.objects.create(nombre='Unidades', simbolo='und', tipo='UNIDAD')
+        UnitOfMeasure.objects.create(nombre='Metros', simbolo='m', tipo='LONGITUD')
+        UnitOfMeasure.objects.create(nombre='Kilogramos', simbolo='kg', tipo='PESO')
+        for nombre in (
+            'Proveedor Hidro', 'Suministros Industriales', 'Distribuidora Industrial',
+            'Suministros Químicos', 'Química Industrial', 'Motores y Bombas', 'Suministros Eléctricos',
+        ):
+            Supplier.objects.create(nombre=nombre)
+        Marca.objects.create(nombre='Grundfos')
+        Marca.objects.create(nombre='Siemens')
+        OrganizacionCentral.objects.create(nombre='Organizacion Central')
+        cls.admin = get_user_model().objects.create_user(username='importador', password='x', role='ADMIN')
+        cls.operador = get_user_model().objects.create_user(username='consulta', password='x')
+
+    def _plantilla(self, tipo):
+        return open(PLANTILLAS / f'plantilla_{tipo}.csv', encoding='utf-8-sig', newline='')
+
+    def test_plantillas_de_productos(self):
+        for tipo, modelo in (
+            ('tuberias', Pipe), ('accesorios', Accessory), ('bombas', PumpAndMotor), ('quimicos', ChemicalProduct),
+        ):
+            with self._plantilla(tipo) as archivo:
+                resultado = importar_csv(tipo, archivo)
+            self.assertEqual(resultado['errores'], [], tipo)
+            self.assertEqual(resultado['creados'], 2, tipo)
+            self.assertEqual(modelo.objects.count(), 2, tipo)
+
+        pipe = Pipe.objects.get(sku='PIPE-PVC-001')
+        self.assertEqual(pipe.presion_psi, Decimal('145.04'))
+        self.assertEqual(pipe.stock_actual, 0)  # sale de las tablas de stock, no de la plantilla
+        bomba = PumpAndMotor.objects.get(numero_serie='S12345')
+        self.assertEqual(bomba.categoria.codigo, 'BOM')
+        self.assertEqual(bomba.potencia_kw, Decimal('3.73'))
+        self.assertEqual(AuditLog.objects.filter(action='CREATE').count(), 8)
+
+    def test_plantillas_organizacionales(self):
+        call_command('importar_plantilla', 'sucursales', str(PLANTILLAS / 'plantilla_sucursales.csv'), stdout=io.StringIO())
+        call_command('importar_plantilla', 'acueductos', str(PLANTILLAS / 'plantilla_acueductos.csv'), stdout=io.StringIO())
+        self.assertEqual(Sucursal.objects.count(), 3)
+        self.assertEqual(Acueducto.objects.get(codigo='ACU002').sucursal.nombre, 'Sucursal Sur')
+
+        with self._plantilla('acueductos') as archivo:
+            resultado = importar_csv('acueductos', archivo)
+        self.assertEqual(resultado['creados'], 0)
+        self.assertEqual(resultado['errores'][0]['errores'], {'nombre__sucursal': ['Ya existe un registro con este valor.']})
+
+    def test_errores_por_fila(self):
+        Accessory.objects.create(
+            nombre='Tapón', sku='ACC-EXISTE', categoria=CategoriaProducto.objects.get(codigo='ACP'),
+            proveedor=Supplier.objects.get(nombre='Proveedor Hidro'), unidad_medida=UnitOfMeasure.objects.get(simbolo='und'),
+            tipo_accesorio='TAPON', material='PVC', diametro_entrada=Decimal('2'), tipo_conexion='SOLDABLE',
+            presion_trabajo='PN10'
+        )
+        resultado = importar_csv('accesorios', csv_accesorios([
+            fila_accesorio('ACC-001', 'Tapón 1'),
+            fila_accesorio('ACC-002', 'Tapón 2', proveedor='Nadie'),
+            fila_accesorio('ACC-003', 'Codo', tipo='CODO'),
+            fila_accesorio('ACC-EXISTE', 'Tapón 3'),
+            fila_accesorio('ACC-001', 'Tapón 4'),
+            fila_accesorio('ACC-006', 'Tapón 6').replace('PN10', 'PN99'),
+        ]))
+        self.assertEqual(resultado['filas'], 6)
+        self.assertEqual(resultado['creados'], 1)
+        errores = {e['fila']: e['errores'] for e in resultado['errores']}
+        self.assertEqual(errores[3], {'proveedor': ["No existe 'Nadie'"]})
+        self.assertEqual(errores[4], {'non_field_errors': ['Los codos deben especificar el ángulo']})
+        self.assertIn('sku', errores[5])
+        self.assertIn('sku', errores[6])
+        self.assertIn('presion_trabajo', errores[7])
+        self.assertEqual(list(Accessory.objects.values_list('sku', flat=True).order_by('sku')), ['ACC-001', 'ACC-EXISTE'])
+
+        with self.assertRaises(ErrorImportacion):
+            importar_csv('accesorios', io.StringIO('sku,nombre\nX,Y\n'))
+
+    def test_skus_por_bloque_y_consultas_constantes(self):
+        Accessory.objects.create(
+            nombre='Tapón', sku='ACP-ACC-9999', categoria=CategoriaProducto.objects.get(codigo='ACP'),
+            proveedor=Supplier.objects.get(nombre='Proveedor Hidro'), unidad_medida=UnitOfMeasure.objects.get(simbolo='und'),
+            tipo_accesorio='TAPON', material='PVC', diametro_entrada=Decimal('2'), tipo_conexion='SOLDABLE',
+            presion_trabajo='PN10'
+        )
+
+        def importar(desde, cantidad):
+            with CaptureQueriesContext(connection) as consultas:
+                resultado = importar_csv('accesorios', csv_accesorios([
+                    fila_accesorio('', f'Tapón {i}') for i in range(desde, desde + cantidad)
+                ]))
+            self.assertEqual(resultado['creados'], cantidad)
+            return len(consultas.captured_queries)
+
+        importar(0, 10)  # crea la secuencia del prefijo
+        self.assertEqual(importar(10, 10), importar(20, 30))
+        skus = list(Accessory.objects.filter(nombre__startswith='Tapón ').values_list('sku', flat=True))
+        self.assertEqual(len(set(skus)), 50)
+        self.assertIn('ACP-ACC-10000', skus)
+        self.assertIn('ACP-ACC-10049', skus)
+
+    def test_bloque_rechazado_por_la_base_se_reporta_por_fila(self):
+        Accessory.objects.create(
+            nombre='Tapón', sku='ACC-002', categoria=CategoriaProducto.objects.get(codigo='ACP'),
+            proveedor=Supplier.objects.get(nombre='Proveedor Hidro'), unidad_medida=UnitOfMeasure.objects.get(simbolo='und'),
+            tipo_accesorio='TAPON', material='PVC', diametro_entrada=Decimal('2'), tipo_conexion='SOLDABLE',
+            presion_trabajo='PN10'
+        )
+        # Como si otro proceso insertara ACC-002 después de la verificación de únicos
+        with mock.patch('inventario.importacion._Importador._existentes', return_value=set()):
+            resultado = importar_csv('accesorios', csv_accesorios([
+                fila_accesorio('ACC-001', 'Tapón 1'),
+                fila_accesorio('ACC-002', 'Tapón 2'),
+                fila_accesorio('', 'Tapón 3'),
+            ]), tamano_bloque=2)
+
+        self.assertEqual(resultado['creados'], 1)
+        self.assertEqual([e['fila'] for e in resultado['errores']], [2, 3])
+        self.assertIn('non_field_errors', resultado['errores'][0]['errores'])
+        self.assertEqual(
+            sorted(Accessory.objects.values_list('sku', flat=True)), ['ACC-002', 'ACP-ACC-0001']
+        )
+
+    def test_skus_reservados_fuera_del_savepoint_del_bloque(self):
+        niveles = []
+        reservar = SecuenciaSku.reservar
+
+        def espiar(*args, **kwargs):
+            niveles.append(len(connection.savepoint_ids))
+            return reservar(*args, **kwargs)
+
+        fuera = len(connection.savepoint_ids)
+        with mock.patch.object(SecuenciaSku, 'reservar', side_effect=espiar):
+            importar_csv('accesorios', csv_accesorios([fila_accesorio('', 'Tapón A')]))
+        self.assertEqual(niveles, [fuera])
+
+    def test_dry_run_no_reserva_skus(self):
+        filas = [fila_accesorio('', 'Tapón A'), fila_accesorio('', 'Tapón B')]
+
+        resultado = importar_csv('accesorios', csv_accesorios(filas), dry_run=True)
+        self.assertEqual(resultado['creados'], 2)
+        self.assertFalse(SecuenciaSku.objects.exists())
+        self.assertFalse(Accessory.objects.exists())
+
+        importar_csv('accesorios', csv_accesorios(filas))
+        self.assertEqual(
+            sorted(Accessory.objects.values_list('sku', flat=True)), ['ACP-ACC-0001', 'ACP-ACC-0002']
+        )
+        self.assertEqual(SecuenciaSku.objects.get(prefijo='ACP-ACC-').ultimo, 2)
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        contenido = (PLANTILLAS / 'plantilla_tuberias.csv').read_bytes()
+
+        response = client.post(
+            '/api/pipes/importar/?dry_run=1',
+            {'archivo': SimpleUploadedFile('tuberias.csv', contenido, content_type='text/csv')},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['creados'], 2)
+        self.assertFalse(Pipe.objects.exists())
+
+        response = client.post(
+            '/api/pipes/importar/',
+            {'archivo': SimpleUploadedFile('tuberias.csv', contenido, content_type='text/csv')},
+            format='multipart'
+        )
+        self.assertEqual(response.data['creados'], 2)
+        self.assertEqual(Pipe.objects.count(), 2)
+
+        response = client.post(
+            '/api/accessories/importar/',
+            {'archivo': SimpleUploadedFile('tuberias.csv', contenido, content_type='text/csv')},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Faltan columnas', response.data['error'])
+
+        client.force_authenticate(user=self.operador)
+        response = client.post(
+            '/api/pipes/importar/',
+            {'archivo': SimpleUploadedFile('tuberias.csv', contenido, content_type='text/csv')},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 403)
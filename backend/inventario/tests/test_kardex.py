@@ -0,0 +1,160 @@
+"""
+Pruebas del kardex de stock (libro de solo inserción) y de los saldos a una fecha.
+"""
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import ProtectedError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from inventario.models import KardexStock, MovimientoInventario, StockAccessory
+from inventario.stock import saldos_a_fecha
+from inventario.tests.factories import crear_datos_base
+
+
+class KardexStockTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_datos_base(cls)
+        cls.user = get_user_model().objects.create_user(username='kardex', password='x', role='ADMIN')
+
+    def _aprobado(self, tipo, cantidad, **kwargs):
+        return MovimientoInventario.objects.create(
+            content_type=self.ct_accesorio, object_id=self.accesorio.id,
+            tipo_movimiento=tipo, cantidad=Decimal(cantidad),
+            status=MovimientoInventario.STATUS_APROBADO, creado_por=self.user, **kwargs
+        )
+
+    def _saldos(self, fecha):
+        return {
+            k.ubicacion_id: k.saldo
+            for k in saldos_a_fecha(fecha, KardexStock.objects.filter(object_id=self.accesorio.id))
+        }
+
+    def test_una_fila_por_delta_con_saldo(self):
+        entrada = self._aprobado('ENTRADA', '10', ubicacion_destino=self.ubicacion_a)
+        transfer = self._aprobado(
+            'TRANSFER', '4', ubicacion_origen=self.ubicacion_a, ubicacion_destino=self.ubicacion_b
+        )
+
+        filas = list(KardexStock.objects.order_by('id').values_list(
+            'movimiento_id', 'ubicacion_id', 'cantidad', 'saldo'
+        ))
+        self.assertEqual(filas, [
+            (entrada.pk, self.ubicacion_a.id, Decimal('10.000'), Decimal('10.000')),
+            (transfer.pk, self.ubicacion_a.id, Decimal('-4.000'), Decimal('6.000')),
+            (transfer.pk, self.ubicacion_b.id, Decimal('4.000'), Decimal('4.000')),
+        ])
+
+    def test_saldo_intermedio_en_un_mismo_lote(self):
+        ids = [
+            MovimientoInventario.objects.create(
+                content_type=self.ct_accesorio, object_id=self.accesorio.id,
+                tipo_movimiento='ENTRADA', cantidad=Decimal(c), ubicacion_destino=self.ubicacion_a
+            ).pk
+            for c in ('2', '3')
+        ]
+        MovimientoInventario.aprobar_lote(ids, usuario=self.user)
+        saldos = list(KardexStock.objects.order_by('id').values_list('saldo', flat=True))
+        self.assertEqual(saldos, [Decimal('2.000'), Decimal('5.000')])
+
+    def test_movimiento_fallido_no_deja_filas(self):
+        with self.assertRaises(ValidationError):
+            self._aprobado('SALIDA', '1', ubicacion_origen=self.ubicacion_a)
+        self.assertFalse(KardexStock.objects.exists())
+
+    def test_saldos_a_fecha(self):
+        self._aprobado('ENTRADA', '10', ubicacion_destino=self.ubicacion_a)
+        corte = timezone.now()
+        KardexStock.objects.update(fecha=corte - timedelta(days=2))
+        self._aprobado('SALIDA', '7', ubicacion_origen=self.ubicacion_a)
+
+        self.assertEqual(self._saldos(corte - timedelta(days=3)), {})
+        self.assertEqual(self._saldos(corte - timedelta(days=1)), {self.ubicacion_a.id: Decimal('10.000')})
+        self.assertEqual(self._saldos(timezone.now()), {self.ubicacion_a.id: Decimal('3.000')})
+
+    def test_solo_insercion(self):
+        self._aprobado('ENTRADA', '1', ubicacion_destino=self.ubicacion_a)
+        fila = KardexStock.objects.get()
+        fila.saldo = Decimal('99')
+        with self.assertRaises(ValidationError):
+            fila.save()
+        with self.assertRaises(ValidationError):
+            fila.delete()
+
+        # Borrar físicamente el movimiento no puede dejar la fila sin referencia
+        movimiento = fila.movimiento
+        with self.assertRaises(ProtectedError):
+            movimiento.hard_delete()
+        self.assertEqual(KardexStock.objects.get().movimiento_id, movimiento.pk)
+
+    def test_edicion_directa_de_stock_queda_en_kardex(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post('/api/stock-accessories/', {
+            'producto': self.accesorio.id, 'ubicacion': self.ubicacion_a.id, 'cantidad': '5'
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        stock_id = response.data['id']
+        client.patch(f'/api/stock-accessories/{stock_id}/', {'cantidad': '8'}, format='json')
+        client.delete(f'/api/stock-accessories/{stock_id}/')
+
+        filas = list(KardexStock.objects.order_by('id').values_list('cantidad', 'saldo'))
+        self.assertEqual(filas, [
+            (Decimal('5.000'), Decimal('5.000')),
+            (Decimal('3.000'), Decimal('8.000')),
+            (Decimal('-8.000'), Decimal('0.000')),
+        ])
+        self.assertFalse(StockAccessory.objects.exists())
+        self.accesorio.refresh_from_db()
+        self.assertEqual(self.accesorio.stock_actual, Decimal('0.000'))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'El particionado del kardex solo aplica en PostgreSQL')
+class ParticionadoKardexTests(TestCase):
+    """Migración 0007 sobre PostgreSQL; el DDL se revierte con la transacción de la prueba."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_datos_base(cls)
+        cls.user = get_user_model().objects.create_user(username='particiones', password='x', role='ADMIN')
+
+    def test_tabla_particionada_asigna_ids_con_su_secuencia(self):
+        migracion = import_module('inventario.migrations.0007_kardex_particiones_apertura')
+        tabla = KardexStock._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")  # FK diferidas de setUpTestData
+        with connection.schema_editor() as editor:
+            migracion.particionar_kardex(apps, editor)
+
+        for cantidad in ('10', '4'):
+            MovimientoInventario.objects.create(
+                content_type=self.ct_accesorio, object_id=self.accesorio.id, tipo_movimiento='ENTRADA',
+                cantidad=Decimal(cantidad), ubicacion_destino=self.ubicacion_a,
+                status=MovimientoInventario.STATUS_APROBADO, creado_por=self.user
+            )
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [tabla])
+            self.assertEqual(cursor.fetchone()[0], f'public.{tabla}_id_seq')
+            cursor.execute(f"SELECT id, tableoid::regclass::text FROM {tabla} ORDER BY id")
+            filas = cursor.fetchall()
+        hoy = timezone.now()
+        self.assertEqual(len(filas), 2)
+        self.assertLess(filas[0][0], filas[1][0])
+        self.assertEqual({particion for _, particion in filas}, {f'{tabla}_p{hoy:%Y_%m}'})
+
+        # La migración dejó el mes actual y el siguiente: el comando agrega el tercero
+        salida = StringIO()
+        call_command('crear_particiones_kardex', meses=3, stdout=salida)
+        self.assertIn('Particiones creadas: 1', salida.getvalue())
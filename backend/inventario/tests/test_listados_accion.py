@@ -0,0 +1,60 @@
+"""
+Pruebas de las acciones de listado de productos: paginación, filtros y ``?stream=1``.
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from inventario.models import Accessory
+from inventario.tests.factories import crear_datos_base
+
+URL = '/api/accessories/valvulas/'
+
+
+class ListadosAccionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_datos_base(cls)
+        cls.admin = get_user_model().objects.create_user(username='listados', password='x', role='ADMIN')
+        Accessory.objects.bulk_create([
+            Accessory(
+                nombre=f'Válvula {i:02d}', sku=f'LST-VAL-{i:02d}', categoria=cls.categoria,
+                proveedor=cls.proveedor, unidad_medida=cls.unidad,
+                tipo_accesorio='VALVULA', material='PVC' if i % 2 else 'HIERRO',
+                diametro_entrada=Decimal('2.0'), unidad_diametro='PULGADAS',
+                tipo_conexion='RAPIDA', presion_trabajo='PN10'
+            )
+            for i in range(25)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_paginado_y_filtrado(self):
+        datos = self.client.get(URL).json()
+        self.assertEqual(datos['count'], 25)
+        self.assertEqual(len(datos['results']), 20)
+        self.assertIsNotNone(datos['next'])
+
+        datos = self.client.get(URL, {'material': 'PVC', 'ordering': '-sku'}).json()
+        self.assertEqual(datos['count'], 12)
+        self.assertEqual(datos['results'][0]['sku'], 'LST-VAL-23')
+
+    def test_stream_devuelve_todas_las_filas(self):
+        response = self.client.get(URL, {'stream': '1', 'search': 'Válvula'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        filas = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(filas), 25)
+        self.assertEqual(filas[0]['sku'], 'LST-VAL-00')
+
+        vacio = self.client.get(URL, {'stream': '1', 'search': 'Compuerta'})
+        self.assertEqual(json.loads(b''.join(vacio.streaming_content)), [])
+
+    def test_rango_de_potencia_invalido(self):
+        response = self.client.get('/api/pumps/by_power_range/', {'min_hp': 'diez'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,117 @@
+"""
+Pruebas de regresión del número de consultas del listado de movimientos.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+
+from catalogo.models import CategoriaProducto
+from geography.models import Ubicacion
+from institucion.models import OrganizacionCentral, Sucursal, Acueducto
+from inventario.models import (
+    Accessory, Pipe, ChemicalProduct, PumpAndMotor, MovimientoInventario, UnitOfMeasure, Supplier,
+)
+
+User = get_user_model()
+URL = '/api/movimientos/'
+
+# SELECT de movimientos (página por cursor, sin COUNT) + un SELECT por tipo de producto
+CONSULTAS_LISTADO = 3
+
+
+class MovimientosListadoTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        org = OrganizacionCentral.objects.create(nombre='Org Listado')
+        sucursal = Sucursal.objects.create(nombre='Sucursal Listado', organizacion_central=org)
+        cls.acueducto_a = Acueducto.objects.create(nombre='Acueducto Norte', sucursal=sucursal)
+        cls.acueducto_b = Acueducto.objects.create(nombre='Acueducto Sur', sucursal=sucursal)
+        cls.almacen_a = Ubicacion.objects.create(nombre='Almacén Norte', acueducto=cls.acueducto_a, tipo='ALMACEN')
+        cls.almacen_b = Ubicacion.objects.create(nombre='Almacén Sur', acueducto=cls.acueducto_b, tipo='ALMACEN')
+        proveedor = Supplier.objects.create(nombre='Proveedor Listado')
+        unidad = UnitOfMeasure.objects.create(nombre='Unidad', simbolo='u', tipo='UNIDAD')
+        cls.accesorio = Accessory.objects.create(
+            nombre='Brida 4"', sku='LST-ACC-001',
+            categoria=CategoriaProducto.objects.create(nombre='Accesorios', codigo='ACC'),
+            proveedor=proveedor, unidad_medida=unidad,
+            tipo_accesorio='BRIDA', material='HIERRO', diametro_entrada=Decimal('4.0'),
+            unidad_diametro='PULGADAS', tipo_conexion='BRIDADA', presion_trabajo='PN16'
+        )
+        cls.pipe = Pipe.objects.create(
+            nombre='PVC 4"', sku='LST-PIPE-001',
+            categoria=CategoriaProducto.objects.create(nombre='Tuberías', codigo='TUB'),
+            proveedor=proveedor, unidad_medida=unidad,
+            material='PVC', diametro_nominal=4, presion_nominal='PN10',
+            tipo_union='SOLDABLE', tipo_uso='POTABLE'
+        )
+        cls.user = User.objects.create_user(username='lector', password='x')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        # Los content types quedan en la caché del proceso, como en producción
+        ContentType.objects.get_for_models(ChemicalProduct, Pipe, PumpAndMotor, Accessory)
+
+    def _crear_movimientos(self, n):
+        productos = [self.accesorio, self.pipe]
+        for i in range(n):
+            producto = productos[i % 2]
+            MovimientoInventario.objects.create(
+                content_type=ContentType.objects.get_for_model(producto), object_id=producto.id,
+                tipo_movimiento='TRANSFER', cantidad=Decimal('1'),
+                ubicacion_origen=self.almacen_a, ubicacion_destino=self.almacen_b,
+                creado_por=self.user
+            )
+
+    def test_consultas_constantes_por_pagina(self):
+        self._crear_movimientos(2)
+        with self.assertNumQueries(CONSULTAS_LISTADO):
+            self.client.get(URL)
+
+        self._crear_movimientos(18)
+        with self.assertNumQueries(CONSULTAS_LISTADO):
+            response = self.client.get(URL)
+
+        fila = response.data['results'][0]
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(fila['acueducto_origen_nombre'], 'Acueducto Norte')
+        self.assertEqual(fila['acueducto_destino_nombre'], 'Acueducto Sur')
+        self.assertEqual(fila['creado_por_username'], 'lector')
+        self.assertIn(fila['producto_str'], {str(self.accesorio), str(self.pipe)})
+
+    def test_producto_dado_de_baja_sigue_visible(self):
+        self._crear_movimientos(1)
+        self.accesorio.delete()
+        response = self.client.get(URL)
+        self.assertEqual(response.data['results'][0]['producto_str'], 'LST-ACC-001 - Brida 4"')
+
+    def test_paginas_por_cursor(self):
+        self._crear_movimientos(8)
+        esperados = list(MovimientoInventario.objects.order_by('-fecha_movimiento', '-id').values_list('id', flat=True))
+        url, vistos = f'{URL}?page_size=2', []
+        while url:
+            with self.assertNumQueries(CONSULTAS_LISTADO):  # igual en cualquier página
+                response = self.client.get(url)
+            vistos += [fila['id'] for fila in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(vistos, esperados)
+
+    def test_cola_de_pendientes(self):
+        self._crear_movimientos(3)
+        MovimientoInventario.objects.filter(pk__in=MovimientoInventario.objects.values('pk')[:1]).update(
+            status=MovimientoInventario.STATUS_APROBADO
+        )
+        response = self.client.get(f'{URL}?status=PENDIENTE')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_benchmark_no_deja_datos(self):
+        salida = StringIO()
+        call_command('benchmark_movimientos', filas=300, repeticiones=1, stdout=salida)
+        self.assertIn('Cola de pendientes', salida.getvalue())
+        self.assertIn('-- con índices', salida.getvalue())
+        self.assertFalse(MovimientoInventario.all_objects.exists())
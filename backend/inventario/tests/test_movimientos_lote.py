@@ -0,0 +1,133 @@
+"""
+Pruebas de la creación masiva de movimientos (POST de una lista a /api/movimientos/).
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from auditoria.models import AuditLog
+from catalogo.models import CategoriaProducto
+from geography.models import Ubicacion
+from institucion.models import OrganizacionCentral, Sucursal, Acueducto
+from inventario.models import (
+    Accessory, Pipe, MovimientoInventario, InventoryAudit, StockAccessory,
+    UnitOfMeasure, Supplier,
+)
+
+User = get_user_model()
+URL = '/api/movimientos/'
+
+
+class MovimientosLoteTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        org = OrganizacionCentral.objects.create(nombre='Org Carga')
+        sucursal = Sucursal.objects.create(nombre='Sucursal Carga', organizacion_central=org)
+        acueducto = Acueducto.objects.create(nombre='Acueducto Carga', sucursal=sucursal)
+        cls.almacen = Ubicacion.objects.create(nombre='Almacén Carga', acueducto=acueducto, tipo='ALMACEN')
+        proveedor = Supplier.objects.create(nombre='Proveedor Carga')
+        unidad = UnitOfMeasure.objects.create(nombre='Unidad', simbolo='u', tipo='UNIDAD')
+        cls.accesorio = Accessory.objects.create(
+            nombre='Tee 2"', sku='CRG-ACC-001',
+            categoria=CategoriaProducto.objects.create(nombre='Accesorios', codigo='ACC'),
+            proveedor=proveedor, unidad_medida=unidad,
+            tipo_accesorio='TEE', material='PVC', diametro_entrada=Decimal('2.0'),
+            unidad_diametro='PULGADAS', tipo_conexion='SOLDABLE', presion_trabajo='PN10'
+        )
+        cls.pipe = Pipe.objects.create(
+            nombre='PVC 2"', sku='CRG-PIPE-001',
+            categoria=CategoriaProducto.objects.create(nombre='Tuberías', codigo='TUB'),
+            proveedor=proveedor, unidad_medida=unidad,
+            material='PVC', diametro_nominal=2, presion_nominal='PN10',
+            tipo_union='SOLDABLE', tipo_uso='POTABLE'
+        )
+        cls.user = User.objects.create_user(username='cuadrilla', password='x')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def _fila(self, product_type, product_id, **extra):
+        fila = {
+            'tipo_movimiento': 'ENTRADA', 'cantidad': '1.000',
+            'product_type': product_type, 'product_id': product_id,
+            'ubicacion_destino': self.almacen.id, 'razon': 'Carga de planilla',
+        }
+        fila.update(extra)
+        return fila
+
+    def _filas(self, n):
+        return [
+            self._fila('accessory', self.accesorio.id) if i % 2 else self._fila('pipe', self.pipe.id)
+            for i in range(n)
+        ]
+
+    def test_crea_lote_con_consultas_constantes(self):
+        with CaptureQueriesContext(connection) as pequeno:
+            response = self.client.post(URL, self._filas(4), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+
+        with CaptureQueriesContext(connection) as grande:
+            response = self.client.post(URL, self._filas(60), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(len(response.data), 60)
+
+        self.assertEqual(MovimientoInventario.objects.count(), 64)
+        self.assertEqual(InventoryAudit.objects.count(), 64)
+        self.assertEqual(AuditLog.objects.filter(action='CREATE').count(), 64)
+        self.assertEqual(
+            set(MovimientoInventario.objects.values_list('creado_por', flat=True)), {self.user.id}
+        )
+        # Validación e inserción no crecen con el número de filas
+        self.assertLessEqual(len(grande.captured_queries), len(pequeno.captured_queries) + 2)
+
+    def test_errores_por_fila(self):
+        filas = [
+            self._fila('pipe', self.pipe.id),
+            self._fila('pipe', 999999),
+            self._fila('bomba', 1),
+        ]
+        response = self.client.post(URL, filas, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('product_type', response.data[2])
+        self.assertFalse(MovimientoInventario.objects.exists())
+
+        response = self.client.post(URL, filas[:2], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('product_id', response.data[1])
+
+    def test_filas_aprobadas_aplican_stock(self):
+        filas = [
+            self._fila('accessory', self.accesorio.id, cantidad='5', status='APROBADO'),
+            self._fila('accessory', self.accesorio.id, cantidad='2'),
+        ]
+        response = self.client.post(URL, filas, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data[0]['status'], 'APROBADO')
+        self.assertEqual(response.data[1]['status'], 'PENDIENTE')
+        stock = StockAccessory.objects.get(producto=self.accesorio, ubicacion=self.almacen)
+        self.assertEqual(stock.cantidad, Decimal('5.000'))
+
+    def test_lote_se_revierte_si_una_aprobacion_falla(self):
+        filas = [
+            self._fila('accessory', self.accesorio.id),
+            self._fila(
+                'accessory', self.accesorio.id, tipo_movimiento='SALIDA',
+                ubicacion_destino=None, ubicacion_origen=self.almacen.id, status='APROBADO'
+            ),
+        ]
+        response = self.client.post(URL, filas, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Stock insuficiente', str(response.data[1]))
+        self.assertFalse(MovimientoInventario.objects.exists())
+
+    def test_creacion_individual_sigue_funcionando(self):
+        response = self.client.post(URL, self._fila('pipe', self.pipe.id), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data['product_type_read'], 'pipe')
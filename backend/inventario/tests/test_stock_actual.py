@@ -0,0 +1,90 @@
+"""
+Pruebas de ProductBase.stock_actual (total desnormalizado) y del comando reconcile_stock.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from inventario.models import Accessory, MovimientoInventario, StockAccessory
+from inventario.tests.factories import crear_datos_base
+
+
+class StockActualTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_datos_base(cls)
+        cls.user = get_user_model().objects.create_user(username='almacenista', password='x')
+
+    def _aprobado(self, tipo, cantidad, **kwargs):
+        return MovimientoInventario.objects.create(
+            content_type=self.ct_accesorio, object_id=self.accesorio.id,
+            tipo_movimiento=tipo, cantidad=Decimal(cantidad),
+            status=MovimientoInventario.STATUS_APROBADO, creado_por=self.user, **kwargs
+        )
+
+    def _stock_actual(self):
+        self.accesorio.refresh_from_db()
+        return self.accesorio.stock_actual
+
+    def test_movimientos_mantienen_stock_actual(self):
+        self._aprobado('ENTRADA', '10', ubicacion_destino=self.ubicacion_a)
+        self.assertEqual(self._stock_actual(), Decimal('10.000'))
+
+        self._aprobado('TRANSFER', '4', ubicacion_origen=self.ubicacion_a, ubicacion_destino=self.ubicacion_b)
+        self.assertEqual(self._stock_actual(), Decimal('10.000'))
+
+        self._aprobado('SALIDA', '3', ubicacion_origen=self.ubicacion_b)
+        self.assertEqual(self._stock_actual(), Decimal('7.000'))
+
+    def test_movimiento_pendiente_no_cambia_stock_actual(self):
+        MovimientoInventario.objects.create(
+            content_type=self.ct_accesorio, object_id=self.accesorio.id,
+            tipo_movimiento='ENTRADA', cantidad=Decimal('5'), ubicacion_destino=self.ubicacion_a
+        )
+        self.assertEqual(self._stock_actual(), Decimal('0.000'))
+
+    def test_salida_rechazada_no_cambia_stock_actual(self):
+        self._aprobado('ENTRADA', '2', ubicacion_destino=self.ubicacion_a)
+        with self.assertRaises(ValidationError):
+            self._aprobado('SALIDA', '5', ubicacion_origen=self.ubicacion_a)
+        self.assertEqual(self._stock_actual(), Decimal('2.000'))
+
+    def test_edicion_del_producto_no_escribe_stock_actual(self):
+        admin = get_user_model().objects.create_user(username='admin_stock', password='x', role='ADMIN')
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        response = client.patch(
+            f'/api/accessories/{self.accesorio.id}/', {'stock_actual': '999', 'nombre': 'Unión 2" PVC'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._stock_actual(), Decimal('0.000'))
+        self.assertEqual(self.accesorio.nombre, 'Unión 2" PVC')
+
+        # Una instancia leída antes de un movimiento no deshace su ajuste al guardarse
+        leido = Accessory.objects.get(pk=self.accesorio.pk)
+        self._aprobado('ENTRADA', '6', ubicacion_destino=self.ubicacion_a)
+        leido.notas = 'Revisado'
+        leido.save()
+        self.assertEqual(self._stock_actual(), Decimal('6.000'))
+
+    def test_reconcile_stock_corrige_desfase(self):
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_a, cantidad=Decimal('8'))
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_b, cantidad=Decimal('4'))
+
+        salida = StringIO()
+        call_command('reconcile_stock', '--dry-run', stdout=salida)
+        self.assertIn('Productos encontrados: 1', salida.getvalue())
+        self.assertEqual(self._stock_actual(), Decimal('0.000'))
+
+        call_command('reconcile_stock', stdout=StringIO())
+        self.assertEqual(self._stock_actual(), Decimal('12.000'))
+
+        salida = StringIO()
+        call_command('reconcile_stock', '--dry-run', stdout=salida)
+        self.assertIn('Productos encontrados: 0', salida.getvalue())
@@ -0,0 +1,102 @@
+"""
+Pruebas de las fotos diarias de stock y del parámetro ``as_of``.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from inventario.models import KardexStock, MovimientoInventario, SaldoDiarioStock
+from inventario.stock import fin_del_dia, generar_saldos_diarios, stock_a_fecha
+from inventario.tasks import generar_saldos_diarios as tarea_saldos_diarios
+from inventario.tests.factories import crear_datos_base
+
+
+class StockAsOfTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_datos_base(cls)
+        cls.admin = get_user_model().objects.create_user(username='auditor', password='x', role='ADMIN')
+
+    def setUp(self):
+        cache.clear()
+        self.hoy = timezone.localdate()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def _aprobado(self, tipo, cantidad, dias_atras, **kwargs):
+        """Aprueba un movimiento y lleva sus filas de kardex ``dias_atras`` días al pasado."""
+        mov = MovimientoInventario.objects.create(
+            content_type=self.ct_accesorio, object_id=self.accesorio.id,
+            tipo_movimiento=tipo, cantidad=Decimal(cantidad),
+            status=MovimientoInventario.STATUS_APROBADO, creado_por=self.admin, **kwargs
+        )
+        dia = self.hoy - timedelta(days=dias_atras)
+        KardexStock.objects.filter(movimiento=mov).update(fecha=fin_del_dia(dia) - timedelta(hours=12))
+        return mov
+
+    def _historia(self):
+        self._aprobado('ENTRADA', '10', 5, ubicacion_destino=self.ubicacion_a)
+        self._aprobado('SALIDA', '3', 3, ubicacion_origen=self.ubicacion_a)
+        self._aprobado('ENTRADA', '4', 1, ubicacion_destino=self.ubicacion_b)
+
+    def _por_ubicacion(self, saldos):
+        return {clave[2]: cantidad for clave, cantidad in saldos.items()}
+
+    def test_stock_a_fecha_con_y_sin_foto(self):
+        self._historia()
+        sin_foto = self._por_ubicacion(stock_a_fecha(self.hoy - timedelta(days=2)))
+        self.assertEqual(sin_foto, {self.ubicacion_a.id: Decimal('7.000')})
+
+        generar_saldos_diarios(self.hoy - timedelta(days=4))
+        self.assertEqual(
+            list(SaldoDiarioStock.objects.values_list('cantidad', flat=True)), [Decimal('10.000')]
+        )
+        # Foto del día 4 + deltas del kardex posteriores
+        self.assertEqual(
+            self._por_ubicacion(stock_a_fecha(self.hoy - timedelta(days=2))), sin_foto
+        )
+        self.assertEqual(
+            self._por_ubicacion(stock_a_fecha(self.hoy)),
+            {self.ubicacion_a.id: Decimal('7.000'), self.ubicacion_b.id: Decimal('4.000')}
+        )
+        self.assertEqual(stock_a_fecha(self.hoy - timedelta(days=6)), {})
+
+    def test_tarea_regenera_el_dia_anterior(self):
+        self._historia()
+        self.assertEqual(tarea_saldos_diarios(), 2)
+        self.assertEqual(tarea_saldos_diarios(), 2)
+        self.assertEqual(
+            SaldoDiarioStock.objects.filter(fecha=self.hoy - timedelta(days=1)).count(), 2
+        )
+
+    def test_viewset_de_stock_con_as_of(self):
+        self._historia()
+        fecha = (self.hoy - timedelta(days=4)).isoformat()
+        response = self.client.get('/api/stock-accessories/', {'as_of': fecha})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        fila = response.data['results'][0]
+        self.assertEqual(fila['ubicacion'], self.ubicacion_a.id)
+        self.assertEqual(fila['cantidad'], Decimal('10.000'))
+        self.assertEqual(fila['producto_detail']['sku'], self.accesorio.sku)
+
+        response = self.client.get('/api/stock-accessories/', {'as_of': '31-01-2026'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_dashboard_con_as_of(self):
+        self._historia()
+        response = self.client.get(
+            '/api/reportes-v2/dashboard_stats/', {'as_of': (self.hoy - timedelta(days=2)).isoformat()}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_stock_accesorios'], Decimal('7.000'))
+        self.assertEqual(response.data['total_stock_tuberias'], 0)
+
+        actual = self.client.get('/api/reportes-v2/dashboard_stats/')
+        self.assertEqual(actual.data['total_stock_accesorios'], Decimal('11.000'))
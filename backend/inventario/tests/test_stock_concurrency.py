@@ -0,0 +1,195 @@
+"""
+Pruebas del motor de mutación de stock (UPDATE condicional y orden de locks).
+"""
+import threading
+import unittest
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connection, close_old_connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from catalogo.models import CategoriaProducto
+from inventario.models import Pipe, MovimientoInventario, StockPipe, StockAccessory
+from inventario.stock import StockDelta, agrupar_deltas, aplicar_deltas
+from inventario.tests.factories import crear_datos_base
+
+
+class StockEngineTests(TestCase):
+    """Semántica del UPDATE condicional, sin concurrencia real."""
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_datos_base(cls)
+
+    def _movimiento(self, tipo, cantidad, **kwargs):
+        return MovimientoInventario.objects.create(
+            content_type=self.ct_accesorio, object_id=self.accesorio.id,
+            tipo_movimiento=tipo, cantidad=Decimal(cantidad), **kwargs
+        )
+
+    def test_segunda_salida_pendiente_no_deja_stock_negativo(self):
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_a, cantidad=Decimal('10'))
+        primera = self._movimiento('SALIDA', '6', ubicacion_origen=self.ubicacion_a)
+        segunda = self._movimiento('SALIDA', '6', ubicacion_origen=self.ubicacion_a)
+
+        primera.status = MovimientoInventario.STATUS_APROBADO
+        primera.save()
+        segunda.status = MovimientoInventario.STATUS_APROBADO
+        with self.assertRaises(ValidationError):
+            segunda.save()
+
+        stock = StockAccessory.objects.get(producto=self.accesorio, ubicacion=self.ubicacion_a)
+        self.assertEqual(stock.cantidad, Decimal('4.000'))
+        segunda.refresh_from_db()
+        self.assertEqual(segunda.status, MovimientoInventario.STATUS_PENDIENTE)
+
+    def test_salida_usa_un_unico_update_condicional(self):
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_a, cantidad=Decimal('5'))
+        delta = StockDelta(StockAccessory, self.accesorio.id, self.ubicacion_a.id, Decimal('-2'))
+        with CaptureQueriesContext(connection) as ctx:
+            aplicar_deltas([delta])
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "inventario_stockaccessory"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('>=', updates[0])
+        # El otro UPDATE es el ajuste de stock_actual del producto
+        self.assertEqual(
+            sum(q['sql'].startswith('UPDATE') for q in ctx.captured_queries), 2
+        )
+        # Nada se lee antes del UPDATE (la lectura posterior es para el kardex)
+        sentencias = [q['sql'] for q in ctx.captured_queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertTrue(sentencias[0].startswith('UPDATE "inventario_stockaccessory"'))
+
+    def test_transferencia_falla_completa_si_origen_insuficiente(self):
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_a, cantidad=Decimal('1'))
+        with self.assertRaises(ValidationError):
+            self._movimiento(
+                'TRANSFER', '3', status=MovimientoInventario.STATUS_APROBADO,
+                ubicacion_origen=self.ubicacion_a, ubicacion_destino=self.ubicacion_b
+            )
+        self.assertFalse(
+            StockAccessory.objects.filter(producto=self.accesorio, ubicacion=self.ubicacion_b).exists()
+        )
+        self.assertEqual(
+            StockAccessory.objects.get(producto=self.accesorio, ubicacion=self.ubicacion_a).cantidad,
+            Decimal('1.000')
+        )
+
+    def test_agrupar_deltas_orden_determinista(self):
+        deltas = [
+            StockDelta(StockAccessory, 1, self.ubicacion_b.id, Decimal('1')),
+            StockDelta(StockAccessory, 1, self.ubicacion_a.id, Decimal('-1')),
+            StockDelta(StockAccessory, 1, self.ubicacion_b.id, Decimal('2')),
+        ]
+        agrupados = agrupar_deltas(deltas)
+        self.assertEqual(
+            [(d.ubicacion_id, d.cantidad) for d in agrupados],
+            [(self.ubicacion_a.id, Decimal('-1')), (self.ubicacion_b.id, Decimal('3'))]
+        )
+        self.assertEqual(agrupar_deltas(list(reversed(deltas))), agrupados)
+
+    def test_metros_totales_se_recalcula_en_el_update(self):
+        categoria = CategoriaProducto.objects.create(nombre='Tuberías', codigo='TUB')
+        pipe = Pipe.objects.create(
+            nombre='PVC 4"', sku='STK-PIPE-001', categoria=categoria,
+            proveedor=self.proveedor, unidad_medida=self.unidad,
+            material='PVC', diametro_nominal=4, presion_nominal='PN10',
+            longitud_unitaria=Decimal('6.00'), tipo_union='CAMPANA', tipo_uso='POTABLE'
+        )
+        aplicar_deltas([StockDelta(StockPipe, pipe.id, self.ubicacion_a.id, Decimal('3'))])
+        stock = StockPipe.objects.get(producto=pipe, ubicacion=self.ubicacion_a)
+        self.assertEqual(stock.cantidad, Decimal('3.000'))
+        self.assertEqual(stock.metros_totales, Decimal('18.00'))
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql',
+    'Las pruebas de concurrencia requieren PostgreSQL (SQLite serializa las escrituras)'
+)
+class StockConcurrencyStressTests(TransactionTestCase):
+    """Estrés con hilos reales contra PostgreSQL."""
+
+    HILOS = 20
+
+    def setUp(self):
+        crear_datos_base(self)
+
+    def _en_hilos(self, objetivo, n):
+        barrera = threading.Barrier(n)
+        resultados = []
+        lock = threading.Lock()
+
+        def trabajo(i):
+            try:
+                barrera.wait()
+                objetivo(i)
+                resultado = 'ok'
+            except ValidationError:
+                resultado = 'rechazado'
+            except Exception as e:  # pragma: no cover - se reporta en la aserción
+                resultado = repr(e)
+            finally:
+                close_old_connections()
+                connection.close()
+            with lock:
+                resultados.append(resultado)
+
+        hilos = [threading.Thread(target=trabajo, args=(i,)) for i in range(n)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        return resultados
+
+    def test_salidas_concurrentes_no_sobregiran(self):
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_a, cantidad=Decimal('10'))
+        pendientes = [
+            MovimientoInventario.objects.create(
+                content_type=self.ct_accesorio, object_id=self.accesorio.id,
+                tipo_movimiento='SALIDA', cantidad=Decimal('1'), ubicacion_origen=self.ubicacion_a
+            ).pk
+            for _ in range(self.HILOS)
+        ]
+
+        def aprobar(i):
+            mov = MovimientoInventario.objects.get(pk=pendientes[i])
+            mov.status = MovimientoInventario.STATUS_APROBADO
+            mov.save()
+
+        resultados = self._en_hilos(aprobar, self.HILOS)
+        self.assertEqual(resultados.count('ok'), 10, resultados)
+        self.assertEqual(resultados.count('rechazado'), self.HILOS - 10, resultados)
+        stock = StockAccessory.objects.get(producto=self.accesorio, ubicacion=self.ubicacion_a)
+        self.assertEqual(stock.cantidad, Decimal('0.000'))
+
+    def test_doble_aprobacion_aplica_una_sola_vez(self):
+        mov = MovimientoInventario.objects.create(
+            content_type=self.ct_accesorio, object_id=self.accesorio.id,
+            tipo_movimiento='ENTRADA', cantidad=Decimal('5'), ubicacion_destino=self.ubicacion_a
+        )
+
+        def aprobar(i):
+            copia = MovimientoInventario.objects.get(pk=mov.pk)
+            copia.status = MovimientoInventario.STATUS_APROBADO
+            copia.save()
+
+        self._en_hilos(aprobar, 8)
+        stock = StockAccessory.objects.get(producto=self.accesorio, ubicacion=self.ubicacion_a)
+        self.assertEqual(stock.cantidad, Decimal('5.000'))
+
+    def test_transferencias_cruzadas_sin_deadlock(self):
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_a, cantidad=Decimal('100'))
+        StockAccessory.objects.create(producto=self.accesorio, ubicacion=self.ubicacion_b, cantidad=Decimal('100'))
+
+        def transferir(i):
+            origen, destino = (self.ubicacion_a, self.ubicacion_b) if i % 2 else (self.ubicacion_b, self.ubicacion_a)
+            aplicar_deltas([
+                StockDelta(StockAccessory, self.accesorio.id, origen.id, Decimal('-1')),
+                StockDelta(StockAccessory, self.accesorio.id, destino.id, Decimal('1')),
+            ])
+
+        resultados = self._en_hilos(transferir, self.HILOS)
+        self.assertEqual(resultados, ['ok'] * self.HILOS)
+        total = sum(s.cantidad for s in StockAccessory.objects.filter(producto=self.accesorio))
+        self.assertEqual(total, Decimal('200.000'))
@@ -0,0 +1,100 @@
+"""
+Pruebas del reporte de stock por sucursal.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from catalogo.models import CategoriaProducto
+from geography.models import Ubicacion
+from institucion.models import OrganizacionCentral, Sucursal, Acueducto
+from inventario.models import (
+    Accessory, Pipe, ChemicalProduct, PumpAndMotor, StockAccessory, StockPipe,
+    UnitOfMeasure, Supplier,
+)
+
+URL = '/api/reportes-v2/stock_por_sucursal/'
+
+
+class StockPorSucursalTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = OrganizacionCentral.objects.create(nombre='Org Reporte')
+        cls.centro = Sucursal.objects.create(nombre='Centro', organizacion_central=cls.org)
+        cls.oriente = Sucursal.objects.create(nombre='Oriente', organizacion_central=cls.org)
+        cls.acu_centro = Acueducto.objects.create(nombre='Acueducto Centro', sucursal=cls.centro)
+        cls.acu_oriente = Acueducto.objects.create(nombre='Acueducto Oriente', sucursal=cls.oriente)
+        cls.alm_centro = Ubicacion.objects.create(nombre='Almacén Centro', acueducto=cls.acu_centro, tipo='ALMACEN')
+        cls.pozo_centro = Ubicacion.objects.create(nombre='Pozo 1', acueducto=cls.acu_centro, tipo='INSTALACION')
+        cls.alm_oriente = Ubicacion.objects.create(nombre='Almacén Oriente', acueducto=cls.acu_oriente, tipo='ALMACEN')
+
+        proveedor = Supplier.objects.create(nombre='Proveedor Reporte')
+        unidad = UnitOfMeasure.objects.create(nombre='Unidad', simbolo='u', tipo='UNIDAD')
+        cls.accesorio = Accessory.objects.create(
+            nombre='Codo 45°', sku='REP-ACC-001',
+            categoria=CategoriaProducto.objects.create(nombre='Accesorios', codigo='ACC'),
+            proveedor=proveedor, unidad_medida=unidad,
+            tipo_accesorio='CODO', angulo=45, material='PVC', diametro_entrada=Decimal('2.0'),
+            unidad_diametro='PULGADAS', tipo_conexion='SOLDABLE', presion_trabajo='PN10'
+        )
+        cls.pipe = Pipe.objects.create(
+            nombre='PVC 6"', sku='REP-PIPE-001',
+            categoria=CategoriaProducto.objects.create(nombre='Tuberías', codigo='TUB'),
+            proveedor=proveedor, unidad_medida=unidad,
+            material='PVC', diametro_nominal=6, presion_nominal='PN10',
+            tipo_union='SOLDABLE', tipo_uso='POTABLE'
+        )
+        StockAccessory.objects.create(producto=cls.accesorio, ubicacion=cls.alm_centro, cantidad=Decimal('5'))
+        StockAccessory.objects.create(producto=cls.accesorio, ubicacion=cls.pozo_centro, cantidad=Decimal('2'))
+        StockPipe.objects.create(producto=cls.pipe, ubicacion=cls.alm_centro, cantidad=Decimal('10'))
+        StockPipe.objects.create(producto=cls.pipe, ubicacion=cls.alm_oriente, cantidad=Decimal('3'))
+        cls.user = get_user_model().objects.create_user(username='gerente', password='x')
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        ContentType.objects.get_for_models(ChemicalProduct, Pipe, PumpAndMotor, Accessory)
+
+    def test_totales_por_sucursal_todos_los_tipos(self):
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        por_nombre = {s['nombre']: s for s in response.data}
+
+        centro = por_nombre['Centro']
+        self.assertEqual(centro['total_acueductos'], 1)
+        self.assertEqual(centro['stock_accesorios'], Decimal('7.000'))
+        self.assertEqual(centro['stock_tuberias'], Decimal('10.000'))
+        self.assertEqual(centro['stock_quimicos'], 0)
+        self.assertEqual(centro['stock_equipos'], 0)
+        self.assertEqual(centro['stock_total'], Decimal('17.000'))
+        self.assertNotIn('acueductos', centro)
+        self.assertEqual(por_nombre['Oriente']['stock_total'], Decimal('3.000'))
+
+    def test_desglose_por_ubicacion(self):
+        response = self.client.get(URL, {'desglose': 'ubicacion'})
+        centro = next(s for s in response.data if s['nombre'] == 'Centro')
+        acueducto = centro['acueductos'][0]
+        self.assertEqual(acueducto['nombre'], 'Acueducto Centro')
+        self.assertEqual(acueducto['stock_total'], Decimal('17.000'))
+        ubicaciones = {u['nombre']: u['stock_total'] for u in acueducto['ubicaciones']}
+        self.assertEqual(ubicaciones, {'Almacén Centro': Decimal('15.000'), 'Pozo 1': Decimal('2.000')})
+
+        response = self.client.get(URL, {'desglose': 'region'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_consultas_constantes(self):
+        with CaptureQueriesContext(connection) as antes:
+            self.client.get(URL, {'desglose': 'acueducto'})
+        for i in range(5):
+            sucursal = Sucursal.objects.create(nombre=f'Nueva {i}', organizacion_central=self.org)
+            acueducto = Acueducto.objects.create(nombre=f'Acueducto {i}', sucursal=sucursal)
+            ubicacion = Ubicacion.objects.create(nombre=f'Almacén {i}', acueducto=acueducto, tipo='ALMACEN')
+            StockPipe.objects.create(producto=self.pipe, ubicacion=ubicacion, cantidad=Decimal('1'))
+        with CaptureQueriesContext(connection) as despues:
+            response = self.client.get(URL, {'desglose': 'acueducto'})
+        self.assertEqual(len(response.data), 7)
+        self.assertEqual(len(despues.captured_queries), len(antes.captured_queries))
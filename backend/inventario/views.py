@@ -2,7 +2,10 @@ from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.serializers import ListSerializer
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.db.models import Q, Sum, F, Count
 from decimal import Decimal
 from inventario.models import Acueducto
@@ -10,14 +13,16 @@ from inventario.models import Acueducto
 from inventario.permissions import IsAdminOrReadOnly, IsAdminOrSameSucursal
 from inventario.serializers import AcueductoSerializer
 from .filters import MovimientoInventarioFilter
-from auditoria.mixins import AuditMixin, TrashBinMixin
+from auditoria.mixins import AuditMixin, TrashBinMixin, ExportCSVMixin, ListadoMixin, respuesta_csv
+from auditoria.pagination import MovimientoPagination
+from auditoria.utils import log_actions
 # Imports de modelos y serializers
 from inventario.models import (
     OrganizacionCentral, Sucursal, Acueducto,
     UnitOfMeasure, Supplier,
     ChemicalProduct, Pipe, PumpAndMotor, Accessory,
     StockChemical, StockPipe, StockPumpAndMotor, StockAccessory,
-    FichaTecnicaMotor, RegistroMantenimiento
+    MovimientoInventario, FichaTecnicaMotor, RegistroMantenimiento
 )
 from catalogo.models import CategoriaProducto, Marca
 from django.contrib.auth import get_user_model
@@ -36,6 +41,87 @@ from inventario.serializers import (
 )
 
 
+# Columnas de ?format=csv compartidas por los catálogos de productos
+CAMPOS_EXPORTACION_PRODUCTO = [
+    ('SKU', 'sku'),
+    ('Nombre', 'nombre'),
+    ('Categoría', 'categoria__nombre'),
+    ('Unidad', 'unidad_medida__simbolo'),
+    ('Proveedor', 'proveedor__nombre'),
+    ('Stock actual', 'stock_actual'),
+    ('Stock mínimo', 'stock_minimo'),
+    ('Precio unitario', 'precio_unitario'),
+    ('Activo', 'activo'),
+]
+
+# Columnas de ?format=csv compartidas por los listados de stock
+CAMPOS_EXPORTACION_STOCK = [
+    ('SKU', 'producto__sku'),
+    ('Producto', 'producto__nombre'),
+    ('Sucursal', 'ubicacion__acueducto__sucursal__nombre'),
+    ('Acueducto', 'ubicacion__acueducto__nombre'),
+    ('Ubicación', 'ubicacion__nombre'),
+    ('Cantidad', 'cantidad'),
+]
+
+
+class ImportacionCSVMixin:
+    """
+    ``POST <recurso>/importar/`` con la plantilla CSV en el campo ``archivo``
+    (multipart). ``?dry_run=1`` valida sin escribir. Ver inventario/importacion.py.
+    """
+    tipo_importacion = None
+
+    @action(detail=False, methods=['post'], url_path='importar', parser_classes=[MultiPartParser, FormParser])
+    def importar(self, request):
+        from inventario.importacion import importar_csv, ErrorImportacion
+
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({'error': 'Adjunte la plantilla CSV en el campo "archivo"'}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true')
+        try:
+            resultado = importar_csv(self.tipo_importacion, archivo, dry_run=dry_run)
+        except ErrorImportacion as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resultado)
+
+
+class HistorialProductoMixin:
+    """
+    ``GET <producto>/{id}/history/``: movimientos del producto por cursor, con
+    los saldos que dejó cada uno (ver inventario/historial.py). ``?desde`` y
+    ``?hasta`` (YYYY-MM-DD, ambos inclusive) acotan por fecha; ``?page_size``
+    hasta 100. Responde con ETag y 304 si coincide ``If-None-Match``.
+    """
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        from datetime import timedelta
+        from django.utils.cache import patch_cache_control
+        from django.utils.http import parse_etags
+        from inventario.historial import pagina_historial, ttl
+        from inventario.stock import fin_del_dia
+
+        producto = self.get_object()
+        desde, hasta = fecha_parametro(request, 'desde'), fecha_parametro(request, 'hasta')
+        datos, etag, inmutable = pagina_historial(
+            type(producto), producto.pk, request,
+            desde=fin_del_dia(desde - timedelta(days=1)) if desde else None,
+            hasta=fin_del_dia(hasta) if hasta else None,
+        )
+        # Comparación débil, tag por tag (W/"x" equivale a "x"), y * coincide siempre
+        etags = [e.removeprefix('W/') for e in parse_etags(request.headers.get('If-None-Match', ''))]
+        if '*' in etags or etag in etags:
+            respuesta = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            respuesta = Response(datos)
+        respuesta['ETag'] = etag
+        if inmutable:
+            patch_cache_control(respuesta, private=True, max_age=ttl())
+        return respuesta
+
+
 # ============================================================================
 # VIEWSETS DE MODELOS ORGANIZACIONALES
 # ============================================================================
@@ -47,7 +133,7 @@ class OrganizacionCentralViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
     search_fields = ['nombre', 'rif']
 
-class SucursalViewSet(viewsets.ModelViewSet):
+class SucursalViewSet(ImportacionCSVMixin, viewsets.ModelViewSet):
     """ViewSet para sucursales."""
     queryset = Sucursal.objects.select_related('organizacion_central').all()
     serializer_class = SucursalSerializer
@@ -55,6 +141,7 @@ class SucursalViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['organizacion_central']
     search_fields = ['nombre', 'codigo']
+    tipo_importacion = 'sucursales'
 
 class UserViewSet(viewsets.ModelViewSet):
     """ViewSet para gestión de usuarios."""
@@ -112,7 +199,7 @@ class SupplierViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     ordering = ['nombre']
 
 
-class AcueductoViewSet(viewsets.ModelViewSet):
+class AcueductoViewSet(ImportacionCSVMixin, viewsets.ModelViewSet):
     """ViewSet para acueductos."""
 
     queryset = Acueducto.objects.all()
@@ -127,13 +214,14 @@ class AcueductoViewSet(viewsets.ModelViewSet):
     search_fields = ['nombre', 'ubicacion']
     ordering_fields = ['nombre']
     ordering = ['nombre']
+    tipo_importacion = 'acueductos'
 
 
 # ============================================================================
 # VIEWSETS DE PRODUCTOS
 # ============================================================================
 
-class ChemicalProductViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
+class ChemicalProductViewSet(HistorialProductoMixin, ImportacionCSVMixin, ExportCSVMixin, ListadoMixin, AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     """ViewSet para productos químicos."""
     queryset = ChemicalProduct.objects.select_related(
         'categoria', 'unidad_medida', 'proveedor'
@@ -148,6 +236,12 @@ class ChemicalProductViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     search_fields = ['sku', 'nombre', 'descripcion', 'numero_un']
     ordering_fields = ['sku', 'nombre', 'stock_actual', 'precio_unitario', 'fecha_caducidad']
     ordering = ['sku']
+    tipo_importacion = 'quimicos'
+    campos_exportacion = CAMPOS_EXPORTACION_PRODUCTO + [
+        ('Peligroso', 'es_peligroso'),
+        ('Número UN', 'numero_un'),
+        ('Caducidad', 'fecha_caducidad'),
+    ]
     
     def get_serializer_class(self):
         """Usar serializer simplificado para listados."""
@@ -158,18 +252,16 @@ class ChemicalProductViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def stock_bajo(self, request):
         """Productos químicos con stock bajo."""
-        queryset = self.get_queryset().filter(
+        queryset = self.filter_queryset(self.get_queryset()).filter(
             stock_actual__lte=F('stock_minimo')
         )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.listado(queryset)
     
     @action(detail=False, methods=['get'])
     def peligrosos(self, request):
         """Productos químicos peligrosos."""
-        queryset = self.get_queryset().filter(es_peligroso=True)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.filter_queryset(self.get_queryset()).filter(es_peligroso=True)
+        return self.listado(queryset)
     
     @action(detail=False, methods=['get'])
     def proximos_vencer(self, request):
@@ -178,32 +270,14 @@ class ChemicalProductViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
         from django.utils import timezone
         
         fecha_limite = timezone.now().date() + timedelta(days=30)
-        queryset = self.get_queryset().filter(
+        queryset = self.filter_queryset(self.get_queryset()).filter(
             fecha_caducidad__lte=fecha_limite,
             fecha_caducidad__gte=timezone.now().date()
-        ).order_by('fecha_caducidad')
-        
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
-
-    @action(detail=True, methods=['get'])
-    def history(self, request, pk=None):
-        """Historial de movimientos para este químico."""
-        from inventario.models import MovimientoInventario
-        from django.contrib.contenttypes.models import ContentType
-        
-        ct = ContentType.objects.get_for_model(ChemicalProduct)
-        movimientos = MovimientoInventario.objects.filter(
-            content_type=ct, 
-            object_id=pk
-        ).order_by('-fecha_movimiento')
-        
-        from inventario.serializers import MovimientoInventarioSerializer
-        serializer = MovimientoInventarioSerializer(movimientos, many=True)
-        return Response(serializer.data)
+        ).order_by('fecha_caducidad', 'id')
+        return self.listado(queryset)
 
 
-class PipeViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
+class PipeViewSet(HistorialProductoMixin, ImportacionCSVMixin, ExportCSVMixin, ListadoMixin, AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     """ViewSet para tuberías."""
     queryset = Pipe.objects.select_related(
         'categoria', 'unidad_medida', 'proveedor'
@@ -218,6 +292,12 @@ class PipeViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     search_fields = ['sku', 'nombre', 'descripcion']
     ordering_fields = ['sku', 'nombre', 'diametro_nominal', 'stock_actual', 'precio_unitario']
     ordering = ['sku']
+    tipo_importacion = 'tuberias'
+    campos_exportacion = CAMPOS_EXPORTACION_PRODUCTO + [
+        ('Material', 'material'),
+        ('Diámetro nominal', 'diametro_nominal'),
+        ('Presión nominal', 'presion_nominal'),
+    ]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -234,29 +314,12 @@ class PipeViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        queryset = self.get_queryset().filter(diametro_nominal=diametro)
-        serializer = self.get_serializer(queryset, many=True)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.filter_queryset(self.get_queryset()).filter(diametro_nominal=diametro)
+        return self.listado(queryset)
 
-    @action(detail=True, methods=['get'])
-    def history(self, request, pk=None):
-        """Historial de movimientos para esta tubería."""
-        from inventario.models import MovimientoInventario
-        from django.contrib.contenttypes.models import ContentType
-        
-        ct = ContentType.objects.get_for_model(Pipe)
-        movimientos = MovimientoInventario.objects.filter(
-            content_type=ct, 
-            object_id=pk
-        ).order_by('-fecha_movimiento')
-        
-        from inventario.serializers import MovimientoInventarioSerializer
-        serializer = MovimientoInventarioSerializer(movimientos, many=True)
-        return Response(serializer.data)
 
 
-class PumpAndMotorViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
+class PumpAndMotorViewSet(HistorialProductoMixin, ImportacionCSVMixin, ExportCSVMixin, ListadoMixin, AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     """ViewSet para bombas y motores."""
     queryset = PumpAndMotor.objects.select_related(
         'categoria', 'unidad_medida', 'proveedor'
@@ -271,6 +334,12 @@ class PumpAndMotorViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     search_fields = ['sku', 'nombre', 'descripcion', 'numero_serie', 'marca', 'modelo']
     ordering_fields = ['sku', 'nombre', 'potencia_hp', 'stock_actual', 'precio_unitario']
     ordering = ['sku']
+    tipo_importacion = 'bombas'
+    campos_exportacion = CAMPOS_EXPORTACION_PRODUCTO + [
+        ('Marca', 'marca__nombre'),
+        ('Modelo', 'modelo'),
+        ('Número de serie', 'numero_serie'),
+    ]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -280,35 +349,26 @@ class PumpAndMotorViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def by_power_range(self, request):
         """Bombas por rango de potencia."""
-        min_hp = request.query_params.get('min_hp', 0)
-        max_hp = request.query_params.get('max_hp', 999)
+        from decimal import InvalidOperation
+
+        try:
+            min_hp = Decimal(request.query_params.get('min_hp', 0))
+            max_hp = Decimal(request.query_params.get('max_hp', 999))
+        except InvalidOperation:
+            return Response(
+                {'error': 'min_hp y max_hp deben ser números'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        queryset = self.get_queryset().filter(
-            potencia_hp__gte=Decimal(min_hp),
-            potencia_hp__lte=Decimal(max_hp)
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            potencia_hp__gte=min_hp,
+            potencia_hp__lte=max_hp
         )
-        serializer = self.get_serializer(queryset, many=True)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.listado(queryset)
 
-    @action(detail=True, methods=['get'])
-    def history(self, request, pk=None):
-        """Historial de movimientos para esta bomba/motor."""
-        from inventario.models import MovimientoInventario
-        from django.contrib.contenttypes.models import ContentType
-        
-        ct = ContentType.objects.get_for_model(PumpAndMotor)
-        movimientos = MovimientoInventario.objects.filter(
-            content_type=ct, 
-            object_id=pk
-        ).order_by('-fecha_movimiento')
-        
-        from inventario.serializers import MovimientoInventarioSerializer
-        serializer = MovimientoInventarioSerializer(movimientos, many=True)
-        return Response(serializer.data)
 
 
-class AccessoryViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
+class AccessoryViewSet(HistorialProductoMixin, ImportacionCSVMixin, ExportCSVMixin, ListadoMixin, AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     """ViewSet para accesorios."""
     queryset = Accessory.objects.select_related(
         'categoria', 'unidad_medida', 'proveedor'
@@ -323,6 +383,11 @@ class AccessoryViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     search_fields = ['sku', 'nombre', 'descripcion']
     ordering_fields = ['sku', 'nombre', 'stock_actual', 'precio_unitario']
     ordering = ['sku']
+    tipo_importacion = 'accesorios'
+    campos_exportacion = CAMPOS_EXPORTACION_PRODUCTO + [
+        ('Tipo', 'tipo_accesorio'),
+        ('Material', 'material'),
+    ]
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -332,33 +397,153 @@ class AccessoryViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def valvulas(self, request):
         """Filtrar solo válvulas."""
-        queryset = self.get_queryset().filter(tipo_accesorio='VALVULA')
-        serializer = self.get_serializer(queryset, many=True)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.filter_queryset(self.get_queryset()).filter(tipo_accesorio='VALVULA')
+        return self.listado(queryset)
 
-    @action(detail=True, methods=['get'])
-    def history(self, request, pk=None):
-        """Historial de movimientos para este accesorio."""
-        from inventario.models import MovimientoInventario
-        from django.contrib.contenttypes.models import ContentType
-        
-        ct = ContentType.objects.get_for_model(Accessory)
-        movimientos = MovimientoInventario.objects.filter(
-            content_type=ct, 
-            object_id=pk
-        ).order_by('-fecha_movimiento')
-        
-        from inventario.serializers import MovimientoInventarioSerializer
-        serializer = MovimientoInventarioSerializer(movimientos, many=True)
-        return Response(serializer.data)
 
 
 # ============================================================================
 # VIEWSETS DE STOCK
 # ============================================================================
 
-class StockChemicalViewSet(viewsets.ModelViewSet):
+class StockTotalMixin:
+    """
+    Las ediciones directas de filas de stock no pasan por un movimiento:
+    se registran en el kardex y se recalcula ``stock_actual`` del producto
+    afectado para que ninguno de los dos se desfase.
+    """
+
+    def _recalcular_total(self, producto):
+        from inventario.stock import recalcular_stock_actual
+        recalcular_stock_actual(type(producto), ids=[producto.pk])
+
+    def perform_create(self, serializer):
+        from inventario.stock import registrar_edicion_directa
+        with transaction.atomic():
+            super().perform_create(serializer)
+            registrar_edicion_directa(serializer.instance, 0)
+            self._recalcular_total(serializer.instance.producto)
+
+    def perform_update(self, serializer):
+        from inventario.stock import registrar_edicion_directa
+        anterior = type(serializer.instance).objects.get(pk=serializer.instance.pk)
+        with transaction.atomic():
+            super().perform_update(serializer)
+            stock = serializer.instance
+            clave = lambda s: (s.producto_id, s.ubicacion_id, getattr(s, 'lote', ''))
+            if clave(anterior) == clave(stock):
+                registrar_edicion_directa(stock, anterior.cantidad)
+            else:
+                # Cambió la clave de la fila: se cierra la anterior y se abre la nueva
+                registrar_edicion_directa(anterior, anterior.cantidad, saldo=0)
+                registrar_edicion_directa(stock, 0)
+                self._recalcular_total(anterior.producto)
+            self._recalcular_total(stock.producto)
+
+    def perform_destroy(self, instance):
+        from inventario.stock import registrar_edicion_directa
+        cantidad_anterior = instance.cantidad
+        with transaction.atomic():
+            super().perform_destroy(instance)
+            registrar_edicion_directa(instance, cantidad_anterior, saldo=0)
+            self._recalcular_total(instance.producto)
+
+
+def fecha_parametro(request, nombre):
+    """Lee ``?<nombre>=YYYY-MM-DD``; ``None`` si no viene."""
+    from django.utils.dateparse import parse_date
+    from rest_framework.exceptions import ValidationError as DRFValidationError
+
+    valor = request.query_params.get(nombre)
+    if not valor:
+        return None
+    try:
+        fecha = parse_date(valor)
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise DRFValidationError({nombre: 'Formato esperado YYYY-MM-DD'})
+    return fecha
+
+
+def fecha_as_of(request):
+    return fecha_parametro(request, 'as_of')
+
+
+def filtro_sucursal_usuario(user, campo='ubicacion__acueducto__sucursal'):
+    """``Q`` con la restricción por sucursal de los usuarios no administradores."""
+    if user.role == user.ROLE_ADMIN:
+        return Q()
+    if user.sucursal:
+        return Q(**{campo: user.sucursal})
+    return Q(pk__in=[])
+
+
+class StockAsOfMixin:
+    """
+    ``GET ?as_of=YYYY-MM-DD`` en los listados de stock: devuelve el stock al
+    cierre de ese día (foto diaria + deltas del kardex) en lugar de las filas
+    actuales. Respeta la restricción por sucursal y los filtros ``producto`` y
+    ``ubicacion__acueducto``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        fecha = fecha_as_of(request)
+        if fecha is None:
+            return super().list(request, *args, **kwargs)
+
+        from django.contrib.contenttypes.models import ContentType
+        from geography.models import Ubicacion
+        from inventario.stock import modelo_producto, stock_a_fecha
+
+        producto_model = modelo_producto(self.queryset.model)
+        filtro = Q(content_type=ContentType.objects.get_for_model(producto_model))
+        filtro &= filtro_sucursal_usuario(request.user)
+        for param, lookup in (('producto', 'object_id'), ('ubicacion__acueducto', 'ubicacion__acueducto')):
+            valor = request.query_params.get(param)
+            if valor:
+                filtro &= Q(**{lookup: valor})
+
+        saldos = stock_a_fecha(fecha, filtro)
+        productos = producto_model.all_objects.only('id', 'sku', 'nombre').in_bulk({c[1] for c in saldos})
+        ubicaciones = Ubicacion.objects.select_related('acueducto').in_bulk({c[2] for c in saldos})
+
+        data = []
+        for (_, producto_id, ubicacion_id, lote), cantidad in saldos.items():
+            producto, ubicacion = productos.get(producto_id), ubicaciones[ubicacion_id]
+            data.append({
+                'producto': producto_id,
+                'producto_detail': {
+                    'id': producto_id,
+                    'sku': producto.sku if producto else None,
+                    'nombre': producto.nombre if producto else None,
+                },
+                'ubicacion': ubicacion_id,
+                'acueducto_detail': str(ubicacion.acueducto) if ubicacion.acueducto else None,
+                'lote': lote,
+                'cantidad': cantidad,
+                'as_of': fecha,
+            })
+        data.sort(key=lambda d: (d['producto_detail']['sku'] or '', d['ubicacion'], d['lote']))
+
+        if request.accepted_renderer.format == 'csv':
+            return respuesta_csv(
+                f'{self.basename}_{fecha.isoformat()}',
+                ['SKU', 'Producto', 'Acueducto', 'Ubicación', 'Lote', 'Cantidad'],
+                (
+                    (d['producto_detail']['sku'], d['producto_detail']['nombre'],
+                     d['acueducto_detail'], ubicaciones[d['ubicacion']].nombre, d['lote'], d['cantidad'])
+                    for d in data
+                ),
+            )
+
+        page = self.paginate_queryset(data)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(data)
+
+
+class StockChemicalViewSet(StockAsOfMixin, ExportCSVMixin, StockTotalMixin, viewsets.ModelViewSet):
     """ViewSet para stock de químicos."""
     queryset = StockChemical.objects.select_related(
         'producto', 'producto__categoria', 'ubicacion__acueducto', 'ubicacion__acueducto__sucursal'
@@ -369,6 +554,10 @@ class StockChemicalViewSet(viewsets.ModelViewSet):
     filterset_fields = ['producto', 'ubicacion__acueducto']
     search_fields = ['producto__nombre', 'producto__sku', 'lote', 'ubicacion__nombre']
     ordering = ['producto__sku']
+    campos_exportacion = CAMPOS_EXPORTACION_STOCK + [
+        ('Lote', 'lote'),
+        ('Vencimiento', 'fecha_vencimiento'),
+    ]
     
     def get_queryset(self):
         """Filtrar por sucursal del usuario."""
@@ -384,7 +573,7 @@ class StockChemicalViewSet(viewsets.ModelViewSet):
         return queryset.none()
 
 
-class StockPipeViewSet(viewsets.ModelViewSet):
+class StockPipeViewSet(StockAsOfMixin, ExportCSVMixin, StockTotalMixin, viewsets.ModelViewSet):
     """ViewSet para stock de tuberías."""
     queryset = StockPipe.objects.select_related(
         'producto', 'producto__categoria', 'ubicacion__acueducto', 'ubicacion__acueducto__sucursal'
@@ -395,6 +584,7 @@ class StockPipeViewSet(viewsets.ModelViewSet):
     filterset_fields = ['producto', 'ubicacion__acueducto']
     search_fields = ['producto__nombre', 'producto__sku', 'ubicacion__nombre']
     ordering = ['producto__sku']
+    campos_exportacion = CAMPOS_EXPORTACION_STOCK
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -409,7 +599,7 @@ class StockPipeViewSet(viewsets.ModelViewSet):
         return queryset.none()
 
 
-class StockPumpAndMotorViewSet(viewsets.ModelViewSet):
+class StockPumpAndMotorViewSet(StockAsOfMixin, ExportCSVMixin, StockTotalMixin, viewsets.ModelViewSet):
     """ViewSet para stock de bombas/motores."""
     queryset = StockPumpAndMotor.objects.select_related(
         'producto', 'producto__categoria', 'ubicacion__acueducto', 'ubicacion__acueducto__sucursal'
@@ -420,6 +610,10 @@ class StockPumpAndMotorViewSet(viewsets.ModelViewSet):
     filterset_fields = ['producto', 'ubicacion__acueducto', 'estado_operativo']
     search_fields = ['producto__nombre', 'producto__numero_serie', 'ubicacion__nombre']
     ordering = ['producto__numero_serie']
+    campos_exportacion = CAMPOS_EXPORTACION_STOCK + [
+        ('Número de serie', 'producto__numero_serie'),
+        ('Estado operativo', 'estado_operativo'),
+    ]
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -434,7 +628,7 @@ class StockPumpAndMotorViewSet(viewsets.ModelViewSet):
         return queryset.none()
 
 
-class StockAccessoryViewSet(viewsets.ModelViewSet):
+class StockAccessoryViewSet(StockAsOfMixin, ExportCSVMixin, StockTotalMixin, viewsets.ModelViewSet):
     """ViewSet para stock de accesorios."""
     queryset = StockAccessory.objects.select_related(
         'producto', 'producto__categoria', 'ubicacion__acueducto', 'ubicacion__acueducto__sucursal'
@@ -445,6 +639,7 @@ class StockAccessoryViewSet(viewsets.ModelViewSet):
     filterset_fields = ['producto', 'ubicacion__acueducto']
     search_fields = ['producto__nombre', 'producto__sku', 'ubicacion__nombre']
     ordering = ['producto__sku']
+    campos_exportacion = CAMPOS_EXPORTACION_STOCK
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -464,7 +659,7 @@ class StockAccessoryViewSet(viewsets.ModelViewSet):
 # VIEWSET DE MOVIMIENTOS
 # ============================================================================
 
-class MovimientoInventarioViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
+class MovimientoInventarioViewSet(ExportCSVMixin, AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     """ViewSet para movimientos de inventario."""
     # queryset se define dinámicamente o se importa
     serializer_class = MovimientoInventarioSerializer
@@ -472,13 +667,50 @@ class MovimientoInventarioViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewS
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = MovimientoInventarioFilter
     search_fields = ['razon']  # producto__sku no compatible con GFK en SearchFilter
-    ordering = ['-fecha_movimiento']
+    ordering = ['-fecha_movimiento', '-id']
+    pagination_class = MovimientoPagination
+    campos_exportacion = [
+        ('ID', 'id'),
+        ('Fecha', 'fecha_movimiento'),
+        ('Tipo', 'tipo_movimiento'),
+        ('Estado', 'status'),
+        ('Tipo de producto', 'content_type__model'),
+        ('SKU', 'producto_sku'),
+        ('Cantidad', 'cantidad'),
+        ('Origen', 'ubicacion_origen__nombre'),
+        ('Destino', 'ubicacion_destino__nombre'),
+        ('Razón', 'razon'),
+        ('Creado por', 'creado_por__username'),
+    ]
 
     def get_queryset(self):
-        from inventario.models import MovimientoInventario
-        return MovimientoInventario.objects.all().select_related(
-            'ubicacion_origen', 'ubicacion_destino', 'creado_por', 'content_type'
-        ).prefetch_related('producto')
+        return MovimientoInventario.para_listado()
+
+    def get_queryset_exportacion(self, queryset):
+        """El SKU sale de una subconsulta por tipo de producto (el GFK no admite JOIN)."""
+        from django.contrib.contenttypes.models import ContentType
+        from django.db.models import Case, When, OuterRef, Subquery
+
+        modelos = (ChemicalProduct, Pipe, PumpAndMotor, Accessory)
+        cts = ContentType.objects.get_for_models(*modelos)
+        return queryset.annotate(producto_sku=Case(*[
+            When(content_type=cts[modelo], then=Subquery(
+                modelo.all_objects.filter(pk=OuterRef('object_id')).values('sku')[:1]
+            ))
+            for modelo in modelos
+        ]))
+
+    def get_serializer(self, *args, **kwargs):
+        # POST con una lista => creación masiva (MovimientoInventarioListSerializer)
+        if self.action == 'create' and isinstance(kwargs.get('data'), list):
+            kwargs['many'] = True
+        return super().get_serializer(*args, **kwargs)
+
+    def perform_create(self, serializer):
+        if isinstance(serializer, ListSerializer):
+            log_actions(serializer.save(), 'CREATE')
+        else:
+            super().perform_create(serializer)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def aprobar(self, request, pk=None):
@@ -504,6 +736,37 @@ class MovimientoInventarioViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewS
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def aprobar_lote(self, request):
+        """
+        Aprueba varios movimientos pendientes en una sola transacción.
+        Body: {"ids": [1, 2, 3]}. Responde el resultado de cada movimiento.
+        """
+        if request.user.role != 'ADMIN':
+            return Response(
+                {'error': 'Solo un administrador puede aprobar movimientos'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        ids = request.data.get('ids')
+        try:
+            ids = [int(i) for i in ids] if isinstance(ids, list) else None
+        except (TypeError, ValueError):
+            ids = None
+        if not ids:
+            return Response(
+                {'error': 'Debe enviar una lista "ids" con los movimientos a aprobar'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        resultados = MovimientoInventario.aprobar_lote(ids, usuario=request.user)
+        aprobados = sum(1 for r in resultados if r['status'] == MovimientoInventario.STATUS_APROBADO)
+        return Response({
+            'aprobados': aprobados,
+            'fallidos': len(resultados) - aprobados,
+            'resultados': resultados,
+        })
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def rechazar(self, request, pk=None):
         """Rechaza un movimiento pendiente."""
@@ -534,20 +797,33 @@ class RefactoredReportesViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'])
     def dashboard_stats(self, request):
-        """Estadísticas generales para el dashboard."""
-        from inventario.models import Pipe, PumpAndMotor, Sucursal, StockPipe, StockPumpAndMotor, ChemicalProduct, Accessory, StockChemical, StockAccessory
-        
-        stats = {
-            'total_tuberias': Pipe.objects.count(),
-            'total_equipos': PumpAndMotor.objects.count(),
-            'total_sucursales': Sucursal.objects.count(),
-            'total_stock_tuberias': StockPipe.objects.aggregate(total=Sum('cantidad'))['total'] or 0,
-            'total_stock_equipos': StockPumpAndMotor.objects.aggregate(total=Sum('cantidad'))['total'] or 0,
-            'total_productos_quimicos': ChemicalProduct.objects.count(),
-            'total_accesorios': Accessory.objects.count(),
-            'total_stock_quimicos': StockChemical.objects.aggregate(total=Sum('cantidad'))['total'] or 0,
-            'total_stock_accesorios': StockAccessory.objects.aggregate(total=Sum('cantidad'))['total'] or 0,
-        }
+        """
+        Estadísticas generales para el dashboard (en caché, ver ``inventario.dashboard``).
+        Con ``?as_of=YYYY-MM-DD`` los totales de stock son al cierre de ese día.
+        """
+        from inventario.dashboard import obtener_dashboard
+
+        stats = dict(obtener_dashboard(request.user))
+        fecha = fecha_as_of(request)
+        if fecha is None:
+            return Response(stats)
+
+        from collections import defaultdict
+        from django.contrib.contenttypes.models import ContentType
+        from inventario.models import Pipe, PumpAndMotor, ChemicalProduct, Accessory
+        from inventario.stock import stock_a_fecha
+
+        por_tipo = defaultdict(Decimal)
+        for (ct_id, *_), cantidad in stock_a_fecha(fecha, filtro_sucursal_usuario(request.user)).items():
+            por_tipo[ct_id] += cantidad
+        cts = ContentType.objects.get_for_models(Pipe, PumpAndMotor, ChemicalProduct, Accessory)
+        stats.update({
+            'as_of': fecha,
+            'total_stock_tuberias': por_tipo[cts[Pipe].id],
+            'total_stock_equipos': por_tipo[cts[PumpAndMotor].id],
+            'total_stock_quimicos': por_tipo[cts[ChemicalProduct].id],
+            'total_stock_accesorios': por_tipo[cts[Accessory].id],
+        })
         return Response(stats)
     
     @action(detail=False, methods=['get'])
@@ -560,7 +836,7 @@ class RefactoredReportesViewSet(viewsets.ViewSet):
         dias = int(request.query_params.get('dias', 30))
         fecha_inicio = timezone.now() - timedelta(days=dias)
         
-        movimientos = MovimientoInventario.objects.filter(
+        movimientos = MovimientoInventario.para_listado().filter(
             fecha_movimiento__gte=fecha_inicio
         ).order_by('-fecha_movimiento')
         
@@ -569,28 +845,83 @@ class RefactoredReportesViewSet(viewsets.ViewSet):
     
     @action(detail=False, methods=['get'])
     def stock_por_sucursal(self, request):
-        """Resumen de stock por sucursal."""
-        from inventario.models import Sucursal, Acueducto, StockPipe, StockPumpAndMotor
-        
-        sucursales = Sucursal.objects.all()
+        """
+        Resumen de stock por sucursal para los cuatro tipos de producto.
+
+        Query params:
+            desglose: ``acueducto`` o ``ubicacion`` para anidar el detalle.
+            as_of: YYYY-MM-DD para el stock al cierre de ese día.
+
+        Se calcula con una consulta agrupada por tabla de stock y se
+        consolida en memoria; el número de consultas no depende de la
+        cantidad de sucursales.
+        """
+        from geography.models import Ubicacion
+        from inventario.models import Sucursal, Acueducto, StockChemical, StockPipe, StockPumpAndMotor, StockAccessory
+        from inventario.stock import totales_por_ubicacion
+
+        desglose = request.query_params.get('desglose')
+        if desglose not in (None, '', 'acueducto', 'ubicacion'):
+            return Response(
+                {'error': 'desglose debe ser "acueducto" o "ubicacion"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        campos = {
+            StockChemical: 'stock_quimicos',
+            StockPipe: 'stock_tuberias',
+            StockPumpAndMotor: 'stock_equipos',
+            StockAccessory: 'stock_accesorios',
+        }
+
+        def nodo(id, nombre):
+            return dict({'id': id, 'nombre': nombre}, stock_total=0, **{c: 0 for c in campos.values()})
+
+        def sumar(destino, campo, total):
+            destino[campo] += total
+            destino['stock_total'] += total
+
+        totales = totales_por_ubicacion(fecha_as_of(request))
+        sucursales = {id: nodo(id, nombre) for id, nombre in Sucursal.objects.values_list('id', 'nombre')}
+        acueductos = {}
+        for id, nombre, sucursal_id in Acueducto.objects.values_list('id', 'nombre', 'sucursal_id'):
+            acueductos[id] = dict(nodo(id, nombre), sucursal_id=sucursal_id)
+            sucursales[sucursal_id].setdefault('acueductos', []).append(acueductos[id])
+        ubicaciones = {
+            id: dict(nodo(id, nombre), acueducto_id=acueducto_id)
+            for id, nombre, acueducto_id in Ubicacion.objects.filter(
+                pk__in={ubicacion_id for _, ubicacion_id in totales}, acueducto__isnull=False
+            ).values_list('id', 'nombre', 'acueducto_id')
+        }
+
+        for (stock_model, ubicacion_id), total in totales.items():
+            ubicacion = ubicaciones.get(ubicacion_id)
+            if ubicacion is None:
+                continue
+            acueducto = acueductos[ubicacion['acueducto_id']]
+            for destino in (ubicacion, acueducto, sucursales[acueducto['sucursal_id']]):
+                sumar(destino, campos[stock_model], total)
+        for ubicacion in ubicaciones.values():
+            if ubicacion['stock_total']:
+                acueductos[ubicacion['acueducto_id']].setdefault('ubicaciones', []).append(ubicacion)
+
         data = []
-        
-        for suc in sucursales:
-            acueductos = Acueducto.objects.filter(sucursal=suc)
-            stock_tuberias = StockPipe.objects.filter(acueducto__in=acueductos).aggregate(total=Sum('cantidad'))['total'] or 0
-            stock_equipos = StockPumpAndMotor.objects.filter(acueducto__in=acueductos).aggregate(total=Sum('cantidad'))['total'] or 0
-            
-            data.append({
-                'id': suc.id,
-                'nombre': suc.nombre,
-                'total_acueductos': acueductos.count(),
-                'stock_tuberias': stock_tuberias,
-                'stock_equipos': stock_equipos,
-                'stock_total': stock_tuberias + stock_equipos
-            })
-            
+        for sucursal in sucursales.values():
+            detalle = sucursal.pop('acueductos', [])
+            sucursal['total_acueductos'] = len(detalle)
+            if desglose:
+                for acueducto in detalle:
+                    acueducto.pop('sucursal_id')
+                    detalle_ubicaciones = acueducto.pop('ubicaciones', [])
+                    if desglose == 'ubicacion':
+                        for ubicacion in detalle_ubicaciones:
+                            ubicacion.pop('acueducto_id')
+                        acueducto['ubicaciones'] = detalle_ubicaciones
+                sucursal['acueductos'] = detalle
+            data.append(sucursal)
+
         return Response(data)
-    
+
     @action(detail=False, methods=['get'])
     def resumen_movimientos(self, request):
         """Resumen cuantitativo de movimientos por tipo."""
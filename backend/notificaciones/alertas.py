@@ -0,0 +1,303 @@
+"""
+Evaluación de alertas de stock bajo.
+
+``evaluar_alertas`` revisa todas las ``Alerta`` activas con una consulta
+agrupada por tabla Stock* (suma por producto y acueducto, sin importar
+cuántas ubicaciones o lotes tenga) y crea las notificaciones de una vez.
+
+La deduplicación usa la clave única ``(alerta, ventana)`` de ``Notificacion``:
+``ventana`` es el número de intervalo de ``STOCK_ALERT_WINDOW_HOURS`` horas
+desde epoch, así que una alerta notifica como máximo una vez por ventana
+aunque dos evaluaciones corran a la vez.
+
+El envío (email y Telegram) lo hace ``despachar_alertas``, normalmente desde
+la tarea Celery ``enviar_alertas_stock``; cada notificación se marca
+``enviada`` en la misma transacción, por lo que un reintento no repite avisos.
+"""
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+VENTANA_HORAS_DEFECTO = 24
+
+
+def ventana_actual(momento=None):
+    """Número de ventana de deduplicación que contiene ``momento``."""
+    horas = getattr(settings, 'STOCK_ALERT_WINDOW_HOURS', VENTANA_HORAS_DEFECTO)
+    momento = momento or timezone.now()
+    return int(momento.timestamp() // (horas * 3600))
+
+
+def stock_por_alerta(alertas):
+    """
+    Stock total de cada alerta en su acueducto.
+
+    Una consulta agrupada por tipo de producto presente en ``alertas``.
+
+    Returns:
+        dict: ``{alerta.pk: (producto_model, total)}``.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from inventario.stock import modelo_stock
+
+    por_tipo = defaultdict(list)
+    for alerta in alertas:
+        por_tipo[alerta.content_type_id].append(alerta)
+
+    resultado = {}
+    for ct_id, grupo in por_tipo.items():
+        producto_model = ContentType.objects.get_for_id(ct_id).model_class()
+        try:
+            stock_model = modelo_stock(producto_model)
+        except FieldDoesNotExist:
+            continue  # tipo sin tabla de stock
+        filas = stock_model.objects.filter(
+            producto_id__in={a.object_id for a in grupo},
+            ubicacion__acueducto_id__in={a.acueducto_id for a in grupo},
+        ).values('producto_id', 'ubicacion__acueducto_id').annotate(
+            total=Sum('cantidad')
+        ).values_list('producto_id', 'ubicacion__acueducto_id', 'total')
+        totales = {(producto_id, acueducto_id): total for producto_id, acueducto_id, total in filas}
+        for alerta in grupo:
+            total = totales.get((alerta.object_id, alerta.acueducto_id)) or Decimal('0')
+            resultado[alerta.pk] = (producto_model, Decimal(total))
+    return resultado
+
+
+def _nombres_productos(alertas, stock):
+    """``{(producto_model, id): 'SKU - Nombre'}`` con una consulta por tipo."""
+    ids = defaultdict(set)
+    for alerta in alertas:
+        if alerta.pk in stock:
+            ids[stock[alerta.pk][0]].add(alerta.object_id)
+    nombres = {}
+    for producto_model, pks in ids.items():
+        for pk, sku, nombre in producto_model._base_manager.filter(pk__in=pks).values_list('pk', 'sku', 'nombre'):
+            nombres[(producto_model, pk)] = f"{sku} - {nombre}"
+    return nombres
+
+
+def _notificar(alertas, ventana):
+    """
+    Crea la notificación de cada alerta de ``alertas`` cuyo stock esté en o
+    bajo el umbral. Las alertas ya notificadas en la ventana deben venir
+    excluidas; la restricción única descarta las que otro proceso se adelantó
+    a crear.
+
+    Returns:
+        list[Notificacion]: las pendientes de envío de esas alertas en la ventana.
+    """
+    from notificaciones.models import Notificacion
+
+    stock = stock_por_alerta(alertas)
+    disparadas = [a for a in alertas if a.pk in stock and stock[a.pk][1] <= a.umbral_minimo]
+    if not disparadas:
+        return []
+
+    nombres = _nombres_productos(disparadas, stock)
+    nuevas = []
+    for alerta in disparadas:
+        producto_model, cantidad = stock[alerta.pk]
+        producto = nombres.get((producto_model, alerta.object_id), f"#{alerta.object_id}")
+        mensaje = (
+            f"Alerta: Stock bajo para {producto} en {alerta.acueducto}. "
+            f"Cantidad actual: {cantidad}. Umbral: {alerta.umbral_minimo}."
+        )
+        nuevas.append(Notificacion(mensaje=mensaje[:255], tipo='WARNING', alerta=alerta, ventana=ventana))
+
+    Notificacion.objects.bulk_create(nuevas, ignore_conflicts=True)
+    return list(
+        Notificacion.objects.filter(
+            ventana=ventana, alerta_id__in=[a.pk for a in disparadas], enviada=False
+        ).only('id', 'mensaje', 'alerta_id')
+    )
+
+
+def evaluar_alertas(momento=None):
+    """
+    Crea una notificación ``WARNING`` por cada alerta activa con stock en o
+    bajo el umbral que aún no haya notificado en la ventana actual.
+
+    Returns:
+        list: ids de las notificaciones pendientes de envío en la ventana.
+    """
+    from notificaciones.models import Alerta, Notificacion
+
+    ventana = ventana_actual(momento)
+    ya_notificadas = set(
+        Notificacion.all_objects.filter(ventana=ventana, alerta__isnull=False).order_by().values_list('alerta_id', flat=True)
+    )
+    alertas = [
+        a for a in Alerta.objects.filter(activo=True).select_related('acueducto__sucursal')
+        if a.pk not in ya_notificadas
+    ]
+    if not alertas:
+        return []
+    return [n.id for n in _notificar(alertas, ventana)]
+
+
+def despachar_alertas(ids, telegram_en_cola=True):
+    """
+    Envía por email (``STOCK_ALERT_EMAILS``) y Telegram las notificaciones
+    ``ids`` que sigan sin enviar, agrupadas en un único mensaje.
+
+    Con ``telegram_en_cola`` el mensaje de Telegram se encola como tarea al
+    confirmar; si no, se envía en línea (comando sin worker de Celery).
+
+    Returns:
+        int: notificaciones enviadas.
+    """
+    from django.core.mail import send_mail
+    from notificaciones.models import Notificacion
+    from notificaciones.tasks import send_telegram_notification
+    from notificaciones.telegram import ErrorTelegram
+
+    with transaction.atomic():
+        pendientes = list(
+            Notificacion.objects.select_for_update(skip_locked=True)
+            .filter(id__in=ids, enviada=False).order_by('id')
+        )
+        if not pendientes:
+            return 0
+        texto = '\n'.join(n.mensaje for n in pendientes)
+
+        destinatarios = getattr(settings, 'STOCK_ALERT_EMAILS', None)
+        if destinatarios:
+            send_mail(
+                subject='Alerta de stock bajo - SIAE',
+                message=texto,
+                from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', None),
+                recipient_list=destinatarios if isinstance(destinatarios, (list, tuple)) else [destinatarios],
+                fail_silently=False,
+            )
+        mensajes = [n.mensaje for n in pendientes]
+        if telegram_en_cola:
+            transaction.on_commit(lambda: send_telegram_notification.delay(mensajes))
+        else:
+            try:
+                send_telegram_notification(mensajes)
+            except ErrorTelegram:
+                pass  # sin worker no hay reintento; el email ya salió
+
+        Notificacion.objects.filter(id__in=[n.id for n in pendientes]).update(enviada=True)
+    return len(pendientes)
+
+
+# ---------------------------------------------------------------------------
+# Revisión por movimiento
+# ---------------------------------------------------------------------------
+# Cada proceso guarda en memoria ``{(content_type_id, producto_id): {acueducto_id:
+# alerta_id}}`` de las alertas activas. Un movimiento aprobado solo consulta la
+# base si toca un producto con alerta; el índice se reconstruye cuando cambia la
+# versión en el caché (``Alerta.save`` la incrementa) o cuando tiene más de
+# ``STOCK_ALERT_INDEX_TTL`` segundos. Con el caché en memoria local (sin Redis)
+# la versión no se comparte entre procesos y solo rige el TTL: una alerta nueva
+# o reactivada en otro proceso puede tardar ese tiempo en revisarse por
+# movimiento (la evaluación periódica la cubre igual). Las alertas desactivadas
+# no notifican aunque sigan en el índice: ``revisar_umbrales`` filtra ``activo``
+# en la base.
+
+CLAVE_VERSION_INDICE = 'alertas_stock:indice:version'
+_indice = {'version': None, 'cargado': 0.0, 'alertas': {}}
+
+
+def invalidar_indice():
+    """Obliga a todos los procesos a recargar el índice de alertas."""
+    try:
+        cache.incr(CLAVE_VERSION_INDICE)
+    except ValueError:
+        cache.set(CLAVE_VERSION_INDICE, 1, timeout=None)
+
+
+def indice_alertas():
+    """Índice vigente de alertas activas (se recarga si cambió la versión o venció)."""
+    from notificaciones.models import Alerta
+
+    version = cache.get(CLAVE_VERSION_INDICE)
+    if version is None:
+        cache.add(CLAVE_VERSION_INDICE, 1, timeout=None)
+        version = cache.get(CLAVE_VERSION_INDICE, 1)
+    ahora = time.monotonic()
+    vencido = ahora - _indice['cargado'] >= getattr(settings, 'STOCK_ALERT_INDEX_TTL', 60)
+    if _indice['version'] != version or vencido:
+        alertas = defaultdict(dict)
+        filas = Alerta.objects.filter(activo=True).values_list('id', 'content_type_id', 'object_id', 'acueducto_id')
+        for alerta_id, ct_id, producto_id, acueducto_id in filas:
+            alertas[(ct_id, producto_id)][acueducto_id] = alerta_id
+        _indice.update(version=version, cargado=ahora, alertas=dict(alertas))
+    return _indice['alertas']
+
+
+def revisar_umbrales(deltas, momento=None):
+    """
+    Revisa las alertas de los (producto, ubicación) que tocaron ``deltas`` y
+    difunde por WebSocket las que se dispararon (grupo de la sucursal y de
+    administradores); el email/Telegram se encola con ``enviar_alertas_stock``.
+
+    Returns:
+        list: ids de las notificaciones creadas.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from geography.models import Ubicacion
+    from inventario.stock import modelo_producto
+    from notificaciones.models import Alerta
+    from notificaciones.tasks import broadcast_notification, enviar_alertas_stock
+
+    indice = indice_alertas()
+    tocados = []
+    for delta in deltas:
+        ct_id = ContentType.objects.get_for_model(modelo_producto(delta.stock_model)).id
+        por_acueducto = indice.get((ct_id, delta.producto_id))
+        if por_acueducto:
+            tocados.append((delta.ubicacion_id, por_acueducto))
+    if not tocados:
+        return []
+
+    acueductos = dict(
+        Ubicacion.objects.filter(id__in={u for u, _ in tocados}).values_list('id', 'acueducto_id')
+    )
+    alerta_ids = {
+        por_acueducto[acueductos[ubicacion_id]]
+        for ubicacion_id, por_acueducto in tocados if acueductos.get(ubicacion_id) in por_acueducto
+    }
+    if not alerta_ids:
+        return []
+
+    ventana = ventana_actual(momento)
+    alertas = list(
+        Alerta.objects.filter(id__in=alerta_ids, activo=True)
+        .exclude(notificaciones__ventana=ventana)
+        .select_related('acueducto__sucursal')
+    )
+    if not alertas:
+        return []
+    notificaciones = _notificar(alertas, ventana)
+
+    # Un solo envío por sucursal, a sus operadores y a los administradores
+    sucursales = {a.pk: a.acueducto.sucursal_id for a in alertas}
+    por_sucursal = defaultdict(list)
+    for notificacion in notificaciones:
+        por_sucursal[sucursales[notificacion.alerta_id]].append(notificacion.mensaje)
+    for sucursal_id, mensajes in por_sucursal.items():
+        broadcast_notification.delay(mensajes, sucursal_id=sucursal_id)
+    ids = [n.id for n in notificaciones]
+    if ids:
+        enviar_alertas_stock.delay(ids)
+    return ids
+
+
+def revisar_umbrales_al_confirmar(deltas):
+    """
+    Programa ``revisar_umbrales`` para cuando se confirme la transacción, solo
+    con los deltas que descuentan stock (los únicos que pueden cruzar un umbral).
+    """
+    salidas = [d for d in deltas if d.cantidad < 0]
+    if salidas:
+        transaction.on_commit(lambda: revisar_umbrales(salidas), robust=True)
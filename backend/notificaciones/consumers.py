@@ -1,31 +1,85 @@
+import asyncio
 import json
+
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+# Grupos del channel layer: todos los conectados, administradores, una
+# sucursal o un usuario. Cada socket se une solo a los que le corresponden y
+# cada aviso va solo a los de su destino (ver ``grupos_destino``).
+GRUPO_GLOBAL = 'notifications_global'
+GRUPO_ADMIN = 'notificaciones_admin'
+
+
+def grupo_usuario(usuario_id):
+    return f'notificaciones_usuario_{usuario_id}'
+
+
+def grupo_sucursal(sucursal_id):
+    return f'notificaciones_sucursal_{sucursal_id}'
+
+
+def grupos_destino(usuario_id=None, sucursal_id=None):
+    """
+    Grupos que reciben un aviso: el de su usuario, o el de su sucursal y los
+    administradores. Solo los avisos sin destinatario van a ``GRUPO_GLOBAL``.
+    """
+    if usuario_id:
+        return [grupo_usuario(usuario_id)]
+    if sucursal_id:
+        return [grupo_sucursal(sucursal_id), GRUPO_ADMIN]
+    return [GRUPO_GLOBAL]
+
+
+def grupos_de_usuario(user):
+    """Grupos a los que se une el socket de ``user``."""
+    grupos = [GRUPO_GLOBAL, grupo_usuario(user.pk)]
+    if user.is_superuser or user.role == user.ROLE_ADMIN:
+        grupos.append(GRUPO_ADMIN)
+    elif user.sucursal_id:
+        grupos.append(grupo_sucursal(user.sucursal_id))
+    return grupos
+
 
 class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Notificaciones en vivo.
+
+    Los mensajes que llegan dentro de ``NOTIFICATIONS_WS_BATCH_WINDOW``
+    segundos se envían juntos en un solo frame ``notifications``; un mensaje
+    aislado sale como ``notification`` (formato de siempre).
+    """
+
     async def connect(self):
-        # Un grupo general para todos por ahora, o podrías usar user specific groups
-        self.group_name = 'notifications_global'
-        
         # Validar usuario autenticado
         if self.scope["user"].is_anonymous:
-             await self.close()
-        else:
-            await self.channel_layer.group_add(
-                self.group_name,
-                self.channel_name
-            )
-            await self.accept()
+            await self.close()
+            return
+
+        self.grupos = grupos_de_usuario(self.scope["user"])
+        self.pendientes = []
+        self.envio = None
+        for grupo in self.grupos:
+            await self.channel_layer.group_add(grupo, self.channel_name)
+        await self.accept()
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.group_name,
-            self.channel_name
-        )
+        if self.envio is not None:
+            self.envio.cancel()
+        for grupo in getattr(self, 'grupos', []):
+            await self.channel_layer.group_discard(grupo, self.channel_name)
 
     async def send_notification(self, event):
-        message = event['message']
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'notification',
-            'message': message
-        }))
+        # 'messages' (lote) o 'message' (un solo texto)
+        self.pendientes.extend(event.get('messages') or [event['message']])
+        if self.envio is None:
+            self.envio = asyncio.ensure_future(self._vaciar())
+
+    async def _vaciar(self):
+        await asyncio.sleep(getattr(settings, 'NOTIFICATIONS_WS_BATCH_WINDOW', 0.2))
+        mensajes, self.pendientes, self.envio = self.pendientes, [], None
+        if len(mensajes) == 1:
+            frame = {'type': 'notification', 'message': mensajes[0]}
+        else:
+            frame = {'type': 'notifications', 'messages': mensajes}
+        await self.send(text_data=json.dumps(frame))
@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0003_alerta_deleted_at_notificacion_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='alerta',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notificaciones', to='notificaciones.alerta'),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='ventana',
+            field=models.PositiveIntegerField(blank=True, help_text='Número de ventana de deduplicación (ver notificaciones.alertas).', null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='notificacion',
+            constraint=models.UniqueConstraint(fields=('alerta', 'ventana'), name='notificacion_alerta_ventana_unica'),
+        ),
+    ]
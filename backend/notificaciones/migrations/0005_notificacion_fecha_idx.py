@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0004_notificacion_alerta_ventana'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(
+                condition=models.Q(('deleted_at__isnull', True)),
+                fields=['-creada_en', '-id'], name='notificacion_fecha_idx',
+            ),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
@@ -24,6 +24,8 @@ class ConfiguracionTelegram(models.Model):
         # Asegurar que solo exista una instancia de este modelo
         self.pk = 1
         super(ConfiguracionTelegram, self).save(*args, **kwargs)
+        from notificaciones.telegram import invalidar_configuracion
+        transaction.on_commit(invalidar_configuracion)
 
 class DestinatarioTelegram(models.Model):
     """
@@ -40,6 +42,17 @@ class DestinatarioTelegram(models.Model):
     def __str__(self):
         return f"{self.usuario.username} ({self.chat_id})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from notificaciones.telegram import invalidar_configuracion
+        transaction.on_commit(invalidar_configuracion)
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        from notificaciones.telegram import invalidar_configuracion
+        transaction.on_commit(invalidar_configuracion)
+        return resultado
+
     class Meta:
         verbose_name = "Destinatario de Telegram"
         verbose_name_plural = "Destinatarios de Telegram"
@@ -65,6 +78,17 @@ class Alerta(SoftDeleteModel):
     def __str__(self):
         return f"Alerta {self.producto} - {self.acueducto} (< {self.umbral_minimo})"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # El índice en memoria de notificaciones.alertas se recarga en todos los procesos
+        from notificaciones.alertas import invalidar_indice
+        transaction.on_commit(invalidar_indice)
+
+    def hard_delete(self):
+        super().hard_delete()
+        from notificaciones.alertas import invalidar_indice
+        transaction.on_commit(invalidar_indice)
+
 
 class Notificacion(SoftDeleteModel):
     """Notificaciones generadas por el sistema."""
@@ -81,10 +105,41 @@ class Notificacion(SoftDeleteModel):
         null=True, blank=True
     )
 
+    # Alertas de stock: una notificación por (alerta, ventana de tiempo)
+    alerta = models.ForeignKey(
+        Alerta,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='notificaciones'
+    )
+    ventana = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text='Número de ventana de deduplicación (ver notificaciones.alertas).'
+    )
+
     class Meta:
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
         ordering = ['-creada_en']
+        indexes = [
+            # Listado paginado por cursor (NotificacionPagination), sin las eliminadas
+            models.Index(
+                fields=['-creada_en', '-id'], name='notificacion_fecha_idx',
+                condition=models.Q(deleted_at__isnull=True),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['alerta', 'ventana'], name='notificacion_alerta_ventana_unica'),
+        ]
 
     def __str__(self):
         return f"{self.mensaje} ({self.creada_en})"
+
+    def save(self, *args, **kwargs):
+        nueva = self._state.adding
+        super().save(*args, **kwargs)
+        if nueva:
+            # En vivo solo a su usuario; sin usuario es un aviso para todos
+            from notificaciones.tasks import broadcast_notification
+            mensaje, usuario_id = self.mensaje, self.usuario_id
+            transaction.on_commit(lambda: broadcast_notification.delay(mensaje, usuario_id=usuario_id))
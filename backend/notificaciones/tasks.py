@@ -1,38 +1,76 @@
 from celery import shared_task
-import requests
-from django.conf import settings
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
-@shared_task
-def send_telegram_notification(message, chat_id=None):
+from .consumers import grupos_destino
+
+@shared_task(bind=True, max_retries=5)
+def send_telegram_notification(self, message=None, chat_id=None, pendientes=None):
     """
     Tarea asíncrona para enviar notificaciones a Telegram.
+
+    ``message`` puede ser un texto o una lista (se agrupan por chat); sin
+    ``chat_id`` va a todos los ``DestinatarioTelegram`` activos. Ante un fallo
+    transitorio se reintenta con backoff solo lo que quedó sin enviar.
     """
-    bot_token = getattr(settings, 'TELEGRAM_BOT_TOKEN', None)
-    # Si no se pasa chat_id, usar el por defecto
-    if not chat_id:
-        chat_id = getattr(settings, 'TELEGRAM_CHAT_ID', None)
-
-    if bot_token and chat_id:
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        data = {"chat_id": chat_id, "text": message}
-        try:
-            response = requests.post(url, data=data)
-            response.raise_for_status()
-        except Exception as e:
-            print(f"Error enviando notificación a Telegram: {e}")
+    from notificaciones.telegram import ErrorTelegram, entregar, preparar_envios
+
+    envios = [tuple(e) for e in pendientes] if pendientes is not None else preparar_envios(message, chat_id)
+    try:
+        return entregar(envios)
+    except ErrorTelegram as e:
+        espera = e.reintentar_en or 5 * 2 ** self.request.retries
+        raise self.retry(exc=e, args=(), kwargs={'pendientes': e.pendientes}, countdown=espera)
 
 @shared_task
-def broadcast_notification(message, group_name='notifications_global'):
+def broadcast_notification(message, group_name=None, usuario_id=None, sucursal_id=None):
     """
     Tarea para enviar notificación via WebSockets (Channels) desde Celery.
+
+    ``message`` puede ser un texto o una lista (un solo evento por grupo).
+    Sin ``group_name`` (un grupo o una lista) los grupos salen de
+    ``usuario_id`` / ``sucursal_id`` con ``consumers.grupos_destino``.
     """
+    mensajes = [message] if isinstance(message, str) else list(message)
+    if group_name is None:
+        grupos = grupos_destino(usuario_id, sucursal_id)
+    else:
+        grupos = [group_name] if isinstance(group_name, str) else group_name
+    if not mensajes:
+        return
     channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            'type': 'send_notification',
-            'message': message
-        }
-    )
+    for grupo in grupos:
+        async_to_sync(channel_layer.group_send)(
+            grupo,
+            {
+                'type': 'send_notification',
+                'messages': mensajes
+            }
+        )
+
+
+@shared_task
+def evaluar_alertas_stock():
+    """
+    Tarea periódica (Celery beat): evalúa todas las alertas de stock y encola
+    el envío de las notificaciones nuevas.
+    """
+    from django.db import transaction
+    from notificaciones.alertas import evaluar_alertas
+
+    with transaction.atomic():
+        ids = evaluar_alertas()
+        if ids:
+            transaction.on_commit(lambda: enviar_alertas_stock.delay(ids))
+    return len(ids)
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=60)
+def enviar_alertas_stock(self, ids):
+    """Envía por email y Telegram las notificaciones de alerta ``ids``; reintenta si falla el correo."""
+    from notificaciones.alertas import despachar_alertas
+
+    try:
+        return despachar_alertas(ids)
+    except Exception as exc:
+        raise self.retry(exc=exc)
@@ -0,0 +1,182 @@
+"""
+Entrega de mensajes a Telegram.
+
+- El token y los destinatarios salen de ``ConfiguracionTelegram`` y
+  ``DestinatarioTelegram`` (con ``TELEGRAM_BOT_TOKEN``/``TELEGRAM_CHAT_ID``
+  como respaldo) y se guardan en caché hasta que alguno de los dos cambie o
+  pasen ``TELEGRAM_CONFIG_CACHE_TTL`` segundos. El TTL acota lo que tarda en
+  verse un cambio en otro proceso (el worker de Celery) cuando el caché no es
+  compartido.
+- Las peticiones usan una ``requests.Session`` por hilo (conexiones
+  reutilizadas) con timeout.
+- Los mensajes para el mismo chat se juntan en textos de hasta 4096
+  caracteres, el máximo de ``sendMessage``.
+- Dos token buckets por proceso respetan los límites de Telegram: global
+  (``TELEGRAM_RATE_GLOBAL`` mensajes/s) y por chat (``TELEGRAM_RATE_CHAT``).
+
+Los fallos transitorios (red, 429, 5xx) se devuelven como ``ErrorTelegram``
+con los envíos pendientes, para que la tarea Celery reintente solo esos.
+"""
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+LIMITE_TEXTO = 4096
+CLAVE_CONFIGURACION = 'telegram:configuracion'
+
+
+class ErrorTelegram(Exception):
+    """Fallo transitorio; ``pendientes`` son los ``(chat_id, texto)`` sin enviar."""
+
+    def __init__(self, mensaje, pendientes, reintentar_en=None):
+        super().__init__(mensaje)
+        self.pendientes = pendientes
+        self.reintentar_en = reintentar_en
+
+
+class TokenBucket:
+    """``capacidad`` fichas que se reponen a ``tasa`` por segundo."""
+
+    def __init__(self, tasa, capacidad=None, reloj=time.monotonic):
+        self.tasa = float(tasa)
+        self.capacidad = float(capacidad or tasa)
+        self.fichas = self.capacidad
+        self.reloj = reloj
+        self.ultimo = reloj()
+        self.lock = threading.Lock()
+
+    def espera(self):
+        """Toma una ficha; devuelve los segundos a esperar antes de usarla (0 si hay)."""
+        with self.lock:
+            ahora = self.reloj()
+            self.fichas = min(self.capacidad, self.fichas + (ahora - self.ultimo) * self.tasa)
+            self.ultimo = ahora
+            self.fichas -= 1
+            return 0.0 if self.fichas >= 0 else -self.fichas / self.tasa
+
+
+_local = threading.local()
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def sesion():
+    """Sesión HTTP del hilo actual (pool de conexiones keep-alive)."""
+    if getattr(_local, 'sesion', None) is None:
+        _local.sesion = requests.Session()
+        adaptador = requests.adapters.HTTPAdapter(pool_maxsize=10)
+        _local.sesion.mount('https://', adaptador)
+        _local.sesion.mount('http://', adaptador)
+    return _local.sesion
+
+
+def bucket(chat_id=None):
+    """Bucket global (``chat_id=None``) o de un chat."""
+    with _buckets_lock:
+        if chat_id not in _buckets:
+            if chat_id is None:
+                _buckets[None] = TokenBucket(getattr(settings, 'TELEGRAM_RATE_GLOBAL', 30))
+            else:
+                _buckets[chat_id] = TokenBucket(getattr(settings, 'TELEGRAM_RATE_CHAT', 1))
+        return _buckets[chat_id]
+
+
+def configuracion():
+    """
+    ``(bot_token, [chat_id, ...])`` vigente, desde el caché.
+
+    Si ``ConfiguracionTelegram`` existe y está inactiva no hay token (envío
+    desactivado globalmente).
+    """
+    datos = cache.get(CLAVE_CONFIGURACION)
+    if datos is None:
+        from notificaciones.models import ConfiguracionTelegram, DestinatarioTelegram
+
+        config = ConfiguracionTelegram.objects.filter(pk=1).first()
+        if config is not None:
+            token = config.bot_token if config.activo else None
+        else:
+            token = getattr(settings, 'TELEGRAM_BOT_TOKEN', None)
+        chats = list(DestinatarioTelegram.objects.filter(activo=True).order_by('id').values_list('chat_id', flat=True))
+        if not chats and getattr(settings, 'TELEGRAM_CHAT_ID', None):
+            chats = [settings.TELEGRAM_CHAT_ID]
+        datos = (token, chats)
+        cache.set(CLAVE_CONFIGURACION, datos, timeout=getattr(settings, 'TELEGRAM_CONFIG_CACHE_TTL', 60))
+    return datos
+
+
+def invalidar_configuracion():
+    cache.delete(CLAVE_CONFIGURACION)
+
+
+def agrupar_textos(mensajes):
+    """Une ``mensajes`` con saltos de línea en textos de hasta ``LIMITE_TEXTO``."""
+    textos = []
+    actual = ''
+    for mensaje in mensajes:
+        for i in range(0, max(len(mensaje), 1), LIMITE_TEXTO):
+            parte = mensaje[i:i + LIMITE_TEXTO]
+            if actual and len(actual) + 1 + len(parte) <= LIMITE_TEXTO:
+                actual = f'{actual}\n{parte}'
+            else:
+                if actual:
+                    textos.append(actual)
+                actual = parte
+    if actual:
+        textos.append(actual)
+    return textos
+
+
+def preparar_envios(mensajes, chat_id=None):
+    """``[(chat_id, texto)]`` para ``mensajes`` (texto o lista) a un chat o a todos los destinatarios."""
+    if isinstance(mensajes, str):
+        mensajes = [mensajes]
+    _, chats = configuracion()
+    chats = [chat_id] if chat_id else chats
+    textos = agrupar_textos(mensajes)
+    return [(chat, texto) for chat in chats for texto in textos]
+
+
+def _url(token):
+    base = getattr(settings, 'TELEGRAM_API_URL', 'https://api.telegram.org').rstrip('/')
+    return f'{base}/bot{token}/sendMessage'
+
+
+def entregar(envios, dormir=time.sleep):
+    """
+    Envía ``envios`` (``[(chat_id, texto)]``) en orden respetando los límites.
+
+    Los errores permanentes de un chat (400/403: chat inexistente, bot
+    bloqueado) descartan ese envío.
+
+    Returns:
+        int: mensajes entregados.
+
+    Raises:
+        ErrorTelegram: fallo transitorio, con los envíos que faltan.
+    """
+    token, _ = configuracion()
+    if not token or not envios:
+        return 0
+    url = _url(token)
+    timeout = getattr(settings, 'TELEGRAM_TIMEOUT', 10)
+    entregados = 0
+    for i, (chat_id, texto) in enumerate(envios):
+        dormir(max(bucket().espera(), bucket(chat_id).espera()))
+        try:
+            respuesta = sesion().post(url, data={'chat_id': chat_id, 'text': texto}, timeout=timeout)
+        except requests.RequestException as e:
+            raise ErrorTelegram(f'Error de red con Telegram: {e}', envios[i:])
+
+        if respuesta.status_code == 429 or respuesta.status_code >= 500:
+            try:
+                reintentar_en = respuesta.json().get('parameters', {}).get('retry_after')
+            except ValueError:
+                reintentar_en = None
+            raise ErrorTelegram(f'Telegram respondió {respuesta.status_code}', envios[i:], reintentar_en)
+        if respuesta.ok:
+            entregados += 1
+    return entregados
@@ -0,0 +1,203 @@
+"""
+Pruebas de la evaluación de alertas de stock bajo (notificaciones.alertas).
+"""
+import io
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from geography.models import Ubicacion
+from institucion.models import Acueducto
+from inventario.models import Accessory, MovimientoInventario, StockAccessory
+from inventario.stock import StockDelta
+from inventario.tests.factories import crear_datos_base
+from notificaciones.alertas import (
+    despachar_alertas, evaluar_alertas, indice_alertas, invalidar_indice, revisar_umbrales,
+)
+from notificaciones.models import Alerta, Notificacion
+from notificaciones.tasks import evaluar_alertas_stock
+
+
+@override_settings(STOCK_ALERT_EMAILS=['almacen@example.com'], STOCK_ALERT_WINDOW_HOURS=24, TELEGRAM_BOT_TOKEN='')
+class AlertasStockTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_datos_base(cls)
+        cls.acueducto = cls.ubicacion_a.acueducto
+        cls.acueducto_norte = Acueducto.objects.create(nombre='Acueducto Norte', sucursal=cls.acueducto.sucursal)
+        cls.ubicacion_norte = Ubicacion.objects.create(nombre='Almacén Norte', acueducto=cls.acueducto_norte, tipo='ALMACEN')
+        # Dos ubicaciones en el mismo acueducto: el comando anterior fallaba con MultipleObjectsReturned
+        StockAccessory.objects.create(producto=cls.accesorio, ubicacion=cls.ubicacion_a, cantidad=Decimal('3'))
+        StockAccessory.objects.create(producto=cls.accesorio, ubicacion=cls.ubicacion_b, cantidad=Decimal('4'))
+        StockAccessory.objects.create(producto=cls.accesorio, ubicacion=cls.ubicacion_norte, cantidad=Decimal('50'))
+        cls.alerta = Alerta.objects.create(
+            content_type=cls.ct_accesorio, object_id=cls.accesorio.id,
+            acueducto=cls.acueducto, umbral_minimo=Decimal('10')
+        )
+        Alerta.objects.create(
+            content_type=cls.ct_accesorio, object_id=cls.accesorio.id,
+            acueducto=cls.acueducto_norte, umbral_minimo=Decimal('10')
+        )
+
+    def setUp(self):
+        ContentType.objects.get_for_models(Accessory)
+        cache.clear()
+
+    def _accesorio_sin_stock(self, i):
+        accesorio = Accessory.objects.create(
+            nombre=f'Tapón {i}', sku=f'ALR-ACC-{i:03d}', categoria=self.categoria,
+            proveedor=self.proveedor, unidad_medida=self.unidad, tipo_accesorio='TAPON', material='PVC',
+            diametro_entrada=Decimal('2.0'), tipo_conexion='SOLDABLE', presion_trabajo='PN10'
+        )
+        return Alerta.objects.create(
+            content_type=self.ct_accesorio, object_id=accesorio.id,
+            acueducto=self.acueducto, umbral_minimo=Decimal('1')
+        )
+
+    def test_suma_por_acueducto_y_deduplica_por_ventana(self):
+        ids = evaluar_alertas()
+        self.assertEqual(len(ids), 1)
+        notificacion = Notificacion.objects.get()
+        self.assertEqual(notificacion.alerta, self.alerta)
+        self.assertIn('STK-ACC-001', notificacion.mensaje)
+        self.assertIn('Cantidad actual: 7', notificacion.mensaje)
+
+        self.assertEqual(evaluar_alertas(), [])
+        notificacion.delete()  # una notificación descartada tampoco se repite en la ventana
+        self.assertEqual(evaluar_alertas(), [])
+
+        manana = timezone.now() + timedelta(days=1)
+        self.assertEqual(len(evaluar_alertas(momento=manana)), 1)
+        self.assertEqual(Notificacion.all_objects.filter(alerta=self.alerta).count(), 2)
+
+    def test_consultas_constantes(self):
+        with self.assertNumQueries(6):
+            evaluar_alertas()
+        Notificacion.all_objects.hard_delete()
+        for i in range(10):
+            self._accesorio_sin_stock(i)
+        with self.assertNumQueries(6):
+            self.assertEqual(len(evaluar_alertas()), 11)
+
+    def test_despacho_agrupado_e_idempotente(self):
+        self._accesorio_sin_stock(0)
+        ids = evaluar_alertas()
+        with mock.patch('notificaciones.tasks.send_telegram_notification.delay') as telegram:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(despachar_alertas(ids), 2)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['almacen@example.com'])
+        self.assertEqual(len(mail.outbox[0].body.splitlines()), 2)
+        telegram.assert_called_once_with(mail.outbox[0].body.splitlines())
+        self.assertFalse(Notificacion.objects.filter(enviada=False).exists())
+
+        self.assertEqual(despachar_alertas(ids), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_tarea_encola_envio_al_confirmar(self):
+        with mock.patch('notificaciones.tasks.enviar_alertas_stock.delay') as enviar:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(evaluar_alertas_stock(), 1)
+        enviar.assert_called_once_with([Notificacion.objects.get().id])
+
+    def test_comando(self):
+        salida = io.StringIO()
+        with mock.patch('notificaciones.telegram.sesion') as sesion:
+            call_command('check_stock_alerts', stdout=salida)
+        self.assertIn('Notificaciones creadas: 1', salida.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertTrue(Notificacion.objects.get().enviada)
+        sesion.assert_not_called()  # sin bot configurado no se envía a Telegram
+
+
+class AlertasPorMovimientoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        crear_datos_base(cls)
+        cls.admin = get_user_model().objects.create_user(username='aprobador', password='x', role='ADMIN')
+        StockAccessory.objects.create(producto=cls.accesorio, ubicacion=cls.ubicacion_a, cantidad=Decimal('12'))
+        cls.alerta = Alerta.objects.create(
+            content_type=cls.ct_accesorio, object_id=cls.accesorio.id,
+            acueducto=cls.ubicacion_a.acueducto, umbral_minimo=Decimal('5')
+        )
+
+    def setUp(self):
+        ContentType.objects.get_for_models(Accessory)
+        invalidar_indice()
+        indice_alertas()
+
+    def _salida(self, cantidad, producto=None):
+        producto = producto or self.accesorio
+        return MovimientoInventario.objects.create(
+            content_type=self.ct_accesorio, object_id=producto.id, tipo_movimiento='SALIDA',
+            cantidad=Decimal(cantidad), ubicacion_origen=self.ubicacion_a,
+            status=MovimientoInventario.STATUS_APROBADO, creado_por=self.admin
+        )
+
+    @mock.patch('notificaciones.tasks.enviar_alertas_stock.delay')
+    @mock.patch('notificaciones.tasks.broadcast_notification.delay')
+    def test_salida_aprobada_que_cruza_el_umbral(self, broadcast, enviar):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._salida('4')
+        broadcast.assert_not_called()
+        self.assertFalse(Notificacion.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._salida('4')
+        notificacion = Notificacion.objects.get()
+        self.assertEqual(notificacion.alerta, self.alerta)
+        self.assertIn('Cantidad actual: 4', notificacion.mensaje)
+        broadcast.assert_called_once_with(
+            [notificacion.mensaje], sucursal_id=self.ubicacion_a.acueducto.sucursal_id
+        )
+        enviar.assert_called_once_with([notificacion.id])
+
+        # Misma ventana: no se repite
+        with self.captureOnCommitCallbacks(execute=True):
+            self._salida('1')
+        self.assertEqual(broadcast.call_count, 1)
+
+    def test_productos_sin_alerta_no_consultan(self):
+        otro = Accessory.objects.create(
+            nombre='Tapón', sku='STK-ACC-002', categoria=self.categoria, proveedor=self.proveedor,
+            unidad_medida=self.unidad, tipo_accesorio='TAPON', material='PVC', diametro_entrada=Decimal('2.0'),
+            tipo_conexion='SOLDABLE', presion_trabajo='PN10'
+        )
+        deltas = [StockDelta(StockAccessory, otro.id, self.ubicacion_a.id, Decimal('-1'))]
+        with self.assertNumQueries(0):
+            self.assertEqual(revisar_umbrales(deltas), [])
+
+    def test_indice_se_recarga_al_cambiar_alertas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alerta.activo = False
+            self.alerta.save()
+        self.assertEqual(indice_alertas(), {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alerta.activo = True
+            self.alerta.save()
+        self.assertEqual(
+            indice_alertas(),
+            {(self.ct_accesorio.id, self.accesorio.id): {self.ubicacion_a.acueducto_id: self.alerta.id}}
+        )
+
+    def test_indice_vence_sin_cambio_de_version(self):
+        # Cambio hecho en otro proceso: no incrementa la versión de este caché
+        Alerta.objects.filter(pk=self.alerta.pk).update(activo=False)
+        self.assertIn((self.ct_accesorio.id, self.accesorio.id), indice_alertas())
+
+        ahora = time.monotonic()
+        with override_settings(STOCK_ALERT_INDEX_TTL=60), \
+                mock.patch('notificaciones.alertas.time.monotonic', return_value=ahora + 61):
+            self.assertEqual(indice_alertas(), {})
@@ -0,0 +1,137 @@
+"""
+Pruebas de los grupos y el agrupamiento del WebSocket de notificaciones.
+"""
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase, override_settings
+
+from institucion.models import OrganizacionCentral, Sucursal
+from notificaciones.models import Notificacion
+from notificaciones.consumers import GRUPO_ADMIN, NotificationConsumer, grupo_sucursal, grupo_usuario
+from notificaciones.tasks import broadcast_notification
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    NOTIFICATIONS_WS_BATCH_WINDOW=0.05,
+)
+class NotificacionesWebSocketTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        org = OrganizacionCentral.objects.create(nombre='Org WS')
+        cls.norte = Sucursal.objects.create(nombre='Norte', organizacion_central=org)
+        cls.sur = Sucursal.objects.create(nombre='Sur', organizacion_central=org)
+        User = get_user_model()
+        cls.operador_norte = User.objects.create_user(username='norte', password='x', sucursal=cls.norte)
+        cls.operador_sur = User.objects.create_user(username='sur', password='x', sucursal=cls.sur)
+        cls.admin = User.objects.create_user(username='admin_ws', password='x', role='ADMIN')
+
+    async def _conectar(self, user):
+        communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), '/ws/notifications/')
+        communicator.scope['user'] = user
+        conectado, _ = await communicator.connect()
+        self.assertTrue(conectado)
+        return communicator
+
+    async def _recibir(self, communicator):
+        return json.loads(await communicator.receive_from(timeout=1))
+
+    def test_enruta_por_sucursal_y_usuario(self):
+        async def escenario():
+            norte = await self._conectar(self.operador_norte)
+            sur = await self._conectar(self.operador_sur)
+            admin = await self._conectar(self.admin)
+            layer = get_channel_layer()
+
+            await layer.group_send(
+                grupo_sucursal(self.norte.id), {'type': 'send_notification', 'message': 'Cloro bajo en Norte'}
+            )
+            self.assertEqual(await self._recibir(norte), {'type': 'notification', 'message': 'Cloro bajo en Norte'})
+            self.assertTrue(await sur.receive_nothing(timeout=0.1))
+            self.assertTrue(await admin.receive_nothing(timeout=0.1))
+
+            await layer.group_send(GRUPO_ADMIN, {'type': 'send_notification', 'messages': ['Para admins']})
+            self.assertEqual((await self._recibir(admin))['message'], 'Para admins')
+
+            await layer.group_send(grupo_usuario(self.operador_sur.id), {'type': 'send_notification', 'message': 'Hola'})
+            self.assertEqual((await self._recibir(sur))['message'], 'Hola')
+            self.assertTrue(await norte.receive_nothing(timeout=0.1))
+
+            for communicator in (norte, sur, admin):
+                await communicator.disconnect()
+
+        async_to_sync(escenario)()
+
+    def test_aviso_de_sucursal_no_llega_a_otra(self):
+        async def escenario():
+            norte = await self._conectar(self.operador_norte)
+            sur = await self._conectar(self.operador_sur)
+            admin = await self._conectar(self.admin)
+
+            await sync_to_async(broadcast_notification)('Cloro bajo en Norte', sucursal_id=self.norte.id)
+            self.assertEqual((await self._recibir(norte))['message'], 'Cloro bajo en Norte')
+            self.assertEqual((await self._recibir(admin))['message'], 'Cloro bajo en Norte')
+            self.assertTrue(await sur.receive_nothing(timeout=0.1))
+
+            await sync_to_async(broadcast_notification)('Solo para Sur', usuario_id=self.operador_sur.id)
+            self.assertEqual((await self._recibir(sur))['message'], 'Solo para Sur')
+            self.assertTrue(await norte.receive_nothing(timeout=0.1))
+            self.assertTrue(await admin.receive_nothing(timeout=0.1))
+
+            await sync_to_async(broadcast_notification)('Mantenimiento')
+            for communicator in (norte, sur, admin):
+                self.assertEqual((await self._recibir(communicator))['message'], 'Mantenimiento')
+                await communicator.disconnect()
+
+        async_to_sync(escenario)()
+
+    @mock.patch('notificaciones.tasks.broadcast_notification.delay')
+    def test_notificacion_nueva_va_a_su_usuario(self, broadcast):
+        with self.captureOnCommitCallbacks(execute=True):
+            notificacion = Notificacion.objects.create(mensaje='Tu pedido', usuario=self.operador_sur)
+        broadcast.assert_called_once_with('Tu pedido', usuario_id=self.operador_sur.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notificacion.leida = True
+            notificacion.save()
+        self.assertEqual(broadcast.call_count, 1)
+
+    def test_rafaga_en_un_solo_frame(self):
+        async def escenario():
+            norte = await self._conectar(self.operador_norte)
+            layer = get_channel_layer()
+            for i in range(5):
+                await layer.group_send(
+                    grupo_sucursal(self.norte.id), {'type': 'send_notification', 'messages': [f'Aviso {i}']}
+                )
+            frame = await self._recibir(norte)
+            self.assertEqual(frame, {'type': 'notifications', 'messages': [f'Aviso {i}' for i in range(5)]})
+            self.assertTrue(await norte.receive_nothing(timeout=0.1))
+            await norte.disconnect()
+
+        async_to_sync(escenario)()
+
+    def test_tarea_envia_un_evento_por_grupo(self):
+        layer = get_channel_layer()
+        canal = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(GRUPO_ADMIN, canal)
+
+        broadcast_notification(['A', 'B'], [grupo_sucursal(self.norte.id), GRUPO_ADMIN])
+        evento = async_to_sync(layer.receive)(canal)
+        self.assertEqual(evento, {'type': 'send_notification', 'messages': ['A', 'B']})
+
+    def test_anonimo_rechazado(self):
+        async def escenario():
+            communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), '/ws/notifications/')
+            communicator.scope['user'] = AnonymousUser()
+            conectado, _ = await communicator.connect()
+            self.assertFalse(conectado)
+
+        async_to_sync(escenario)()
@@ -0,0 +1,128 @@
+"""
+Pruebas de la entrega a Telegram contra un servidor HTTP local.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs
+
+from celery.exceptions import Retry
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from notificaciones import telegram
+from notificaciones.models import ConfiguracionTelegram, DestinatarioTelegram
+from notificaciones.tasks import send_telegram_notification
+
+
+class _TelegramFalso(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        datos = {k: v[0] for k, v in parse_qs(cuerpo).items()}
+        self.server.recibidos.append({'ruta': self.path, 'puerto': self.client_address[1], **datos})
+        estado, respuesta = self.server.respuestas.pop(0) if self.server.respuestas else (200, {'ok': True})
+        contenido = json.dumps(respuesta).encode()
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def log_message(self, *args):
+        pass
+
+
+class TelegramTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _TelegramFalso)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.ajustes = override_settings(
+            TELEGRAM_API_URL=f'http://127.0.0.1:{cls.servidor.server_port}',
+            TELEGRAM_RATE_GLOBAL=1000, TELEGRAM_RATE_CHAT=1000,
+        )
+        cls.ajustes.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ajustes.disable()
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        ConfiguracionTelegram.objects.create(bot_token='123:ABC')
+        DestinatarioTelegram.objects.create(usuario=User.objects.create_user(username='jefe', password='x'), chat_id='111')
+        DestinatarioTelegram.objects.create(usuario=User.objects.create_user(username='ops', password='x'), chat_id='222')
+        DestinatarioTelegram.objects.create(
+            usuario=User.objects.create_user(username='baja', password='x'), chat_id='333', activo=False
+        )
+
+    def setUp(self):
+        self.servidor.recibidos = []
+        self.servidor.respuestas = []
+        telegram.invalidar_configuracion()
+        telegram._buckets.clear()
+        telegram._local.sesion = None
+
+    def test_agrupa_por_chat_y_reutiliza_conexion(self):
+        self.assertEqual(send_telegram_notification(['Cloro bajo', 'Sulfato bajo']), 2)
+        recibidos = self.servidor.recibidos
+        self.assertEqual([(r['chat_id'], r['text']) for r in recibidos],
+                         [('111', 'Cloro bajo\nSulfato bajo'), ('222', 'Cloro bajo\nSulfato bajo')])
+        self.assertEqual(recibidos[0]['ruta'], '/bot123:ABC/sendMessage')
+
+        with self.assertNumQueries(0):  # token y destinatarios desde el caché
+            send_telegram_notification('Otro aviso', chat_id='111')
+        self.assertEqual(len({r['puerto'] for r in self.servidor.recibidos}), 1)
+
+    def test_reintenta_solo_lo_pendiente(self):
+        self.servidor.respuestas = [(200, {'ok': True}), (429, {'ok': False, 'parameters': {'retry_after': 7}})]
+        with mock.patch.object(send_telegram_notification, 'retry', side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                send_telegram_notification('Aviso')
+        self.assertEqual(retry.call_args.kwargs['kwargs'], {'pendientes': [('222', 'Aviso')]})
+        self.assertEqual(retry.call_args.kwargs['countdown'], 7)
+
+        self.assertEqual(send_telegram_notification(pendientes=[['222', 'Aviso']]), 1)
+        self.assertEqual([r['chat_id'] for r in self.servidor.recibidos], ['111', '222', '222'])
+
+    def test_chat_invalido_no_reintenta(self):
+        self.servidor.respuestas = [(400, {'ok': False, 'description': 'chat not found'})]
+        self.assertEqual(send_telegram_notification('Aviso'), 1)
+        self.assertEqual(len(self.servidor.recibidos), 2)
+
+    def test_configuracion_desde_modelos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            DestinatarioTelegram.objects.get(chat_id='333').delete()
+        self.assertEqual(telegram.configuracion(), ('123:ABC', ['111', '222']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ConfiguracionTelegram.objects.update_or_create(pk=1, defaults={'bot_token': '123:ABC', 'activo': False})
+        self.assertEqual(send_telegram_notification('Aviso'), 0)
+        self.assertEqual(self.servidor.recibidos, [])
+
+    @override_settings(TELEGRAM_CONFIG_CACHE_TTL=30)
+    def test_configuracion_en_cache_con_ttl(self):
+        with mock.patch.object(telegram.cache, 'set', wraps=telegram.cache.set) as guardar:
+            telegram.configuracion()
+        self.assertEqual(guardar.call_args.kwargs['timeout'], 30)
+
+    def test_textos_largos_se_parten(self):
+        textos = telegram.agrupar_textos(['a' * 3000, 'b' * 2000, 'c' * 5000])
+        self.assertEqual([len(t) for t in textos], [3000, 2000, 4096, 904])
+
+    def test_token_bucket(self):
+        ahora = [0.0]
+        bucket = telegram.TokenBucket(tasa=1, capacidad=2, reloj=lambda: ahora[0])
+        self.assertEqual([bucket.espera(), bucket.espera()], [0.0, 0.0])
+        self.assertEqual(bucket.espera(), 1.0)
+        ahora[0] = 3.0
+        self.assertEqual(bucket.espera(), 0.0)
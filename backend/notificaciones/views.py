@@ -3,11 +3,13 @@ from .models import Notificacion, Alerta
 from .serializers import NotificacionSerializer, AlertaSerializer
 from rest_framework.permissions import IsAuthenticated
 from auditoria.mixins import AuditMixin, TrashBinMixin
+from auditoria.pagination import NotificacionPagination
 
 class NotificacionViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):
     queryset = Notificacion.objects.all()
     serializer_class = NotificacionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NotificacionPagination
     filterset_fields = ['leida', 'tipo']
 
 class AlertaViewSet(AuditMixin, TrashBinMixin, viewsets.ModelViewSet):